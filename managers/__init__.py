@@ -4,8 +4,10 @@ Shared infrastructure managers for the AI Tutor system
 """
 
 from .mongodb_manager import mongo_db, MongoDBManager
-from .user_manager import UserManager, UserProfile, SkillState, QuestionAttempt
+from .user_manager import UserManager, UserProfile, SkillState, QuestionAttempt, AttemptStats
 from .config_manager import ConfigManager
+from .attempt_columns import AttemptColumns
+from .profile_codec import ProfileCodec, profile_codec
 
 __all__ = [
     'mongo_db',
@@ -14,6 +16,10 @@ __all__ = [
     'UserProfile',
     'SkillState',
     'QuestionAttempt',
+    'AttemptStats',
     'ConfigManager',
+    'AttemptColumns',
+    'ProfileCodec',
+    'profile_codec',
 ]
 
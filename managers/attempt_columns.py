@@ -0,0 +1,228 @@
+"""
+Columnar Question History
+A student's question_history as aligned NumPy arrays, so statistics and windowed
+queries over it are a few vectorized operations instead of a loop over
+QuestionAttempt objects. Converts losslessly to and from the stored format.
+"""
+
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+ATTEMPT_FIELDS = ('question_id', 'skill_ids', 'is_correct', 'response_time_seconds', 'timestamp', 'time_penalty_applied')
+
+
+class AttemptColumns:
+    """
+    Attempts in history order. Row k is attempt k: question[k] indexes question_ids,
+    and its skills are skill[skill_ptr[k]:skill_ptr[k + 1]], indexing skill_ids (in
+    the attempt's own order). Arrays grow by doubling, so append is amortized O(1).
+    """
+
+    def __init__(self, capacity: int = 16):
+        self.question_ids: List[str] = []
+        self.skill_ids: List[str] = []
+        self._question_index: Dict[str, int] = {}
+        self._skill_index: Dict[str, int] = {}
+
+        capacity = max(1, capacity)
+        self._size = 0
+        self._question = np.empty(capacity, dtype=np.int32)
+        self._is_correct = np.empty(capacity, dtype=bool)
+        self._response_time = np.empty(capacity, dtype=np.float64)
+        self._timestamp = np.empty(capacity, dtype=np.float64)
+        self._penalty = np.empty(capacity, dtype=bool)
+        self._skill_ptr = np.zeros(capacity + 1, dtype=np.int64)
+        self._skill = np.empty(capacity, dtype=np.int32)
+
+    # Column views (no copies)
+
+    @property
+    def question(self) -> np.ndarray:
+        return self._question[:self._size]
+
+    @property
+    def is_correct(self) -> np.ndarray:
+        return self._is_correct[:self._size]
+
+    @property
+    def response_time_seconds(self) -> np.ndarray:
+        return self._response_time[:self._size]
+
+    @property
+    def timestamp(self) -> np.ndarray:
+        return self._timestamp[:self._size]
+
+    @property
+    def time_penalty_applied(self) -> np.ndarray:
+        return self._penalty[:self._size]
+
+    @property
+    def skill_ptr(self) -> np.ndarray:
+        return self._skill_ptr[:self._size + 1]
+
+    @property
+    def skill(self) -> np.ndarray:
+        return self._skill[:self._skill_ptr[self._size]]
+
+    def __len__(self) -> int:
+        return self._size
+
+    # Building
+
+    def append(self, question_id: str, skill_ids: Sequence[str], is_correct: bool,
+               response_time_seconds: float, timestamp: float, time_penalty_applied: bool = False):
+        k = self._size
+        if k == len(self._question):
+            self._grow_rows(2 * k)
+        start = int(self._skill_ptr[k])
+        stop = start + len(skill_ids)
+        if stop > len(self._skill):
+            self._skill = self._resized(self._skill, max(2 * len(self._skill), stop))
+
+        self._question[k] = self._ordinal(self._question_index, self.question_ids, question_id)
+        self._is_correct[k] = is_correct
+        self._response_time[k] = response_time_seconds
+        self._timestamp[k] = timestamp
+        self._penalty[k] = time_penalty_applied
+        for j, skill_id in enumerate(skill_ids):
+            self._skill[start + j] = self._ordinal(self._skill_index, self.skill_ids, skill_id)
+        self._skill_ptr[k + 1] = stop
+        self._size = k + 1
+
+    def append_attempt(self, attempt):
+        self.append(attempt.question_id, attempt.skill_ids, attempt.is_correct,
+                    attempt.response_time_seconds, attempt.timestamp, attempt.time_penalty_applied)
+
+    @classmethod
+    def from_attempts(cls, attempts: Sequence) -> 'AttemptColumns':
+        """Columns for a list of QuestionAttempt objects"""
+        return cls._from_rows(
+            len(attempts),
+            ((a.question_id, a.skill_ids, a.is_correct, a.response_time_seconds, a.timestamp, a.time_penalty_applied)
+             for a in attempts)
+        )
+
+    @classmethod
+    def from_documents(cls, documents: Sequence[dict]) -> 'AttemptColumns':
+        """Columns for stored question_history entries, without building QuestionAttempt objects"""
+        return cls._from_rows(
+            len(documents),
+            ((d['question_id'], d['skill_ids'], d['is_correct'], d['response_time_seconds'], d['timestamp'],
+              d.get('time_penalty_applied', False))
+             for d in documents)
+        )
+
+    @classmethod
+    def _from_rows(cls, count: int, rows: Iterable[tuple]) -> 'AttemptColumns':
+        # One pass into Python lists, then one array per column
+        columns = cls(capacity=count)
+        question, is_correct, response_time, timestamp, penalty, skill, skill_counts = [], [], [], [], [], [], []
+        for question_id, skill_ids, correct, seconds, ts, penalized in rows:
+            question.append(cls._ordinal(columns._question_index, columns.question_ids, question_id))
+            for skill_id in skill_ids:
+                skill.append(cls._ordinal(columns._skill_index, columns.skill_ids, skill_id))
+            skill_counts.append(len(skill_ids))
+            is_correct.append(correct)
+            response_time.append(seconds)
+            timestamp.append(ts)
+            penalty.append(penalized)
+
+        n = len(question)
+        columns._size = n
+        columns._question[:n] = question
+        columns._is_correct[:n] = is_correct
+        columns._response_time[:n] = response_time
+        columns._timestamp[:n] = timestamp
+        columns._penalty[:n] = penalty
+        np.cumsum(skill_counts, out=columns._skill_ptr[1:n + 1])
+        columns._skill = np.array(skill, dtype=np.int32) if skill else np.empty(max(1, n), dtype=np.int32)
+        return columns
+
+    # Converting back
+
+    def attempt_fields(self, k: int) -> tuple:
+        """Attempt k as a tuple in QuestionAttempt field order"""
+        start, stop = self._skill_ptr[k], self._skill_ptr[k + 1]
+        return (
+            self.question_ids[self._question[k]],
+            [self.skill_ids[s] for s in self._skill[start:stop]],
+            bool(self._is_correct[k]),
+            float(self._response_time[k]),
+            float(self._timestamp[k]),
+            bool(self._penalty[k])
+        )
+
+    def to_attempts(self) -> List:
+        from managers.user_manager import QuestionAttempt
+        return [QuestionAttempt(*self.attempt_fields(k)) for k in range(self._size)]
+
+    def to_documents(self) -> List[dict]:
+        """Entries in the stored question_history format"""
+        return [dict(zip(ATTEMPT_FIELDS, self.attempt_fields(k))) for k in range(self._size)]
+
+    # Windowed statistics
+
+    def window(self, last: Optional[int] = None, since: Optional[float] = None) -> slice:
+        """
+        Rows of the last `last` attempts and/or those at or after `since`.
+        Attempts are appended in time order, so `since` is a binary search.
+        """
+        start = 0
+        if last is not None:
+            start = max(0, self._size - last)
+        if since is not None:
+            start = max(start, int(np.searchsorted(self.timestamp, since, side='left')))
+        return slice(start, self._size)
+
+    def totals(self, rows: slice = slice(None)) -> Dict[str, float]:
+        """Attempt, correct, response-time and penalty totals over a window"""
+        return {
+            'total_questions': len(self.question[rows]),
+            'correct_answers': int(np.count_nonzero(self.is_correct[rows])),
+            'total_response_time': float(self.response_time_seconds[rows].sum()),
+            'time_penalties': int(np.count_nonzero(self.time_penalty_applied[rows]))
+        }
+
+    def accuracy(self, rows: slice = slice(None)) -> float:
+        correct = self.is_correct[rows]
+        return float(correct.mean()) if len(correct) else 0.0
+
+    def answered_question_ids(self, rows: slice = slice(None)) -> Set[str]:
+        return {self.question_ids[q] for q in np.unique(self.question[rows])}
+
+    def skill_totals(self, rows: slice = slice(None)) -> Tuple[np.ndarray, np.ndarray]:
+        """(attempts, correct answers) per skill ordinal over a window, aligned with skill_ids"""
+        start, stop, _ = rows.indices(self._size)
+        skills = self._skill[self._skill_ptr[start]:self._skill_ptr[stop]]
+        correct = np.repeat(self._is_correct[start:stop], np.diff(self._skill_ptr[start:stop + 1]))
+        size = len(self.skill_ids)
+        return (
+            np.bincount(skills, minlength=size),
+            np.bincount(skills, weights=correct, minlength=size).astype(np.int64)
+        )
+
+    # Internals
+
+    @staticmethod
+    def _ordinal(index: Dict[str, int], ids: List[str], key: str) -> int:
+        ordinal = index.get(key)
+        if ordinal is None:
+            ordinal = index[key] = len(ids)
+            ids.append(key)
+        return ordinal
+
+    @staticmethod
+    def _resized(array: np.ndarray, size: int) -> np.ndarray:
+        grown = np.empty(size, dtype=array.dtype)
+        grown[:len(array)] = array
+        return grown
+
+    def _grow_rows(self, capacity: int):
+        capacity = max(1, capacity)
+        self._question = self._resized(self._question, capacity)
+        self._is_correct = self._resized(self._is_correct, capacity)
+        self._response_time = self._resized(self._response_time, capacity)
+        self._timestamp = self._resized(self._timestamp, capacity)
+        self._penalty = self._resized(self._penalty, capacity)
+        self._skill_ptr = self._resized(self._skill_ptr, capacity + 1)
@@ -80,6 +80,11 @@ class MongoDBManager:
         """Get skills collection"""
         return self._db['skills']
     
+    @property
+    def question_generation_requests(self):
+        """Get question_generation_requests collection (skills whose question pool ran out)"""
+        return self._db['question_generation_requests']
+    
     def test_connection(self):
         """Test if MongoDB connection is working"""
         try:
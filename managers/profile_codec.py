@@ -0,0 +1,139 @@
+"""
+Profile Codec
+Encodes UserProfile into the stored user document and decodes it back.
+Record encoders and decoders are compiled once from the dataclass fields, so each
+attempt is one dict literal or one positional constructor call instead of going
+through asdict's recursive deep copy or keyword unpacking.
+"""
+
+import gc
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import fields, MISSING
+from operator import attrgetter
+from typing import Callable, Dict, Tuple
+
+from managers.user_manager import (
+    UserProfile, SkillState, QuestionAttempt, AttemptStats, RECENT_ATTEMPTS_WINDOW
+)
+
+def compile_record_codec(cls) -> Tuple[Callable, Callable]:
+    """
+    (encode_many, decode_many) for a flat dataclass: a list comprehension over a
+    dict literal of its fields, and one over a positional call reading each key
+    (fields with a default are read with .get, so older documents still decode)
+    """
+    names = [f.name for f in fields(cls)]
+    encode_items = ", ".join(f"{name!r}: r.{name}" for name in names)
+    decode_args = []
+    namespace = {'cls': cls}
+    for f in fields(cls):
+        if f.default is not MISSING:
+            namespace[f'_{f.name}_default'] = f.default
+            decode_args.append(f"d.get({f.name!r}, _{f.name}_default)")
+        else:
+            decode_args.append(f"d[{f.name!r}]")
+    source = (
+        f"def encode_many(records):\n"
+        f"    return [{{{encode_items}}} for r in records]\n"
+        f"def decode_many(documents):\n"
+        f"    return [cls({', '.join(decode_args)}) for d in documents]\n"
+    )
+    exec(source, namespace)
+    return namespace['encode_many'], namespace['decode_many']
+
+@contextmanager
+def gc_paused():
+    """Skip cyclic GC passes while building many acyclic records at once"""
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+class ProfileCodec:
+    """Schema-compiled encoder/decoder for UserProfile documents"""
+
+    # Profile fields stored as-is, with their defaults when missing from a document
+    SCALAR_DEFAULTS = (
+        ('student_notes', dict),
+        ('age', lambda: 5),
+        ('current_grade', lambda: 'K'),
+        ('next_review_at', lambda: None),
+        ('skill_template_grade', lambda: None),
+        ('state_version', lambda: 0),
+    )
+
+    def __init__(self):
+        self.encode_attempts, self.decode_attempts = compile_record_codec(QuestionAttempt)
+        self._encode_skill_states, self._decode_skill_states = compile_record_codec(SkillState)
+        self.stats_fields = tuple(f.name for f in fields(AttemptStats))
+        self._stats_values = attrgetter(*self.stats_fields)
+        self.scalar_fields = ('user_id', 'created_at', 'last_updated') + tuple(name for name, _ in self.SCALAR_DEFAULTS)
+        self._scalar_values = attrgetter(*self.scalar_fields)
+
+    # Records
+
+    def encode_attempt(self, attempt: QuestionAttempt) -> Dict:
+        return self.encode_attempts((attempt,))[0]
+
+    def encode_skill_states(self, skill_states: Dict[str, SkillState]) -> Dict[str, Dict]:
+        return dict(zip(skill_states, self._encode_skill_states(skill_states.values())))
+
+    def decode_skill_states(self, documents: Dict[str, Dict]) -> Dict[str, SkillState]:
+        return dict(zip(documents, self._decode_skill_states(documents.values())))
+
+    # Profiles
+
+    def encode(self, profile: UserProfile, include_history: bool = True, include_skill_states: bool = True) -> Dict:
+        """The stored document for a profile (optionally without history or skill states)"""
+        data = dict(zip(self.scalar_fields, self._scalar_values(profile)))
+        data['attempt_stats'] = dict(zip(self.stats_fields, self._stats_values(profile.attempt_stats)))
+        data['recent_attempts'] = self.encode_attempts(profile.recent_attempts)
+        data['answered_question_ids'] = list(profile.answered_question_ids)
+        with gc_paused():
+            if include_skill_states:
+                data['skill_states'] = self.encode_skill_states(profile.skill_states)
+            if include_history:
+                data['question_history'] = self.encode_attempts(profile.question_history)
+        return data
+
+    def decode(self, data: Dict) -> UserProfile:
+        """A profile from its stored document; summaries missing from old documents are derived from the history"""
+        with gc_paused():
+            skill_states = self.decode_skill_states(data['skill_states'])
+            question_history = self.decode_attempts(data.get('question_history', ()))
+        history_loaded = 'question_history' in data
+
+        if 'attempt_stats' in data:
+            attempt_stats = AttemptStats(**data['attempt_stats'])
+            recent_attempts = self.decode_attempts(data.get('recent_attempts', ()))
+        else:
+            attempt_stats = AttemptStats.from_history(question_history, skill_states)
+            recent_attempts = question_history[-RECENT_ATTEMPTS_WINDOW:]
+
+        answered_ids_loaded = 'answered_question_ids' in data
+        if answered_ids_loaded:
+            answered_question_ids = set(data['answered_question_ids'])
+        else:
+            answered_question_ids = {attempt.question_id for attempt in question_history}
+
+        scalars = {name: data[name] if name in data else default() for name, default in self.SCALAR_DEFAULTS}
+        return UserProfile(
+            user_id=data['user_id'],
+            created_at=data['created_at'],
+            last_updated=data['last_updated'],
+            skill_states=skill_states,
+            question_history=question_history,
+            attempt_stats=attempt_stats,
+            recent_attempts=deque(recent_attempts, maxlen=RECENT_ATTEMPTS_WINDOW),
+            answered_question_ids=answered_question_ids,
+            history_loaded=history_loaded,
+            answered_ids_loaded=answered_ids_loaded,
+            **scalars
+        )
+
+
+profile_codec = ProfileCodec()
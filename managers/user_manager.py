@@ -3,10 +3,13 @@ import os
 import time
 import logging
 import sys
-from typing import Dict, List, Optional
+from collections import deque
+from typing import Deque, Dict, Iterable, List, Optional, Sequence, Set, Tuple
 from dataclasses import dataclass, asdict, field
 from datetime import datetime
 
+from managers.attempt_columns import AttemptColumns
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -35,16 +38,67 @@ def calculate_grade_from_age(age: int) -> str:
     else:
         return f"GRADE_{age - 5}"
 
-@dataclass
+# Canonical skill-id tuples, shared by every record that names the same skills
+_SKILL_ID_TUPLES: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+
+def intern_skill_ids(skill_ids: Sequence[str]) -> Tuple[str, ...]:
+    """One shared tuple of interned strings per distinct skill-id combination"""
+    key = tuple(skill_ids)
+    shared = _SKILL_ID_TUPLES.get(key)
+    if shared is None:
+        shared = _SKILL_ID_TUPLES.setdefault(key, tuple(sys.intern(skill_id) for skill_id in key))
+    return shared
+
+@dataclass(slots=True)
 class QuestionAttempt:
     question_id: str
-    skill_ids: List[str]
+    skill_ids: Sequence[str]  # Stored as a shared interned tuple
     is_correct: bool
     response_time_seconds: float
     timestamp: float
     time_penalty_applied: bool = False
+    
+    def __post_init__(self):
+        # Histories repeat the same questions and skills; keep one copy of each id
+        self.question_id = sys.intern(self.question_id)
+        self.skill_ids = intern_skill_ids(self.skill_ids)
+
+# Number of most recent attempts kept on the profile for performance analysis
+RECENT_ATTEMPTS_WINDOW = 20
 
 @dataclass
+class AttemptStats:
+    """Rolling totals over a user's question history, updated on every attempt"""
+    total_questions: int = 0
+    correct_answers: int = 0
+    total_response_time: float = 0.0
+    time_penalties: int = 0
+    skills_practiced: int = 0
+    
+    def record(self, attempt: QuestionAttempt, newly_practiced_skills: int = 0):
+        self.total_questions += 1
+        if attempt.is_correct:
+            self.correct_answers += 1
+        self.total_response_time += attempt.response_time_seconds
+        if attempt.time_penalty_applied:
+            self.time_penalties += 1
+        self.skills_practiced += newly_practiced_skills
+    
+    def to_dict(self):
+        return asdict(self)
+    
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+    
+    @classmethod
+    def from_history(cls, question_history: List[QuestionAttempt], skill_states: Dict[str, 'SkillState']):
+        """Rebuild totals for profiles saved before rolling stats existed"""
+        stats = cls(**AttemptColumns.from_attempts(question_history).totals())
+        stats.skills_practiced = sum(1 for state in skill_states.values() if state.practice_count > 0)
+        return stats
+
+@dataclass(slots=True)
 class SkillState:
     memory_strength: float
     last_practice_time: Optional[float]
@@ -78,34 +132,43 @@ class UserProfile:
     student_notes: Dict = field(default_factory=dict)
     age: int = 5  # Default kindergarten age
     current_grade: str = "K"  # Calculated from age
+    next_review_at: Optional[float] = None  # Earliest time a practiced skill decays below threshold
+    # Grade whose cold-start template supplies every skill missing from skill_states
+    # (None for legacy profiles, whose missing skills start at 0.0)
+    skill_template_grade: Optional[str] = None
+    attempt_stats: AttemptStats = field(default_factory=AttemptStats)
+    recent_attempts: Deque[QuestionAttempt] = field(default_factory=lambda: deque(maxlen=RECENT_ATTEMPTS_WINDOW))
+    answered_question_ids: Set[str] = field(default_factory=set)
+    # False when loaded without question_history; the stored history is then left untouched on save
+    history_loaded: bool = True
+    # False when answered_question_ids was rebuilt from the history of a profile that predates
+    # the stored set; the whole set is then written on the next save instead of appended to
+    answered_ids_loaded: bool = True
+    # Bumped on every change to the student's learning state; cached selections are tagged with it
+    state_version: int = 0
+    # Attempts applied in memory but not yet saved (batched session writes); never persisted as a field
+    unsaved_attempts: List[QuestionAttempt] = field(default_factory=list)
     
-    def to_dict(self):
+    def history_columns(self) -> AttemptColumns:
+        """The loaded question_history in columnar form, for vectorized statistics"""
+        return AttemptColumns.from_attempts(self.question_history)
+    
+    def skill_state_fields(self, skill_ids: Iterable[str]) -> Dict[str, Dict]:
+        """Dotted skill_states.<skill_id> fields for a $set that writes only the given skills"""
         return {
-            'user_id': self.user_id,
-            'created_at': self.created_at,
-            'last_updated': self.last_updated,
-            'skill_states': {k: v.to_dict() for k, v in self.skill_states.items()},
-            'question_history': [asdict(attempt) for attempt in self.question_history],
-            'student_notes': self.student_notes,
-            'age': self.age,
-            'current_grade': self.current_grade
+            f'skill_states.{skill_id}': self.skill_states[skill_id].to_dict()
+            for skill_id in skill_ids
+            if skill_id in self.skill_states
         }
     
+    def to_dict(self, include_history: bool = True, include_skill_states: bool = True):
+        from managers.profile_codec import profile_codec
+        return profile_codec.encode(self, include_history, include_skill_states)
+    
     @classmethod
     def from_dict(cls, data):
-        skill_states = {k: SkillState.from_dict(v) for k, v in data['skill_states'].items()}
-        question_history = [QuestionAttempt(**attempt) for attempt in data['question_history']]
-        
-        return cls(
-            user_id=data['user_id'],
-            created_at=data['created_at'],
-            last_updated=data['last_updated'],
-            skill_states=skill_states,
-            question_history=question_history,
-            student_notes=data.get('student_notes', {}),
-            age=data.get('age', 5),
-            current_grade=data.get('current_grade', 'K')
-        )
+        from managers.profile_codec import profile_codec
+        return profile_codec.decode(data)
 
 class UserManager:
     def __init__(self, users_folder: str = "Users", use_mongodb: bool = True):
@@ -129,65 +192,6 @@ class UserManager:
             os.makedirs(self.users_folder)
             logger.info(f"[FOLDER] Created {self.users_folder} folder for user data")
     
-    def initialize_skills_for_grade(
-        self, 
-        current_grade_str: str, 
-        all_skills: Dict[str, 'Skill']
-    ) -> Dict[str, SkillState]:
-        """
-        Initialize skill states based on student's current grade (cold-start).
-        
-        Logic:
-        - Skills BELOW current grade: memory_strength = 2.0 (probability ~0.88)
-        - Skills AT current grade: memory_strength = 0.0 (probability ~0.50)
-        - Skills ABOVE current grade: memory_strength = -2.0 (probability ~0.12)
-        
-        Using memory_strength values that map to meaningful probabilities via sigmoid.
-        """
-        from services.DashSystem.dash_system import GradeLevel
-        
-        try:
-            current_grade = GradeLevel[current_grade_str]
-        except KeyError:
-            logger.warning(f"[COLD_START] Invalid grade '{current_grade_str}', defaulting to K")
-            current_grade = GradeLevel.K
-        
-        skill_states = {}
-        below_grade_count = 0
-        at_grade_count = 0
-        above_grade_count = 0
-        
-        for skill_id, skill in all_skills.items():
-            skill_grade_value = skill.grade_level.value
-            current_grade_value = current_grade.value
-            
-            if skill_grade_value < current_grade_value:
-                # Below current grade - assumed mastered
-                memory_strength = 2.0  # sigmoid(2.0) ≈ 0.88
-                below_grade_count += 1
-            elif skill_grade_value == current_grade_value:
-                # At current grade - currently learning
-                memory_strength = 0.0  # sigmoid(0.0) = 0.50
-                at_grade_count += 1
-            else:
-                # Above current grade - not ready yet
-                memory_strength = -2.0  # sigmoid(-2.0) ≈ 0.12
-                above_grade_count += 1
-            
-            skill_states[skill_id] = SkillState(
-                memory_strength=memory_strength,
-                last_practice_time=None,
-                practice_count=0,
-                correct_count=0
-            )
-        
-        logger.info(f"[COLD_START] Initialized skills for grade {current_grade_str}:")
-        logger.info(f"  Below grade ({current_grade_value}): {below_grade_count} skills at memory_strength=2.0")
-        logger.info(f"  At grade ({current_grade_value}): {at_grade_count} skills at memory_strength=0.0")
-        logger.info(f"  Above grade ({current_grade_value}): {above_grade_count} skills at memory_strength=-2.0")
-        
-        return skill_states
-    
     def get_user_file_path(self, user_id: str) -> str:
         """Get the file path for a user's JSON file"""
         return os.path.join(self.users_folder, f"{user_id}.json")
@@ -215,45 +219,50 @@ class UserManager:
         current_time = time.time()
         current_grade = calculate_grade_from_age(age)
         
-        # Initialize skills based on grade if all_skills provided
+        # Skills start from the grade's cold-start template; only practiced skills get stored
         if all_skills:
-            skill_states = self.initialize_skills_for_grade(current_grade, all_skills)
+            skill_template_grade = current_grade
             logger.info(f"[USER] Created new user with cold-start: {user_id} (age {age}, grade {current_grade})")
         else:
-            # Fallback to old behavior for backward compatibility
-            skill_states = {}
-            skill_ids = all_skill_ids or []
-            for skill_id in skill_ids:
-                skill_states[skill_id] = SkillState(
-                    memory_strength=0.0,
-                    last_practice_time=None,
-                    practice_count=0,
-                    correct_count=0
-                )
+            # Fallback to old behavior for backward compatibility (every skill at 0.0)
+            skill_template_grade = None
             logger.info(f"[USER] Created new user (legacy mode): {user_id}")
         
         user_profile = UserProfile(
             user_id=user_id,
             created_at=current_time,
             last_updated=current_time,
-            skill_states=skill_states,
+            skill_states={},
             question_history=[],
             student_notes={},
             age=age,
-            current_grade=current_grade
+            current_grade=current_grade,
+            skill_template_grade=skill_template_grade
         )
         
         self.save_user(user_profile)
         return user_profile
     
-    def load_user(self, user_id: str) -> Optional[UserProfile]:
-        """Load a user profile from MongoDB only"""
+    def load_user(self, user_id: str, include_history: bool = True) -> Optional[UserProfile]:
+        """
+        Load a user profile from MongoDB only.
+        
+        With include_history=False the question_history array is not fetched; rolling stats,
+        recent attempts and the answered-question set cover the hot paths instead.
+        """
         
         if not self.use_mongodb or not self.mongo:
             raise RuntimeError("MongoDB is required. Please configure MONGODB_URI in .env file.")
         
         try:
-            data = self.mongo.users.find_one({"user_id": user_id})
+            projection = None if include_history else {"question_history": 0}
+            data = self.mongo.users.find_one({"user_id": user_id}, projection)
+            
+            if data and not include_history and not all(
+                key in data for key in ('attempt_stats', 'recent_attempts', 'answered_question_ids')
+            ):
+                # Profile predates the history summaries: derive them from the full history once
+                data = self.mongo.users.find_one({"user_id": user_id})
             
             if not data:
                 return None
@@ -269,35 +278,73 @@ class UserManager:
             logger.error(f"[ERROR] Error loading user {user_id} from MongoDB: {e}")
             raise RuntimeError(f"Failed to load user from MongoDB: {e}. Local fallback disabled.")
     
+    def load_history_columns(self, user_id: str) -> Optional[AttemptColumns]:
+        """Fetch only a user's question_history, straight into columns (no QuestionAttempt objects)"""
+        if not self.use_mongodb or not self.mongo:
+            raise RuntimeError("MongoDB is required. Please configure MONGODB_URI in .env file.")
+        
+        try:
+            data = self.mongo.users.find_one({"user_id": user_id}, {"_id": 0, "question_history": 1})
+        except Exception as e:
+            logger.error(f"[ERROR] Error loading history for {user_id} from MongoDB: {e}")
+            raise RuntimeError(f"Failed to load user from MongoDB: {e}. Local fallback disabled.")
+        
+        if data is None:
+            return None
+        return AttemptColumns.from_documents(data.get('question_history', []))
+    
     def save_user(self, user_profile: UserProfile):
         """Save a user profile to MongoDB only"""
         user_profile.last_updated = time.time()
+        user_profile.state_version += 1
         
         if not self.use_mongodb or not self.mongo:
             raise RuntimeError("MongoDB is required. Please configure MONGODB_URI in .env file.")
         
         try:
-            # Use upsert to create or update
+            # Use upsert to create or update; history is only written when it was loaded
             result = self.mongo.users.update_one(
                 {"user_id": user_profile.user_id},
-                {"$set": user_profile.to_dict()},
+                {"$set": user_profile.to_dict(include_history=user_profile.history_loaded)},
                 upsert=True
             )
+            user_profile.answered_ids_loaded = True
             # logger.info(f"[MONGODB] Saved user: {user_profile.user_id}")
             
         except Exception as e:
             logger.error(f"[ERROR] Error saving user {user_profile.user_id} to MongoDB: {e}")
             raise RuntimeError(f"Failed to save user to MongoDB: {e}. Local fallback disabled.")
     
+    def save_skill_states(self, user_profile: UserProfile, skill_ids: Iterable[str]):
+        """Save only the given skills' states (plus next_review_at) instead of the whole profile"""
+        user_profile.last_updated = time.time()
+        
+        if not self.use_mongodb or not self.mongo:
+            raise RuntimeError("MongoDB is required. Please configure MONGODB_URI in .env file.")
+        
+        fields = user_profile.skill_state_fields(skill_ids)
+        fields['next_review_at'] = user_profile.next_review_at
+        fields['last_updated'] = user_profile.last_updated
+        try:
+            self.mongo.users.update_one(
+                {"user_id": user_profile.user_id},
+                {"$set": fields},
+                upsert=True
+            )
+        except Exception as e:
+            logger.error(f"[ERROR] Error saving skill states for {user_profile.user_id} to MongoDB: {e}")
+            raise RuntimeError(f"Failed to save user to MongoDB: {e}. Local fallback disabled.")
+    
     def get_or_create_user(
         self, 
         user_id: str, 
         all_skill_ids: List[str] = None,
         all_skills: Dict = None,
-        age: int = None  # Made optional - will use existing age from MongoDB or default to 7
+        age: int = None,  # Made optional - will use existing age from MongoDB or default to 7
+        include_history: bool = True
     ) -> UserProfile:
         """Get existing user or create new one with cold-start if doesn't exist"""
-        user_profile = self.load_user(user_id)
+        user_profile = self.load_user(user_id, include_history=include_history)
         
         if user_profile is None:
             # User doesn't exist - create new one
@@ -311,26 +358,31 @@ class UserManager:
             # User exists - use their existing age from MongoDB
             logger.info(f"[EXISTING_USER] Loaded user {user_id} with age: {user_profile.age}")
             
-            # Check if any new skills need to be added (for existing users)
-            if all_skill_ids:
-                missing_skills = set(all_skill_ids) - set(user_profile.skill_states.keys())
-                if missing_skills:
-                    for skill_id in missing_skills:
-                        user_profile.skill_states[skill_id] = SkillState(
-                            memory_strength=0.0,
-                            last_practice_time=None,
-                            practice_count=0,
-                            correct_count=0
-                        )
-                    logger.info(f"[ADDED] Added {len(missing_skills)} new skills to user {user_id}")
-                    self.save_user(user_profile)
+            # Skills added to the catalog since need no backfill: missing skills come from the template
         
         return user_profile
     
     def add_question_attempt(self, user_profile: UserProfile, question_id: str, 
                            skill_ids: List[str], is_correct: bool, 
-                           response_time_seconds: float, time_penalty_applied: bool = False):
-        """Add a question attempt to user's history"""
+                           response_time_seconds: float, time_penalty_applied: bool = False,
+                           updated_skill_ids: Optional[Iterable[str]] = None):
+        """
+        Add a question attempt to user's history and rolling statistics.
+        Expects the attempt's skill_states to be updated already, so a practice_count
+        of 1 marks a skill practiced for the first time.
+        
+        If updated_skill_ids is given, only those skill states are written with the
+        attempt; otherwise all skill states are.
+        """
+        attempt = self.apply_question_attempt(
+            user_profile, question_id, skill_ids, is_correct, response_time_seconds, time_penalty_applied
+        )
+        self.save_question_attempts(user_profile, [attempt], updated_skill_ids)
+    
+    def apply_question_attempt(self, user_profile: UserProfile, question_id: str,
+                               skill_ids: List[str], is_correct: bool,
+                               response_time_seconds: float, time_penalty_applied: bool = False) -> QuestionAttempt:
+        """Add a question attempt to the in-memory profile only; save it with save_question_attempts"""
         attempt = QuestionAttempt(
             question_id=question_id,
             skill_ids=skill_ids,
@@ -340,13 +392,55 @@ class UserManager:
             time_penalty_applied=time_penalty_applied
         )
         
+        newly_practiced_skills = sum(
+            1 for skill_id in set(skill_ids)
+            if skill_id in user_profile.skill_states and user_profile.skill_states[skill_id].practice_count == 1
+        )
+        
         user_profile.question_history.append(attempt)
-        self.save_user(user_profile)
+        user_profile.recent_attempts.append(attempt)
+        user_profile.answered_question_ids.add(question_id)
+        user_profile.attempt_stats.record(attempt, newly_practiced_skills)
+        user_profile.last_updated = time.time()
+        user_profile.state_version += 1
+        return attempt
+    
+    def save_question_attempts(self, user_profile: UserProfile, attempts: Sequence[QuestionAttempt],
+                               updated_skill_ids: Optional[Iterable[str]] = None):
+        """
+        Append attempts already applied to the profile to the stored history, in one
+        write together with the profile's summaries and skill states (only
+        updated_skill_ids, if given).
+        """
+        if not self.use_mongodb or not self.mongo:
+            raise RuntimeError("MongoDB is required. Please configure MONGODB_URI in .env file.")
+        
+        # Append to the stored history instead of rewriting it
+        from managers.profile_codec import profile_codec
+        if updated_skill_ids is None:
+            fields = user_profile.to_dict(include_history=False)
+        else:
+            fields = user_profile.to_dict(include_history=False, include_skill_states=False)
+            fields.update(user_profile.skill_state_fields(updated_skill_ids))
+        update = {
+            "$set": fields,
+            "$push": {"question_history": {"$each": profile_codec.encode_attempts(attempts)}}
+        }
+        if user_profile.answered_ids_loaded:
+            fields.pop('answered_question_ids')
+            update["$addToSet"] = {"answered_question_ids": {"$each": [attempt.question_id for attempt in attempts]}}
+        # Otherwise the set was rebuilt from the history and is not stored yet: $set all of it once
+        try:
+            self.mongo.users.update_one({"user_id": user_profile.user_id}, update, upsert=True)
+        except Exception as e:
+            logger.error(f"[ERROR] Error saving attempt for {user_profile.user_id} to MongoDB: {e}")
+            raise RuntimeError(f"Failed to save user to MongoDB: {e}. Local fallback disabled.")
+        user_profile.answered_ids_loaded = True
     
     def get_user_stats(self, user_profile: UserProfile) -> Dict:
-        """Get summary statistics for a user"""
-        total_questions = len(user_profile.question_history)
-        correct_answers = sum(1 for attempt in user_profile.question_history if attempt.is_correct)
+        """Get summary statistics for a user from the profile's rolling counters"""
+        stats = user_profile.attempt_stats
+        total_questions = stats.total_questions
         
         if total_questions == 0:
             return {
@@ -358,19 +452,39 @@ class UserManager:
                 'skills_practiced': 0
             }
         
-        avg_response_time = sum(attempt.response_time_seconds for attempt in user_profile.question_history) / total_questions
-        time_penalties = sum(1 for attempt in user_profile.question_history if attempt.time_penalty_applied)
-        skills_practiced = len([skill_id for skill_id, state in user_profile.skill_states.items() if state.practice_count > 0])
-        
         return {
             'total_questions': total_questions,
-            'correct_answers': correct_answers,
-            'accuracy': correct_answers / total_questions,
-            'avg_response_time': avg_response_time,
-            'time_penalties': time_penalties,
-            'skills_practiced': skills_practiced
+            'correct_answers': stats.correct_answers,
+            'accuracy': stats.correct_answers / total_questions,
+            'avg_response_time': stats.total_response_time / total_questions,
+            'time_penalties': stats.time_penalties,
+            'skills_practiced': stats.skills_practiced
         }
     
+    def find_users_due_for_review(self, before: Optional[float] = None, limit: int = 0) -> List[Dict]:
+        """
+        Find users with at least one practiced skill due for review by `before` (default: now),
+        using the persisted next_review_at so no profiles or skill states are loaded.
+        
+        Returns:
+            List of {'user_id', 'next_review_at'} sorted by next_review_at
+        """
+        if not self.use_mongodb or not self.mongo:
+            raise RuntimeError("MongoDB is required. Please configure MONGODB_URI in .env file.")
+        
+        if before is None:
+            before = time.time()
+        
+        try:
+            cursor = self.mongo.users.find(
+                {"next_review_at": {"$lte": before}},
+                {"_id": 0, "user_id": 1, "next_review_at": 1}
+            ).sort("next_review_at", 1).limit(limit)
+            return list(cursor)
+        except Exception as e:
+            logger.error(f"[ERROR] Error finding users due for review: {e}")
+            raise RuntimeError(f"Failed to query users due for review: {e}")
+    
     def list_all_users(self) -> List[str]:
         """Get list of all user IDs"""
         if not os.path.exists(self.users_folder):
@@ -432,25 +546,18 @@ class UserManager:
         # Calculate grade from age
         current_grade = calculate_grade_from_age(age)
         
-        # Get all skills for cold-start initialization
-        from services.DashSystem.dash_system import DASHSystem
-        dash_system = DASHSystem()
-        all_skills = dash_system.skills
-        
-        # Initialize skills based on grade
-        skill_states = self.initialize_skills_for_grade(current_grade, all_skills)
-        
         current_time = time.time()
         
         user_profile = UserProfile(
             user_id=user_id,
             created_at=current_time,
             last_updated=current_time,
-            skill_states=skill_states,
+            skill_states={},
             question_history=[],
             student_notes={},
             age=age,
-            current_grade=current_grade
+            current_grade=current_grade,
+            skill_template_grade=current_grade  # Cold-start from the grade template
         )
         
         # Save to MongoDB with Google OAuth fields
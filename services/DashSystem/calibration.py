@@ -0,0 +1,328 @@
+"""
+Offline Calibration of DASH Skill Parameters
+Fits each skill's forgetting_rate and difficulty to the recorded attempt history.
+
+Users are streamed, never loaded all at once: each user's question_history is
+replayed by the ReplayEngine (current update rules) to get one row per answered skill
+(its stored strength, the time since it was last practiced and the outcome).
+Rows are spooled to disk in fixed-size chunks, and every optimisation step works
+on one chunk with per-skill gradients from np.bincount, so memory is bounded by
+the chunk size however many attempts there are.
+
+Strengths are replayed under the catalog's current parameters, so applying a
+calibrated version and calibrating again refines the fit further.
+"""
+
+import logging
+import os
+import tempfile
+import time
+import zlib
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+from services.DashSystem.skill_engine import SkillCatalog, StudentSkillArrays
+from services.DashSystem.knowledge_models import DASHModel, KnowledgeTracingModel
+from services.DashSystem.replay import ReplayEngine
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = int(os.getenv("DASH_CALIBRATION_CHUNK_SIZE", "500000"))
+
+# Fitted parameters are kept inside these bounds
+MIN_FORGETTING_RATE = 1e-9
+MAX_FORGETTING_RATE = 10.0
+MAX_ABS_DIFFICULTY = 5.0
+
+
+@dataclass
+class AttemptChunk:
+    """
+    Aligned rows, one per (attempt, skill): the skill ordinal, the strength stored at its
+    last practice, the seconds elapsed since then (NaN if never practiced) and the outcome.
+    """
+    skill: np.ndarray
+    strength: np.ndarray
+    elapsed: np.ndarray
+    correct: np.ndarray
+
+    @property
+    def size(self) -> int:
+        return len(self.skill)
+
+
+class AttemptFeatureBuilder:
+    """Replays user histories with a ReplayEngine and emits AttemptChunks"""
+
+    def __init__(self, catalog: SkillCatalog, model: Optional[KnowledgeTracingModel] = None,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.replay_engine = ReplayEngine(catalog, model)
+        self.chunk_size = chunk_size
+        self._clear()
+
+    def _clear(self):
+        self._skill: List[int] = []
+        self._strength: List[float] = []
+        self._elapsed: List[float] = []
+        self._correct: List[bool] = []
+
+    def _observe(self, state: StudentSkillArrays, ordinals: List[int], attempt: dict):
+        # Features are taken before the answer updates any of its skills
+        t = float(attempt['timestamp'])
+        is_correct = bool(attempt['is_correct'])
+        for i in ordinals:
+            self._skill.append(i)
+            self._strength.append(float(state.memory_strength[i]))
+            self._elapsed.append(t - float(state.last_practice_time[i]))
+            self._correct.append(is_correct)
+
+    def add_user(self, user_doc: dict) -> Iterator[AttemptChunk]:
+        """Replay one user's history; yields a chunk if it filled up"""
+        self.replay_engine.replay(user_doc, observer=self._observe)
+        if len(self._skill) >= self.chunk_size:
+            yield self.flush()
+
+    def flush(self) -> AttemptChunk:
+        """The rows collected so far as a chunk (compact dtypes), then start a new one"""
+        chunk = AttemptChunk(
+            skill=np.array(self._skill, dtype=np.int32),
+            strength=np.array(self._strength, dtype=np.float32),
+            elapsed=np.array(self._elapsed, dtype=np.float32),
+            correct=np.array(self._correct, dtype=bool)
+        )
+        self._clear()
+        return chunk
+
+    @property
+    def pending(self) -> int:
+        return len(self._skill)
+
+
+class ChunkSpool:
+    """AttemptChunks saved as .npz files in a directory, re-readable once per epoch"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.paths: List[str] = []
+        self.rows = 0
+
+    def write(self, chunk: AttemptChunk):
+        if chunk.size == 0:
+            return
+        path = os.path.join(self.directory, f"chunk_{len(self.paths):06d}.npz")
+        np.savez(path, skill=chunk.skill, strength=chunk.strength, elapsed=chunk.elapsed, correct=chunk.correct)
+        self.paths.append(path)
+        self.rows += chunk.size
+
+    def __iter__(self) -> Iterator[AttemptChunk]:
+        for path in self.paths:
+            with np.load(path) as data:
+                yield AttemptChunk(data['skill'], data['strength'], data['elapsed'], data['correct'])
+
+
+@dataclass
+class CalibrationResult:
+    """Fitted parameters (aligned with the catalog) and fit diagnostics"""
+    forgetting_rate: np.ndarray
+    difficulty: np.ndarray
+    attempts: np.ndarray  # training rows per skill
+    fitted: np.ndarray  # skills with enough rows to be fitted; the rest keep their current values
+    users: int
+    train_rows: int
+    holdout_rows: int
+    log_loss: Dict[str, Dict[str, float]]  # {'train'|'holdout': {'before': ..., 'after': ...}}
+    timings: Dict[str, float] = field(default_factory=dict)
+
+    def summary(self) -> Dict[str, object]:
+        return {
+            'users': self.users,
+            'train_rows': self.train_rows,
+            'holdout_rows': self.holdout_rows,
+            'fitted_skills': int(self.fitted.sum()),
+            'log_loss': self.log_loss,
+            'timings': self.timings
+        }
+
+
+class SkillCalibrator:
+    """
+    Maximum-likelihood fit of per-skill (forgetting_rate, difficulty) under
+    P(correct) = sigmoid(m * exp(-forgetting_rate * dt) - difficulty),
+    by Adam on minibatch chunks, with log(forgetting_rate) as the free parameter
+    and an L2 pull towards the current values so sparse skills stay put.
+    Users whose id hashes into holdout_fraction are kept out of training and used
+    to report an out-of-sample log-loss.
+    """
+
+    def __init__(
+        self,
+        catalog: SkillCatalog,
+        model: Optional[KnowledgeTracingModel] = None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        epochs: int = 5,
+        learning_rate: float = 0.05,
+        l2: float = 0.01,
+        min_attempts: int = 50,
+        holdout_fraction: float = 0.1
+    ):
+        self.catalog = catalog
+        self.model = model
+        self.chunk_size = chunk_size
+        self.epochs = epochs
+        self.learning_rate = learning_rate
+        self.l2 = l2
+        self.min_attempts = min_attempts
+        self.holdout_fraction = holdout_fraction
+
+    def is_holdout(self, user_id: str) -> bool:
+        """Stable per-user split, so every run holds out the same students"""
+        return (zlib.crc32(user_id.encode("utf-8")) % 10000) < self.holdout_fraction * 10000
+
+    def run(self, user_docs: Iterable[dict], work_dir: Optional[str] = None) -> CalibrationResult:
+        """Extract features from user_docs (read once), fit, and evaluate before/after"""
+        timings = {}
+        with tempfile.TemporaryDirectory(dir=work_dir, prefix="dash_calibration_") as directory:
+            train_dir = os.path.join(directory, "train")
+            holdout_dir = os.path.join(directory, "holdout")
+            os.makedirs(train_dir)
+            os.makedirs(holdout_dir)
+            train, holdout = ChunkSpool(train_dir), ChunkSpool(holdout_dir)
+
+            start = time.perf_counter()
+            users = self._spool_features(user_docs, train, holdout)
+            timings['replay_seconds'] = time.perf_counter() - start
+            logger.info(f"[CALIBRATION] Replayed {users} users into {train.rows} training and {holdout.rows} holdout rows "
+                        f"in {timings['replay_seconds']:.1f}s")
+
+            attempts = np.zeros(self.catalog.size, dtype=np.int64)
+            for chunk in train:
+                attempts += np.bincount(chunk.skill, minlength=self.catalog.size)
+            fitted = attempts >= self.min_attempts
+
+            start = time.perf_counter()
+            forgetting_rate, difficulty = self._fit(train, fitted)
+            timings['fit_seconds'] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            prior = (self.catalog.forgetting_rate, self.catalog.difficulty)
+            log_loss = {}
+            for name, spool in (('train', train), ('holdout', holdout)):
+                before, after = self.log_loss(spool, [prior, (forgetting_rate, difficulty)])
+                log_loss[name] = {'before': before, 'after': after}
+            timings['evaluate_seconds'] = time.perf_counter() - start
+
+        total_rows = train.rows + holdout.rows
+        timings['total_seconds'] = sum(timings.values())
+        timings['rows_per_second'] = total_rows / timings['total_seconds'] if timings['total_seconds'] > 0 else 0.0
+        logger.info(f"[CALIBRATION] Fitted {int(fitted.sum())}/{self.catalog.size} skills | "
+                    f"holdout log-loss {log_loss['holdout']['before']:.4f} -> {log_loss['holdout']['after']:.4f} | "
+                    f"{timings['total_seconds']:.1f}s")
+
+        return CalibrationResult(
+            forgetting_rate=forgetting_rate,
+            difficulty=difficulty,
+            attempts=attempts,
+            fitted=fitted,
+            users=users,
+            train_rows=train.rows,
+            holdout_rows=holdout.rows,
+            log_loss=log_loss,
+            timings=timings
+        )
+
+    def _spool_features(self, user_docs: Iterable[dict], train: ChunkSpool, holdout: ChunkSpool) -> int:
+        builders = {
+            False: (AttemptFeatureBuilder(self.catalog, self.model, self.chunk_size), train),
+            True: (AttemptFeatureBuilder(self.catalog, self.model, self.chunk_size), holdout)
+        }
+        users = 0
+        for user_doc in user_docs:
+            builder, spool = builders[self.is_holdout(str(user_doc.get('user_id', '')))]
+            for chunk in builder.add_user(user_doc):
+                spool.write(chunk)
+            users += 1
+        for builder, spool in builders.values():
+            if builder.pending:
+                spool.write(builder.flush())
+        return users
+
+    def _fit(self, train: ChunkSpool, fitted: np.ndarray):
+        """Adam over (log forgetting_rate, difficulty); skills not in fitted keep their current values"""
+        prior_log_rate = np.log(np.clip(self.catalog.forgetting_rate, MIN_FORGETTING_RATE, MAX_FORGETTING_RATE))
+        prior_difficulty = self.catalog.difficulty.copy()
+        params = np.stack((prior_log_rate, prior_difficulty))
+        first_moment = np.zeros_like(params)
+        second_moment = np.zeros_like(params)
+        beta1, beta2, eps = 0.9, 0.999, 1e-8
+        steps = np.zeros(self.catalog.size, dtype=np.int64)
+        size = self.catalog.size
+
+        for epoch in range(self.epochs):
+            for chunk in train:
+                counts = np.bincount(chunk.skill, minlength=size)
+                active = (counts > 0) & fitted
+                if not active.any():
+                    continue
+
+                grad_z, decayed_rate_term = self._gradients(chunk, np.exp(params[0]), params[1])
+                grad = np.stack((
+                    np.bincount(chunk.skill, weights=grad_z * decayed_rate_term, minlength=size),
+                    np.bincount(chunk.skill, weights=-grad_z, minlength=size)
+                ))
+                grad /= np.maximum(counts, 1)
+                grad[0] += self.l2 * (params[0] - prior_log_rate)
+                grad[1] += self.l2 * (params[1] - prior_difficulty)
+
+                # Per-skill Adam: only skills seen in this chunk take a step
+                steps[active] += 1
+                first_moment[:, active] = beta1 * first_moment[:, active] + (1 - beta1) * grad[:, active]
+                second_moment[:, active] = beta2 * second_moment[:, active] + (1 - beta2) * grad[:, active] ** 2
+                m_hat = first_moment[:, active] / (1 - beta1 ** steps[active])
+                v_hat = second_moment[:, active] / (1 - beta2 ** steps[active])
+                params[:, active] -= self.learning_rate * m_hat / (np.sqrt(v_hat) + eps)
+
+                params[0] = np.clip(params[0], np.log(MIN_FORGETTING_RATE), np.log(MAX_FORGETTING_RATE))
+                params[1] = np.clip(params[1], -MAX_ABS_DIFFICULTY, MAX_ABS_DIFFICULTY)
+
+            logger.info(f"[CALIBRATION] Epoch {epoch + 1}/{self.epochs} done")
+
+        forgetting_rate = np.where(fitted, np.exp(params[0]), self.catalog.forgetting_rate)
+        difficulty = np.where(fitted, params[1], self.catalog.difficulty)
+        return forgetting_rate, difficulty
+
+    @staticmethod
+    def _logits(chunk: AttemptChunk, forgetting_rate: np.ndarray, difficulty: np.ndarray):
+        """Logits and the decayed strengths (never-practiced rows keep their stored strength)"""
+        skill = chunk.skill
+        strength = chunk.strength.astype(np.float64)
+        elapsed = chunk.elapsed.astype(np.float64)
+        practiced = ~np.isnan(elapsed)
+        decay = np.ones_like(strength)
+        decay[practiced] = np.exp(-forgetting_rate[skill[practiced]] * elapsed[practiced])
+        decayed = strength * decay
+        return decayed - difficulty[skill], decayed, np.where(practiced, elapsed, 0.0)
+
+    def _gradients(self, chunk: AttemptChunk, forgetting_rate: np.ndarray, difficulty: np.ndarray):
+        """dLoss/dlogit per row, and dlogit/dlog(forgetting_rate) per row"""
+        logits, decayed, elapsed = self._logits(chunk, forgetting_rate, difficulty)
+        grad_z = DASHModel._sigmoid(logits) - chunk.correct
+        # d/dlog(rate) of m * exp(-rate * dt) = -m * exp(-rate * dt) * rate * dt
+        decayed_rate_term = -decayed * forgetting_rate[chunk.skill] * elapsed
+        return grad_z, decayed_rate_term
+
+    def log_loss(self, spool: ChunkSpool, parameter_sets) -> List[float]:
+        """Mean log-loss of each (forgetting_rate, difficulty) set over the spooled rows, in one pass"""
+        totals = np.zeros(len(parameter_sets))
+        rows = 0
+        for chunk in spool:
+            rows += chunk.size
+            for k, (forgetting_rate, difficulty) in enumerate(parameter_sets):
+                logits = self._logits(chunk, forgetting_rate, difficulty)[0]
+                # -log sigmoid(z) for correct rows, -log sigmoid(-z) for wrong ones
+                signed = np.where(chunk.correct, logits, -logits)
+                totals[k] += np.logaddexp(0.0, -signed).sum()
+        if rows == 0:
+            return [float('nan')] * len(parameter_sets)
+        return [float(total / rows) for total in totals]
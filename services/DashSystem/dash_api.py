@@ -2,13 +2,17 @@ import time
 import sys
 import os
 import json
+import asyncio
+import anyio
 import glob
 import random
 import logging
+import threading
 from typing import List, Dict, Optional
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import BackgroundTasks, FastAPI, HTTPException, Path, Request, WebSocket, WebSocketDisconnect, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, ValidationError
 
 # Configure logging
 logging.basicConfig(
@@ -24,10 +28,58 @@ logger = logging.getLogger(__name__)
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 
 from services.DashSystem.dash_system import DASHSystem, Question
-from shared.auth_middleware import get_current_user
+from services.DashSystem.session import TutoringSession
+from services.DashSystem.question_cache import (
+    PrecomputedQuestions, PrecomputedQuestionCache, SessionPlanCache, DEFAULT_PRECOMPUTE_COUNT
+)
+from services.DashSystem.single_flight import SingleFlight
+from managers.user_manager import UserProfile
+from shared.auth_middleware import get_current_user, get_user_from_token
 
 app = FastAPI()
 dash_system = DASHSystem()
+# Next questions selected in the background after each answer
+precomputed_questions = PrecomputedQuestionCache()
+# Planned sessions for /api/questions: identical concurrent requests share one computation,
+# and repeats for an unchanged state are served from a short-lived cache
+session_plan_requests = SingleFlight()
+session_plans = SessionPlanCache()
+# Most questions one request may plan (selection runs under the student's lock)
+MAX_QUESTIONS_PER_REQUEST = int(os.getenv("DASH_MAX_QUESTIONS_PER_REQUEST", "50"))
+
+# How often catalog changes in MongoDB (new or generated questions) are picked up; 0 disables
+CATALOG_REFRESH_SECONDS = float(os.getenv("DASH_CATALOG_REFRESH_SECONDS", "300"))
+
+def queue_question_generation(student_id: str, skill_id: str):
+    """
+    on_pool_exhausted hook: record the skill in question_generation_requests, which
+    services/tools/generate_questions_for_exhausted_skills.py works through
+    """
+    try:
+        dash_system.mongo.question_generation_requests.update_one(
+            {"skill_id": skill_id},
+            {"$inc": {"exhausted_count": 1}, "$set": {"last_exhausted_at": time.time()}},
+            upsert=True
+        )
+        logger.info(f"[GENERATION_QUEUED] {skill_id} (pool exhausted by {student_id})")
+    except Exception as e:
+        logger.error(f"[ERROR] Failed to queue question generation for {skill_id}: {e}")
+
+dash_system.on_pool_exhausted = queue_question_generation
+
+def refresh_catalog_periodically():
+    """Background loop adding questions written to MongoDB since startup"""
+    while True:
+        time.sleep(CATALOG_REFRESH_SECONDS)
+        try:
+            dash_system.refresh_catalog()
+        except Exception as e:
+            logger.error(f"[ERROR] Catalog refresh failed: {e}")
+
+@app.on_event("startup")
+def start_catalog_refresh():
+    if CATALOG_REFRESH_SECONDS > 0:
+        threading.Thread(target=refresh_catalog_periodically, name="dash-catalog-refresh", daemon=True).start()
 
 # Configure CORS - allow all origins
 app.add_middleware(
@@ -233,7 +285,7 @@ def load_perseus_items_from_dir(directory: str, limit: Optional[int] = None) ->
     return all_items
 
 @app.get("/api/questions/{sample_size}", response_model=List[PerseusQuestion])
-def get_questions_with_dash_intelligence(request: Request, sample_size: int):
+def get_questions_with_dash_intelligence(request: Request, sample_size: int = Path(ge=1, le=MAX_QUESTIONS_PER_REQUEST)):
     """
     Gets questions using DASH intelligence but returns full Perseus items.
     Uses DASH to intelligently select questions based on learning journey and adaptive difficulty.
@@ -249,32 +301,51 @@ def get_questions_with_dash_intelligence(request: Request, sample_size: int):
     logger.info(f"[NEW_SESSION] Requesting {sample_size} questions for user: {user_id}")
     logger.info(f"{'='*80}\n")
     
-    # Ensure the user exists and is loaded (age comes from MongoDB)
-    user_profile = dash_system.load_user_or_create(user_id)
-    
-    # Use DASH intelligence with flexible selection to get ALL questions
-    current_time = time.time()
-    selected_questions = []
-    selected_question_ids = []  # Track selected question IDs to avoid duplicates
-    
-    # Get multiple questions using DASH flexible intelligence
-    for i in range(sample_size):
-        # Use flexible selection that expands to grade-appropriate skills when needed
-        next_question = dash_system.get_next_question_flexible(
-            user_id, 
-            current_time, 
-            exclude_question_ids=selected_question_ids
-        )
-        if next_question:
-            selected_questions.append(next_question)
-            selected_question_ids.append(next_question.question_id)  # Track to avoid duplicates
-        else:
-            logger.info(f"[SESSION_END] Selected {len(selected_questions)}/{sample_size} questions (no more available)")
-            break
-    
-    # Load Perseus items from MongoDB for all DASH-selected questions
+    # Duplicate requests (double-mounted pages, client retries) wait for the one already running
+    return session_plan_requests.do((user_id, sample_size), plan_questions, user_id, sample_size)
+
+def plan_questions(user_id: str, sample_size: int) -> List[Dict]:
+    """Select sample_size questions for a student and load their Perseus items"""
+    with dash_system.user_locks.hold(user_id):
+        # Ensure the user exists and is loaded (age comes from MongoDB)
+        user_profile = dash_system.load_user_or_create(user_id)
+        current_time = time.time()
+        
+        # The same request for an unchanged state and catalog gets the plan served moments ago
+        plan_key = (user_id, sample_size, user_profile.state_version, dash_system.catalog_version)
+        planned_items = session_plans.get(plan_key)
+        if planned_items is not None:
+            logger.info(f"[PLAN_CACHE] Served {len(planned_items)} Perseus questions planned for this state")
+            return planned_items
+        
+        # Selections precomputed after the last answer, if the state has not changed since
+        precomputed = precomputed_questions.get(user_id, user_profile.state_version, dash_system.catalog_version)
+        selected_questions = precomputed.questions[:sample_size] if precomputed else []
+        
+        # Plan the (rest of the) session in one pass with DASH flexible intelligence
+        # (expands to grade-appropriate skills when recommended ones run out)
+        if len(selected_questions) < sample_size:
+            selected_questions = selected_questions + dash_system.plan_session(
+                user_id,
+                sample_size - len(selected_questions),
+                current_time=current_time,
+                exclude_question_ids=[q.question_id for q in selected_questions],
+                user_profile=user_profile
+            )
+    if len(selected_questions) < sample_size:
+        logger.info(f"[SESSION_END] Selected {len(selected_questions)}/{sample_size} questions (no more available)")
+    
+    # Load Perseus items from MongoDB for all DASH-selected questions (cached ones are reused)
     try:
-        perseus_items = load_perseus_items_for_dash_questions_from_mongodb(selected_questions)
+        if precomputed:
+            cached_items = precomputed.perseus_items_for(selected_questions)
+            cached_ids = {item['dash_metadata']['dash_question_id'] for item in cached_items}
+            perseus_items = cached_items + load_perseus_items_for_dash_questions_from_mongodb(
+                [q for q in selected_questions if q.question_id not in cached_ids]
+            )
+            logger.info(f"[PRECOMPUTED] Served {len(cached_items)} precomputed Perseus questions")
+        else:
+            perseus_items = load_perseus_items_for_dash_questions_from_mongodb(selected_questions)
         logger.info(f"[MONGODB] Loaded {len(perseus_items)} Perseus questions from MongoDB with full metadata")
     except Exception as e:
         logger.error(f"[ERROR] MongoDB Perseus load failed: {e}. Local fallback disabled.")
@@ -285,17 +356,13 @@ def get_questions_with_dash_intelligence(request: Request, sample_size: int):
         raise HTTPException(status_code=404, detail="No Perseus questions found in MongoDB")
     
     logger.info(f"[SESSION_READY] Loaded {len(perseus_items)} Perseus questions (all with DASH intelligence)\n")
+    session_plans.put(plan_key, perseus_items)
     
     # Return all questions (all selected by DASH with full intelligence)
     return perseus_items
 
-@app.post("/api/question-displayed")
-def log_question_displayed(request: Request, display_info: dict):
-    """Log when student views a question (Next button clicked)"""
-    
-    # Get user_id from JWT token
-    user_id = get_current_user(request)
-    
+def log_displayed_question(display_info: dict):
+    """Log the question a student is now viewing, from the metadata the client echoes back"""
     idx = display_info.get('question_index', 0)
     metadata = display_info.get('metadata', {})
     
@@ -305,13 +372,21 @@ def log_question_displayed(request: Request, display_info: dict):
     logger.info(f"  DASH ID: {metadata.get('dash_question_id', 'unknown')}")
     logger.info(f"  Skills: {', '.join(metadata.get('skill_names', []))}")
     logger.info(f"  Difficulty: {metadata.get('difficulty', 0):.2f} | Expected: {metadata.get('expected_time_seconds', 0)}s")
+
+@app.post("/api/question-displayed")
+def log_question_displayed(request: Request, display_info: dict):
+    """Log when student views a question (Next button clicked)"""
+    
+    # Get user_id from JWT token
+    user_id = get_current_user(request)
+    
+    log_displayed_question(display_info)
     
     # Show current student state
-    user_profile = dash_system.user_manager.load_user(user_id)
+    with dash_system.user_locks.hold(user_id):
+        user_profile = dash_system.get_user_profile(user_id)
+        scores = dash_system.get_skill_scores(user_id, time.time()) if user_profile else {}
     if user_profile:
-        current_time = time.time()
-        scores = dash_system.get_skill_scores(user_id, current_time)
-        
         # Only show practiced skills
         practiced = {k: v for k, v in scores.items() if v['practice_count'] > 0}
         
@@ -340,11 +415,16 @@ def get_next_question(request: Request):
     # Get user_id from JWT token
     user_id = get_current_user(request)
     
-    # Ensure the user exists and is loaded
-    dash_system.load_user_or_create(user_id)
-    
-    # Get the next question
-    next_question = dash_system.get_next_question(user_id, time.time())
+    with dash_system.user_locks.hold(user_id):
+        # Ensure the user exists and is loaded
+        user_profile = dash_system.load_user_or_create(user_id)
+        
+        # Get the next question (precomputed after the last answer if the state has not changed since)
+        precomputed = precomputed_questions.get(user_id, user_profile.state_version, dash_system.catalog_version)
+        if precomputed:
+            next_question = precomputed.next_question
+        else:
+            next_question = dash_system.get_next_question(user_id, time.time(), user_profile=user_profile)
     
     if next_question:
         return next_question
@@ -352,66 +432,300 @@ def get_next_question(request: Request):
         from fastapi import HTTPException
         raise HTTPException(status_code=404, detail="No recommended question found.")
 
+@app.get("/api/review-schedule")
+def get_review_schedule(request: Request):
+    """
+    Gets when each of the student's practiced skills is due for review,
+    computed in closed form from the forgetting curve.
+    """
+    # Get user_id from JWT token
+    user_id = get_current_user(request)
+    
+    with dash_system.user_locks.hold(user_id):
+        user_profile = dash_system.load_user_or_create(user_id)
+        current_time = time.time()
+        schedule = dash_system.get_review_schedule(user_id, current_time)
+    
+    return {
+        "user_id": user_id,
+        "next_review_at": user_profile.next_review_at,
+        "skills": schedule
+    }
+
+@app.get("/api/exhausted-skills")
+def get_exhausted_skills(request: Request):
+    """
+    Gets the skills whose question pool the student has fully answered,
+    so new questions can be generated for them.
+    """
+    # Get user_id from JWT token
+    user_id = get_current_user(request)
+    
+    with dash_system.user_locks.hold(user_id):
+        dash_system.load_user_or_create(user_id)
+        exhausted_skills = dash_system.get_exhausted_skills(user_id)
+    
+    return {
+        "user_id": user_id,
+        "exhausted_skills": exhausted_skills
+    }
+
+@app.get("/api/cache-stats")
+def get_cache_stats():
+    """
+    Gets hit, miss and eviction counters of the per-student state cache
+    (and of the precomputed next questions and planned sessions), for sizing instances.
+    """
+    stats = dash_system.get_cache_stats()
+    stats['precomputed_questions'] = precomputed_questions.stats()
+    stats['session_plans'] = session_plans.stats()
+    stats['session_plan_requests'] = session_plan_requests.stats()
+    return stats
+
 class AnswerSubmission(BaseModel):
     question_id: str
     skill_ids: List[str]
     is_correct: bool
     response_time_seconds: float
 
-@app.post("/api/submit-answer")
-def submit_answer(request: Request, answer: AnswerSubmission):
+def record_answer(user_id: str, answer: AnswerSubmission):
     """
-    Record a question attempt and update DASH system.
-    This enables tracking and adaptive difficulty.
+    Record an answer for a user whose lock the caller holds.
+    Returns the updated profile and the affected skills' before/after deltas.
     """
-    # Get user_id from JWT token
-    user_id = get_current_user(request)
-    
-    logger.info(f"\n{'-'*80}")
-    
-    user_profile = dash_system.user_manager.load_user(user_id)
+    user_profile = dash_system.get_user_profile(user_id)
     if not user_profile:
         logger.error(f"[ERROR] User {user_id} not found")
         raise HTTPException(status_code=404, detail="User not found")
     
-    # Record the attempt using DASH system
-    affected_skills = dash_system.record_question_attempt(
+    # Record the attempt using DASH system; only the affected skills are re-scored
+    skill_deltas = dash_system.record_question_attempt_with_deltas(
         user_profile, answer.question_id, answer.skill_ids, 
         answer.is_correct, answer.response_time_seconds
     )
-    
-    # Get updated scores for detailed logging
-    user_profile_refreshed = dash_system.user_manager.load_user(user_id)
-    current_time = time.time()
-    new_scores = dash_system.get_skill_scores(user_id, current_time)
-    
-    # Log detailed skill changes
-    if affected_skills:
+    return user_profile, skill_deltas
+
+def log_answer_outcome(user_profile: UserProfile, skill_deltas: Dict[str, Dict]):
+    """Log the skill changes of an answer and the running performance summary"""
+    if skill_deltas:
         logger.info(f"\n  [SKILL_UPDATES]")
-        for skill_id in affected_skills[:3]:  # Show top 3 to keep readable
-            if skill_id in new_scores:
-                data = new_scores[skill_id]
-                skill_type = "DIRECT" if skill_id in answer.skill_ids else "PREREQ"
-                logger.info(
-                    f"    {data['name'][:20]:<20} ({skill_type:<6}): "
-                    f"Mem {data['memory_strength']:.3f} | "
-                    f"Prob {data['probability']:.3f}"
-                )
-    
-    # Show performance summary after this question
-    total_attempts = len(user_profile_refreshed.question_history)
-    correct_count = sum(1 for attempt in user_profile_refreshed.question_history if attempt.is_correct)
+        for skill_id, data in list(skill_deltas.items())[:3]:  # Show top 3 to keep readable
+            skill_type = "DIRECT" if data['direct'] else "PREREQ"
+            logger.info(
+                f"    {data['name'][:20]:<20} ({skill_type:<6}): "
+                f"Mem {data['memory_strength_before']:.3f} -> {data['memory_strength_after']:.3f} | "
+                f"Prob {data['probability_before']:.3f} -> {data['probability_after']:.3f}"
+            )
+    
+    # Show performance summary after this question (rolling counters, no history walk)
+    total_attempts = user_profile.attempt_stats.total_questions
+    correct_count = user_profile.attempt_stats.correct_answers
     accuracy = (correct_count / total_attempts * 100) if total_attempts > 0 else 0
     
     logger.info(f"\n[PROGRESS] Total:{total_attempts} questions | Accuracy:{accuracy:.1f}% ({correct_count}/{total_attempts})")
     logger.info(f"{'-'*80}\n")
+
+def precompute_next_questions(user_id: str, user_profile: UserProfile):
+    """
+    Background step after an answer: select the student's next questions and their
+    Perseus items and cache them for the state version just saved. If the state moves
+    on meanwhile, the entry's version no longer matches and it is never served.
+    """
+    try:
+        with dash_system.user_locks.hold(user_id):
+            state_version = user_profile.state_version
+            catalog_version = dash_system.catalog_version
+            current_time = time.time()
+            next_question, selected_questions = dash_system.plan_next_questions(
+                user_id, DEFAULT_PRECOMPUTE_COUNT, current_time=current_time, user_profile=user_profile
+            )
+        perseus_items = load_perseus_items_for_dash_questions_from_mongodb(selected_questions)
+        precomputed_questions.put(user_id, PrecomputedQuestions(
+            state_version, catalog_version, next_question, selected_questions, perseus_items
+        ))
+    except Exception as e:
+        logger.warning(f"[PRECOMPUTE] Failed to precompute next questions for {user_id}: {e}")
+
+@app.post("/api/submit-answer")
+def submit_answer(request: Request, answer: AnswerSubmission, background_tasks: BackgroundTasks):
+    """
+    Record a question attempt and update DASH system.
+    This enables tracking and adaptive difficulty.
+    The next questions are precomputed after the response is sent.
+    """
+    # Get user_id from JWT token
+    user_id = get_current_user(request)
+    
+    logger.info(f"\n{'-'*80}")
+    
+    # Serialize this student's submissions so concurrent answers cannot lose an update
+    with dash_system.user_locks.hold(user_id):
+        user_profile, skill_deltas = record_answer(user_id, answer)
+    
+    log_answer_outcome(user_profile, skill_deltas)
+    background_tasks.add_task(precompute_next_questions, user_id, user_profile)
     
     return {
         "success": True,
-        "affected_skills": affected_skills,
+        "affected_skills": list(skill_deltas),
+        "skill_deltas": skill_deltas,
         "message": "Answer recorded successfully"
     }
 
+class SubmitAndNextRequest(AnswerSubmission):
+    count: int = Field(default=1, ge=0, le=MAX_QUESTIONS_PER_REQUEST, description="Number of next questions to return")
+    exclude_question_ids: List[str] = Field(default_factory=list, description="Questions already queued on the client")
+
+@app.post("/api/submit-and-next")
+def submit_answer_and_get_next(request: Request, submission: SubmitAndNextRequest):
+    """
+    Record an answer and return the next DASH-selected Perseus questions in one call.
+    The next questions are planned from the same in-memory profile the answer updated,
+    so the token is decoded and the profile loaded once per question.
+    """
+    # Get user_id from JWT token
+    user_id = get_current_user(request)
+    
+    logger.info(f"\n{'-'*80}")
+    
+    with dash_system.user_locks.hold(user_id):
+        user_profile, skill_deltas = record_answer(user_id, submission)
+        selected_questions = dash_system.plan_session(
+            user_id,
+            submission.count,
+            current_time=time.time(),
+            exclude_question_ids=submission.exclude_question_ids,
+            user_profile=user_profile
+        )
+    
+    log_answer_outcome(user_profile, skill_deltas)
+    
+    try:
+        perseus_items = load_perseus_items_for_dash_questions_from_mongodb(selected_questions)
+    except Exception as e:
+        logger.error(f"[ERROR] MongoDB Perseus load failed: {e}. Local fallback disabled.")
+        raise HTTPException(status_code=500, detail=f"Failed to load Perseus questions from MongoDB: {e}")
+    
+    logger.info(f"[NEXT_READY] {len(perseus_items)}/{submission.count} next Perseus questions for user: {user_id}")
+    
+    return {
+        "success": True,
+        "affected_skills": list(skill_deltas),
+        "skill_deltas": skill_deltas,
+        "questions": perseus_items
+    }
+
+async def push_session_questions(websocket: WebSocket, session: TutoringSession, count: Optional[int] = None):
+    """Send the session's next Perseus questions (by default, enough to refill the client's queue)"""
+    selected_questions = await run_in_threadpool(session.next_questions, count)
+    if not selected_questions:
+        return
+    perseus_items = await run_in_threadpool(load_perseus_items_for_dash_questions_from_mongodb, selected_questions)
+    session.queue(item['dash_metadata']['dash_question_id'] for item in perseus_items)
+    await websocket.send_json({"type": "questions", "questions": perseus_items})
+
+async def handle_session_message(websocket: WebSocket, session: TutoringSession, message: dict):
+    """Dispatch one client message of a tutoring session"""
+    message_type = message.get("type")
+    
+    if message_type == "answer":
+        answer = AnswerSubmission(**message)
+        logger.info(f"\n{'-'*80}")
+        skill_deltas = await run_in_threadpool(
+            session.answer, answer.question_id, answer.skill_ids, answer.is_correct, answer.response_time_seconds
+        )
+        log_answer_outcome(session.user_profile, skill_deltas)
+        await websocket.send_json({
+            "type": "answer_recorded",
+            "question_id": answer.question_id,
+            "affected_skills": list(skill_deltas),
+            "skill_deltas": skill_deltas
+        })
+        # Proactively top the client's queue back up
+        await push_session_questions(websocket, session)
+    elif message_type == "displayed":
+        log_displayed_question(message)
+        logger.info(f"{'='*80}\n")
+    elif message_type == "next":
+        count = message.get("count")
+        if count is not None and (type(count) is not int or not 0 <= count <= MAX_QUESTIONS_PER_REQUEST):
+            await websocket.send_json({
+                "type": "error",
+                "message": f"Invalid next message: count must be an integer from 0 to {MAX_QUESTIONS_PER_REQUEST}"
+            })
+            return
+        await push_session_questions(websocket, session, count)
+    elif message_type == "flush":
+        written = await run_in_threadpool(session.flush)
+        await websocket.send_json({"type": "flushed", "answers_written": written})
+    else:
+        await websocket.send_json({"type": "error", "message": f"Unknown message type: {message_type}"})
+
+@app.websocket("/ws/session")
+async def dash_session(websocket: WebSocket):
+    """
+    Tutoring session over one WebSocket, authenticated once with ?token=<JWT>.
+    The student's state stays resident until disconnect and answers are saved in
+    batches (see TutoringSession); optional ?queue_size=N sets how many unanswered
+    questions the server keeps pushed to the client.
+    
+    Client messages (JSON, by "type"):
+        answer     question_id, skill_ids, is_correct, response_time_seconds
+        displayed  question_index, metadata (as for /api/question-displayed)
+        next       count (optional): push more questions now
+        flush      save unsaved answers now
+    Server messages: session_started, questions, answer_recorded, flushed, error
+    """
+    user = get_user_from_token(websocket.query_params.get("token", ""))
+    if not user or not user.get("user_id"):
+        logger.warning("[SESSION] WebSocket connection rejected: missing or invalid token")
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    user_id = user["user_id"]
+    
+    queue_size = websocket.query_params.get("queue_size")
+    session = TutoringSession(dash_system, user_id)
+    if queue_size and queue_size.isdigit():
+        session.queue_size = min(int(queue_size), MAX_QUESTIONS_PER_REQUEST)
+    
+    await websocket.accept()
+    logger.info(f"[SESSION] WebSocket session started for user: {user_id}")
+    
+    try:
+        await run_in_threadpool(session.open)
+        await websocket.send_json({"type": "session_started", "user_id": user_id})
+        await push_session_questions(websocket, session)
+        
+        while True:
+            try:
+                message = await asyncio.wait_for(websocket.receive_json(), timeout=session.flush_seconds or None)
+            except asyncio.TimeoutError:
+                # Idle connection: a safe point to save pending answers
+                await run_in_threadpool(session.flush)
+                continue
+            except (ValueError, KeyError):
+                message = None
+            if not isinstance(message, dict):
+                await websocket.send_json({"type": "error", "message": "Invalid message: expected a JSON object"})
+                continue
+            
+            try:
+                await handle_session_message(websocket, session, message)
+            except ValidationError as e:
+                await websocket.send_json({"type": "error", "message": f"Invalid {message.get('type')} message: {e}"})
+            except (WebSocketDisconnect, asyncio.CancelledError):
+                raise
+            except Exception as e:
+                logger.error(f"[ERROR] Session message failed for user {user_id}: {e}")
+                await websocket.send_json({"type": "error", "message": f"Failed to process {message.get('type')} message"})
+    except WebSocketDisconnect:
+        logger.info(f"[SESSION] WebSocket session ended for user: {user_id}")
+    finally:
+        # Save and unpin even when the handler is being cancelled (e.g. on shutdown)
+        with anyio.CancelScope(shield=True):
+            await run_in_threadpool(session.close)
+        logger.info(f"[SESSION] Released state for user: {user_id}")
+
 if __name__ == "__main__":
     import uvicorn
     port = int(os.environ.get("PORT", 8000))
@@ -1,14 +1,22 @@
-import math
 import time
 import json
 import os
 import sys
 import logging
-from typing import Dict, List, Tuple, Optional
+import threading
+from typing import Callable, Dict, List, Sequence, Tuple, Optional
 from dataclasses import dataclass, field
 from enum import Enum
 
-from managers.user_manager import UserManager, UserProfile, SkillState
+import numpy as np
+
+from managers.user_manager import UserManager, UserProfile, SkillState, intern_skill_ids
+from services.DashSystem.skill_engine import SkillCatalog, StudentSkillArrays, SkillStateEngine, grade_value
+from services.DashSystem.knowledge_models import KnowledgeTracingModel, DASHModel, PracticeEvent, dash_time_penalty
+from services.DashSystem.question_index import QuestionIndex, QuestionArrays, ExcludedQuestions
+from services.DashSystem.gain_selection import GainSelector
+from services.DashSystem.state_cache import StudentStateCache
+from services.DashSystem.user_locks import UserLocks
 
 # Configure logging
 logging.basicConfig(
@@ -40,7 +48,7 @@ class GradeLevel(Enum):
     GRADE_11 = 11
     GRADE_12 = 12
 
-@dataclass
+@dataclass(slots=True)
 class Skill:
     skill_id: str
     name: str
@@ -49,24 +57,47 @@ class Skill:
     forgetting_rate: float = 0.1
     difficulty: float = 0.0
     order: int = 0  # Order within grade level for learning journey
+    
+    def __post_init__(self):
+        # Skill ids recur in every question, attempt and prerequisite list; share one copy
+        self.skill_id = sys.intern(self.skill_id)
+        self.prerequisites = [sys.intern(skill_id) for skill_id in self.prerequisites]
 
-@dataclass
+@dataclass(slots=True)
 class StudentSkillState:
     memory_strength: float = 0.0
     last_practice_time: Optional[float] = None
     practice_count: int = 0
     correct_count: int = 0
 
-@dataclass
+@dataclass(slots=True)
 class Question:
     question_id: str
-    skill_ids: List[str]
+    skill_ids: Sequence[str]  # Stored as a shared interned tuple
     content: str
     difficulty: float = 0.0
     expected_time_seconds: float = 60.0  # Default expected time for answering
+    
+    def __post_init__(self):
+        self.question_id = sys.intern(self.question_id)
+        self.skill_ids = intern_skill_ids(self.skill_ids)
+
+SELECTION_MODES = ("journey", "gain")
+DEFAULT_SELECTION_MODE = os.getenv("DASH_SELECTION_MODE", "journey")
 
 class DASHSystem:
-    def __init__(self, skills_file: Optional[str] = None, curriculum_file: Optional[str] = None, use_mongodb: bool = True):
+    def __init__(self, skills_file: Optional[str] = None, curriculum_file: Optional[str] = None, use_mongodb: bool = True,
+                 model: Callable[[SkillCatalog], KnowledgeTracingModel] = DASHModel,
+                 selection_mode: str = DEFAULT_SELECTION_MODE):
+        
+        # Knowledge-tracing model class (or factory taking the SkillCatalog); DASH by default
+        self.model_factory = model
+        
+        # "journey": closest question to the target difficulty in the first recommended skill
+        # "gain": best expected learning gain across all recommended skills (see gain_selection)
+        if selection_mode not in SELECTION_MODES:
+            raise ValueError(f"Unknown selection mode {selection_mode!r}; expected one of {SELECTION_MODES}")
+        self.selection_mode = selection_mode
         
         # Default file paths relative to the project root
         self.skills_file_path = skills_file if skills_file else "QuestionsBank/skills.json"
@@ -74,11 +105,29 @@ class DASHSystem:
         self.use_mongodb = use_mongodb
 
         self.skills: Dict[str, Skill] = {}
-        self.student_states: Dict[str, Dict[str, StudentSkillState]] = {}
+        # Bounded LRU/idle-TTL cache; evicted students are reloaded from MongoDB on demand
+        self.student_states = StudentStateCache(on_evict=self._flush_evicted_state)
+        # Profiles of students with a live session (see pin_user), shared by all their requests
+        # because they may hold answers not saved yet
+        self.resident_profiles: Dict[str, UserProfile] = {}
+        
+        # Callers hold user_locks.hold(user_id) around each request's read-modify-write
+        self.user_locks = UserLocks()
         self.questions: Dict[str, Question] = {}
         self.curriculum: Dict = {}
         self.user_manager = UserManager(users_folder="Users")
         
+        # Bumped whenever skills or questions change; cached selections are tagged with it
+        self.catalog_version = 0
+        
+        # Candidate pools for gain selection, built lazily (see _get_gain_selector)
+        self.gain_selector: Optional[GainSelector] = None
+        self._question_arrays_lock = threading.Lock()
+        
+        # Called with (student_id, skill_id) when a student answers the last question
+        # in a skill's pool, e.g. to queue question generation for that skill
+        self.on_pool_exhausted: Optional[Callable[[str, str], None]] = None
+        
         # Initialize MongoDB manager if using MongoDB
         self.mongo = None
         if use_mongodb:
@@ -95,6 +144,102 @@ class DASHSystem:
             self._load_from_mongodb()
         else:
             raise RuntimeError("MongoDB is required. Please configure MONGODB_URI in .env file.")
+        
+        self._build_catalog_indexes()
+    
+    def _build_catalog_indexes(self):
+        """Compile the loaded skills into array-backed indexes used by the engine"""
+        self.catalog = SkillCatalog(self.skills)
+        self.model = self.model_factory(self.catalog)
+        self.engine = SkillStateEngine(self.model)
+        self.catalog.prerequisites.log_bad_edges()
+        self.question_index = QuestionIndex(self.questions)
+        self._invalidate_question_arrays()
+        self.pool_sizes = np.array(
+            [self.question_index.pool_size(skill_id) for skill_id in self.catalog.skill_ids], dtype=np.int64
+        )
+        self.catalog_version += 1
+    
+    def _invalidate_question_arrays(self):
+        """Drop the gain-selection arrays; they are rebuilt over the whole bank on next use"""
+        with self._question_arrays_lock:
+            self.gain_selector = None
+    
+    def _get_gain_selector(self) -> GainSelector:
+        """
+        GainSelector (with its QuestionArrays) for the current bank, built on first use
+        after a catalog change, so a burst of add_question calls costs one rebuild
+        """
+        with self._question_arrays_lock:
+            if self.gain_selector is None:
+                self.gain_selector = GainSelector(self.engine, QuestionArrays(self.questions, self.catalog))
+            return self.gain_selector
+    
+    def reload_catalog(self):
+        """
+        Reload skills and questions from MongoDB and rebuild the catalog indexes.
+        Cached student states are aligned with the old catalog, so they are dropped
+        and rebuilt from their profiles (with fresh question counters) on next access.
+        """
+        for student_id, state in self.student_states.items():
+            self.student_states.pop(student_id)
+            self._flush_evicted_state(student_id, state)
+        
+        self.skills = {}
+        self._load_from_mongodb()
+        self._build_catalog_indexes()
+        log_print(f"[CATALOG] Reloaded {len(self.skills)} skills and {len(self.questions)} questions")
+    
+    def refresh_catalog(self) -> int:
+        """
+        Pick up catalog changes written to MongoDB since the last load (e.g. by the question
+        generation and migration tools). New questions are added incrementally; a changed
+        skill set or removed questions reload the whole catalog. Edits to existing skill or
+        question documents are not detected. Returns how many questions the bank gained.
+        """
+        question_count = len(self.questions)
+        try:
+            skill_ids = {doc['skill_id'] for doc in self.mongo.skills.find({}, {"_id": 0, "skill_id": 1})}
+            question_ids = {doc['question_id'] for doc in self.mongo.dash_questions.find({}, {"_id": 0, "question_id": 1})}
+        except Exception as e:
+            log_print(f"[ERROR] Error checking the catalog in MongoDB: {e}")
+            raise RuntimeError(f"Failed to load data from MongoDB: {e}. Local fallback disabled.")
+        
+        if skill_ids != set(self.skills) or not set(self.questions) <= question_ids:
+            self.reload_catalog()
+            return len(self.questions) - question_count
+        
+        new_question_ids = question_ids - set(self.questions)
+        if new_question_ids:
+            try:
+                questions_docs = list(self.mongo.dash_questions.find({"question_id": {"$in": list(new_question_ids)}}))
+            except Exception as e:
+                log_print(f"[ERROR] Error loading new questions from MongoDB: {e}")
+                raise RuntimeError(f"Failed to load data from MongoDB: {e}. Local fallback disabled.")
+            for q_doc in questions_docs:
+                question = self._question_from_document(q_doc)
+                if question:
+                    self.add_question(question)
+            log_print(f"[CATALOG] Added {len(self.questions) - question_count} new questions")
+        return len(self.questions) - question_count
+    
+    def add_question(self, question: Question):
+        """Add a question (e.g. a newly generated one) to the bank and every cached student's counters"""
+        if question.question_id in self.questions:
+            return
+        
+        with self._question_arrays_lock:
+            self.questions[question.question_id] = question
+            self.gain_selector = None
+        self.question_index.add(question)
+        self.catalog_version += 1
+        
+        ordinals = [self.catalog.index[sid] for sid in question.skill_ids if sid in self.catalog.index]
+        self.pool_sizes[ordinals] += 1
+        for student_id, state in self.student_states.items():
+            with self.user_locks.hold(student_id):
+                if state.unanswered_questions is not None:
+                    state.unanswered_questions[ordinals] += 1
     
     def _load_from_mongodb(self):
         """Load skills and questions from MongoDB"""
@@ -122,17 +267,9 @@ class DASHSystem:
             questions_docs = list(self.mongo.dash_questions.find())
             self.questions.clear()
             for q_doc in questions_docs:
-                try:
-                    question = Question(
-                        question_id=q_doc['question_id'],
-                        skill_ids=[q_doc['skill_id']],
-                        content=q_doc['content'],
-                        difficulty=q_doc['difficulty'],
-                        expected_time_seconds=q_doc.get('expected_time_seconds', 60.0)
-                    )
+                question = self._question_from_document(q_doc)
+                if question:
                     self.questions[question.question_id] = question
-                except KeyError as e:
-                    log_print(f"[WARNING] Skipping question {q_doc.get('question_id', 'unknown')}: missing field {e}")
             
             log_print(f"[MONGODB] Loaded {len(self.questions)} questions from MongoDB")
             
@@ -140,6 +277,20 @@ class DASHSystem:
             log_print(f"[ERROR] Error loading from MongoDB: {e}")
             raise RuntimeError(f"Failed to load data from MongoDB: {e}. Local fallback disabled.")
     
+    def _question_from_document(self, q_doc: Dict) -> Optional[Question]:
+        """A Question from its dash_questions document, or None if a field is missing"""
+        try:
+            return Question(
+                question_id=q_doc['question_id'],
+                skill_ids=[q_doc['skill_id']],
+                content=q_doc['content'],
+                difficulty=q_doc['difficulty'],
+                expected_time_seconds=q_doc.get('expected_time_seconds', 60.0)
+            )
+        except KeyError as e:
+            log_print(f"[WARNING] Skipping question {q_doc.get('question_id', 'unknown')}: missing field {e}")
+            return None
+    
     def _load_from_files(self, skills_file: str, curriculum_file: str):
         """Load skills and curriculum from JSON files"""
         try:
@@ -262,190 +413,296 @@ class DASHSystem:
         self.skills["limits"] = Skill("limits", "Limits", GradeLevel.GRADE_12, ["exponentials_logs"], 0.19, 0.0, 1)
         self.skills["derivatives"] = Skill("derivatives", "Derivatives", GradeLevel.GRADE_12, ["limits"], 0.20, 0.0, 2)
     
-    def get_student_state(self, student_id: str, skill_id: str) -> StudentSkillState:
-        """Get or create student state for a specific skill"""
-        if student_id not in self.student_states:
-            self.student_states[student_id] = {}
+    def _get_student_arrays(self, student_id: str, user_profile: Optional[UserProfile] = None) -> StudentSkillArrays:
+        """
+        Get the array-backed skill states for a student.
+        On a miss the states are built from the profile (loaded if not given), so
+        nothing is ever written back from blank arrays; unknown students start at defaults.
+        """
+        state = self.student_states.get(student_id)
+        if state is None:
+            if user_profile is None:
+                user_profile = self.get_user_profile(student_id)
+            if user_profile is not None:
+                state = self._arrays_from_profile(user_profile)
+                state.unanswered_questions = self._count_unanswered(user_profile.answered_question_ids)
+            else:
+                state = StudentSkillArrays(self.catalog.size)
+            self.student_states[student_id] = state
+        return state
+    
+    def _arrays_from_profile(self, user_profile: UserProfile) -> StudentSkillArrays:
+        """Arrays for a profile's sparse skill_states on top of its cold-start grade template"""
+        template_grade = user_profile.skill_template_grade
+        return StudentSkillArrays.from_skill_states(
+            self.catalog, user_profile.skill_states,
+            grade_value(template_grade) if template_grade is not None else None
+        )
+    
+    def _flush_evicted_state(self, student_id: str, state: StudentSkillArrays):
+        """
+        Persist any unsaved skill changes of a state leaving the cache.
+        Waiting for a busy lock could deadlock (the evicting thread holds its own
+        student's lock, and locks are shared across a stripe), so a state that cannot
+        be flushed now is put back in the cache and flushed on a later eviction.
+        """
+        if not state.dirty:
+            return
+        
+        with self.user_locks.try_hold(student_id) as acquired:
+            if not acquired:
+                if self.student_states.restore(student_id, state):
+                    log_print(f"[STATE_CACHE] Lock busy; kept {len(state.dirty)} unsaved skill states of {student_id} cached for a later flush")
+                else:
+                    log_print(f"[ERROR] Dropped {len(state.dirty)} unsaved skill states of evicted student {student_id}: a newer state is cached")
+                return
+            
+            user_profile = self.get_user_profile(student_id)
+            if user_profile is None:
+                return
+            
+            dirty = self._sync_dirty_states(state, user_profile)
+            self.user_manager.save_skill_states(user_profile, [self.catalog.skill_ids[i] for i in dirty])
+            state.dirty.difference_update(dirty)
+            log_print(f"[STATE_CACHE] Flushed {len(dirty)} unsaved skill states for evicted student {student_id}")
+    
+    def get_cache_stats(self) -> Dict[str, float]:
+        """Hit, miss and eviction counters of the per-student state cache"""
+        return self.student_states.stats()
+    
+    def _count_unanswered(self, answered_question_ids) -> np.ndarray:
+        """Per-skill count of questions in the bank that are not in answered_question_ids"""
+        unanswered = self.pool_sizes.copy()
+        for question_id in answered_question_ids:
+            question = self.questions.get(question_id)
+            if question is None:
+                continue
+            for skill_id in question.skill_ids:
+                i = self.catalog.index.get(skill_id)
+                if i is not None:
+                    unanswered[i] -= 1
+        return unanswered
+    
+    def _get_unanswered_counts(self, student_id: str, user_profile: UserProfile) -> np.ndarray:
+        """The student's per-skill unanswered counters, counted from the profile on first use"""
+        state = self._get_student_arrays(student_id, user_profile)
+        if state.unanswered_questions is None:
+            state.unanswered_questions = self._count_unanswered(user_profile.answered_question_ids)
+        return state.unanswered_questions
+    
+    def _record_answered_question(self, user_profile: UserProfile, question_id: str):
+        """Decrement the unanswered counters for a question the student is answering for the first time"""
+        question = self.questions.get(question_id)
+        if question is None or question_id in user_profile.answered_question_ids:
+            return
         
-        if skill_id not in self.student_states[student_id]:
-            self.student_states[student_id][skill_id] = StudentSkillState()
+        unanswered = self._get_unanswered_counts(user_profile.user_id, user_profile)
+        for skill_id in question.skill_ids:
+            i = self.catalog.index.get(skill_id)
+            if i is None:
+                continue
+            unanswered[i] -= 1
+            if unanswered[i] == 0:
+                log_print(f"[POOL_EXHAUSTED] Student {user_profile.user_id} answered all {self.pool_sizes[i]} questions for {skill_id}")
+                if self.on_pool_exhausted:
+                    self.on_pool_exhausted(user_profile.user_id, skill_id)
+    
+    def get_unanswered_counts(self, student_id: str) -> Dict[str, int]:
+        """Unanswered questions left per skill for a student"""
+        user_profile = self.get_user_profile(student_id)
+        if not user_profile:
+            return {skill_id: int(size) for skill_id, size in zip(self.catalog.skill_ids, self.pool_sizes)}
+        
+        unanswered = self._get_unanswered_counts(student_id, user_profile)
+        return {skill_id: int(count) for skill_id, count in zip(self.catalog.skill_ids, unanswered)}
+    
+    def get_exhausted_skills(self, student_id: str) -> List[str]:
+        """Skills whose question pool the student has fully answered (skills with no questions are not listed)"""
+        user_profile = self.get_user_profile(student_id)
+        if not user_profile:
+            return []
         
-        return self.student_states[student_id][skill_id]
+        unanswered = self._get_unanswered_counts(student_id, user_profile)
+        exhausted = np.flatnonzero((unanswered <= 0) & (self.pool_sizes > 0))
+        return [self.catalog.skill_ids[i] for i in exhausted]
+    
+    def get_student_state(self, student_id: str, skill_id: str) -> StudentSkillState:
+        """Get a snapshot of the student's state for a specific skill"""
+        state = self._get_student_arrays(student_id)
+        i = self.catalog.index.get(skill_id)
+        if i is None:
+            return StudentSkillState()
+        
+        return StudentSkillState(
+            memory_strength=float(state.memory_strength[i]),
+            last_practice_time=state.last_practice(i),
+            practice_count=int(state.practice_count[i]),
+            correct_count=int(state.correct_count[i])
+        )
     
     def calculate_memory_strength(self, student_id: str, skill_id: str, current_time: float) -> float:
         """Calculate current memory strength with decay"""
-        state = self.get_student_state(student_id, skill_id)
-        skill = self.skills[skill_id]
-        
-        if state.last_practice_time is None:
-            return state.memory_strength
-        
-        time_elapsed = current_time - state.last_practice_time
-        decay_factor = math.exp(-skill.forgetting_rate * time_elapsed)
-        
-        return state.memory_strength * decay_factor
+        i = self.catalog.index[skill_id]
+        state = self._get_student_arrays(student_id)
+        return float(self.engine.memory_strengths(state, current_time, i))
     
     def get_all_prerequisites(self, skill_id: str) -> List[str]:
-        """Get all prerequisite skills recursively"""
-        prerequisites = []
-        skill = self.skills.get(skill_id)
-        if not skill:
-            return prerequisites
+        """Get all prerequisite skills (transitive), from the compiled prerequisite graph"""
+        i = self.catalog.index.get(skill_id)
+        if i is None:
+            return []
         
-        for prereq_id in skill.prerequisites:
-            prerequisites.append(prereq_id)
-            # Recursively get prerequisites of prerequisites
-            prerequisites.extend(self.get_all_prerequisites(prereq_id))
-        
-        # Remove duplicates while preserving order
-        seen = set()
-        unique_prerequisites = []
-        for prereq in prerequisites:
-            if prereq not in seen:
-                seen.add(prereq)
-                unique_prerequisites.append(prereq)
-        
-        return unique_prerequisites
+        return [self.catalog.skill_ids[a] for a in self.catalog.prerequisites.ancestors(i)]
     
     def calculate_time_penalty(self, response_time_seconds: float) -> float:
         """Calculate time penalty multiplier for response time"""
-        if response_time_seconds > 180:  # 3 minutes
-            return 0.5
-        return 1.0
+        return dash_time_penalty(response_time_seconds)
     
     def predict_correctness(self, student_id: str, skill_id: str, current_time: float) -> float:
         """Predict probability of correct answer using sigmoid function"""
-        memory_strength = self.calculate_memory_strength(student_id, skill_id, current_time)
-        skill = self.skills[skill_id]
+        i = self.catalog.index[skill_id]
+        state = self._get_student_arrays(student_id)
         
         # Sigmoid function: P(correct) = 1 / (1 + exp(-(memory_strength - difficulty)))
-        logit = memory_strength - skill.difficulty
-        return 1 / (1 + math.exp(-logit))
+        return float(self.engine.probabilities(state, current_time, i))
     
     def update_student_state(self, student_id: str, skill_id: str, is_correct: bool, current_time: float, response_time_seconds: float = 0.0):
-        """Update student state after practice"""
-        state = self.get_student_state(student_id, skill_id)
-        skill = self.skills.get(skill_id)
-        skill_name = skill.name if skill else skill_id
-        
-        # Store previous values for logging
-        prev_strength = state.memory_strength
-        prev_practice_count = state.practice_count
-        prev_correct_count = state.correct_count
-        
-        # Update practice counts
-        state.practice_count += 1
-        if is_correct:
-            state.correct_count += 1
-        
-        # Calculate current memory strength with decay
-        current_strength = self.calculate_memory_strength(student_id, skill_id, current_time)
-        time_since_last = current_time - state.last_practice_time if state.last_practice_time else 0
-        
-        # Update memory strength based on performance
-        if is_correct:
-            # Base strength increment with diminishing returns
-            strength_increment = 1.0 / (1 + 0.1 * state.correct_count)
-            
-            # Apply time penalty using separate function
-            time_penalty = self.calculate_time_penalty(response_time_seconds)
-            strength_increment *= time_penalty
-            
-            new_strength = min(5.0, current_strength + strength_increment)
-            state.memory_strength = new_strength
-            
-            # Compact memory update log
-            strength_change = new_strength - prev_strength
-            log_print(f"  |- {skill_name}: {prev_strength:.3f} -> {new_strength:.3f} ({strength_change:+.3f})")
-        else:
-            # Slight decrease for incorrect answers
-            new_strength = max(-2.0, current_strength - 0.2)
-            state.memory_strength = new_strength
-            
-            # Compact memory update log
-            strength_change = new_strength - prev_strength
-            log_print(f"  |- {skill_name}: {prev_strength:.3f} -> {new_strength:.3f} ({strength_change:+.3f})")
-        
-        # Update last practice time
-        state.last_practice_time = current_time
+        """Update student state after practice (the practiced skill only)"""
+        self.update_with_prerequisites(student_id, [skill_id], is_correct, current_time, response_time_seconds, propagate=False)
     
-    def update_with_prerequisites(self, student_id: str, skill_ids: List[str], is_correct: bool, current_time: float, response_time_seconds: float = 0.0) -> List[str]:
-        """Update student state including prerequisites on wrong answers"""
-        all_affected_skills = []
+    def update_with_prerequisites(self, student_id: str, skill_ids: List[str], is_correct: bool, current_time: float,
+                                  response_time_seconds: float = 0.0, propagate: bool = True) -> List[str]:
+        """Update student state including prerequisites on wrong answers (per the model's update rule)"""
+        state = self._get_student_arrays(student_id)
+        events = [
+            PracticeEvent(self.catalog.index[skill_id], is_correct, current_time, response_time_seconds)
+            for skill_id in skill_ids
+        ]
+        updates = self.model.update(state, events, propagate=propagate)
         
-        for skill_id in skill_ids:
-            # Always update the direct skill
-            self.update_student_state(student_id, skill_id, is_correct, current_time, response_time_seconds)
-            all_affected_skills.append(skill_id)
-            
-            # If answer is wrong, also penalize prerequisites
-            if not is_correct:
-                prerequisites = self.get_all_prerequisites(skill_id)
-                for prereq_id in prerequisites:
-                    # Apply penalty to prerequisite (but don't count as practice attempt)
-                    state = self.get_student_state(student_id, prereq_id)
-                    current_strength = self.calculate_memory_strength(student_id, prereq_id, current_time)
-                    
-                    # Apply smaller penalty to prerequisites
-                    state.memory_strength = max(-2.0, current_strength - 0.1)
-                    state.last_practice_time = current_time
-                    
-                    all_affected_skills.append(prereq_id)
+        # Compact memory update log for the practiced skills
+        for update in updates:
+            if update.direct:
+                log_print(f"  |- {self.catalog.names[update.skill]}: {update.before:.3f} -> {update.after:.3f} ({update.after - update.before:+.3f})")
         
         # Remove duplicates while preserving order
         seen = set()
         unique_affected_skills = []
-        for skill_id in all_affected_skills:
-            if skill_id not in seen:
-                seen.add(skill_id)
-                unique_affected_skills.append(skill_id)
+        for update in updates:
+            if update.skill not in seen:
+                seen.add(update.skill)
+                unique_affected_skills.append(self.catalog.skill_ids[update.skill])
         
         return unique_affected_skills
     
     def load_user_or_create(self, user_id: str, age: int = 5) -> UserProfile:
         """Load existing user or create new one with cold-start initialization"""
-        all_skill_ids = list(self.skills.keys())
-        user_profile = self.user_manager.get_or_create_user(
-            user_id, 
-            all_skill_ids,
-            all_skills=self.skills,  # Pass skills for cold-start
-            age=age
-        )
-        
-        # Sync user profile with current student_states for backward compatibility
-        self.student_states[user_id] = {}
-        for skill_id, skill_state in user_profile.skill_states.items():
-            self.student_states[user_id][skill_id] = StudentSkillState(
-                memory_strength=skill_state.memory_strength,
-                last_practice_time=skill_state.last_practice_time,
-                practice_count=skill_state.practice_count,
-                correct_count=skill_state.correct_count
+        # A pinned student's resident profile and cached state may hold changes not yet saved; keep them
+        user_profile = self.resident_profiles.get(user_id)
+        if user_profile is not None:
+            if user_id in self.student_states:
+                return user_profile
+        else:
+            all_skill_ids = list(self.skills.keys())
+            user_profile = self.user_manager.get_or_create_user(
+                user_id, 
+                all_skill_ids,
+                all_skills=self.skills,  # Pass skills for cold-start
+                age=age,
+                include_history=False  # Selection only needs the answered set and rolling stats
             )
         
+        # Sync user profile into the array-backed student state
+        state = self._arrays_from_profile(user_profile)
+        state.unanswered_questions = self._count_unanswered(user_profile.answered_question_ids)
+        self.student_states[user_id] = state
+        
         return user_profile
     
+    def get_user_profile(self, student_id: str) -> Optional[UserProfile]:
+        """A student's profile without question_history: the resident one if pinned, else loaded from MongoDB"""
+        user_profile = self.resident_profiles.get(student_id)
+        if user_profile is None:
+            user_profile = self.user_manager.load_user(student_id, include_history=False)
+        return user_profile
+    
+    def pin_user(self, user_id: str) -> UserProfile:
+        """
+        Load a student and keep their profile and cached state resident until a matching
+        unpin_user(); until then every load_user_or_create returns this same profile.
+        Callers hold the student's lock.
+        """
+        self.student_states.pin(user_id)
+        user_profile = self.load_user_or_create(user_id)
+        self.resident_profiles[user_id] = user_profile
+        return user_profile
+    
+    def unpin_user(self, user_id: str):
+        """Release a pin_user(); the last one makes the student load from MongoDB again"""
+        self.student_states.unpin(user_id)
+        if not self.student_states.is_pinned(user_id):
+            self.resident_profiles.pop(user_id, None)
+    
     def is_cold_start(self, user_profile: UserProfile) -> bool:
         """Check if user is in cold-start phase (first 20 questions)"""
-        return len(user_profile.question_history) < 20
+        return user_profile.attempt_stats.total_questions < 20
+    
+    def _sync_dirty_states(self, state: StudentSkillArrays, user_profile: UserProfile) -> List[int]:
+        """
+        Copy the skills changed since the last save from the student's arrays into the
+        profile, in place, and return their ordinals. The arrays stay the canonical state;
+        the profile only mirrors what is about to be persisted.
+        """
+        dirty = sorted(state.dirty)
+        for i in dirty:
+            skill_id = self.catalog.skill_ids[i]
+            skill_state = user_profile.skill_states.get(skill_id)
+            if skill_state is None:
+                skill_state = user_profile.skill_states[skill_id] = SkillState(0.0, None, 0, 0)
+            skill_state.memory_strength = float(state.memory_strength[i])
+            skill_state.last_practice_time = state.last_practice(i)
+            skill_state.practice_count = int(state.practice_count[i])
+            skill_state.correct_count = int(state.correct_count[i])
+        
+        # Persist the earliest review time so batch jobs can query it without loading states
+        user_profile.next_review_at = self.engine.next_review_at(state)
+        return dirty
     
     def save_user_state(self, user_id: str, user_profile: UserProfile):
-        """Save current student states back to user profile"""
-        if user_id in self.student_states:
-            for skill_id, student_state in self.student_states[user_id].items():
-                if skill_id in user_profile.skill_states:
-                    user_profile.skill_states[skill_id] = SkillState(
-                        memory_strength=student_state.memory_strength,
-                        last_practice_time=student_state.last_practice_time,
-                        practice_count=student_state.practice_count,
-                        correct_count=student_state.correct_count
-                    )
-        
-        self.user_manager.save_user(user_profile)
+        """Persist the skills that changed since the last save, with any unsaved attempts in the same write"""
+        state = self.student_states.get(user_id)
+        if state is None:
+            return
+        
+        dirty = self._sync_dirty_states(state, user_profile)
+        updated_skill_ids = [self.catalog.skill_ids[i] for i in dirty]
+        if user_profile.unsaved_attempts:
+            self.user_manager.save_question_attempts(user_profile, user_profile.unsaved_attempts, updated_skill_ids)
+            user_profile.unsaved_attempts = []
+        else:
+            self.user_manager.save_skill_states(user_profile, updated_skill_ids)
+        state.dirty.difference_update(dirty)
     
     def record_question_attempt(self, user_profile: UserProfile, question_id: str, 
                               skill_ids: List[str], is_correct: bool, 
                               response_time_seconds: float):
         """Record a question attempt and update both memory and persistent storage"""
+        deltas = self.record_question_attempt_with_deltas(
+            user_profile, question_id, skill_ids, is_correct, response_time_seconds
+        )
+        return list(deltas)
+    
+    def record_question_attempt_with_deltas(self, user_profile: UserProfile, question_id: str,
+                                            skill_ids: List[str], is_correct: bool,
+                                            response_time_seconds: float, persist: bool = True) -> Dict[str, Dict]:
+        """
+        Record a question attempt like record_question_attempt, returning the affected
+        skills (in update order) with their memory strength and probability before and
+        after it. Only the practiced skills and their prerequisites are evaluated.
+        
+        With persist=False the attempt is applied in memory only and queued on
+        user_profile.unsaved_attempts; save_user_state writes it later.
+        """
         current_time = time.time()
         time_penalty_applied = self.calculate_time_penalty(response_time_seconds) < 1.0
         
@@ -460,50 +717,138 @@ class DASHSystem:
         result_str = 'CORRECT' if is_correct else 'INCORRECT'
         log_print(f"[ANSWER_SUBMITTED] Q:{question_id} | {result_str} | Time:{response_time_seconds:.1f}s | Skills:{','.join(skill_ids)}")
         
+        # Sync the cached state from this profile before updating it, then count the question as answered
+        state = self._get_student_arrays(user_profile.user_id, user_profile)
+        self._record_answered_question(user_profile, question_id)
+        
+        # Snapshot every skill the update can touch: the practiced skills and their prerequisites
+        practiced = [self.catalog.index[skill_id] for skill_id in skill_ids]
+        touchable = np.unique(np.concatenate(
+            [np.asarray(practiced, dtype=np.int64)] + [self.catalog.prerequisites.ancestors(i) for i in practiced]
+        ))
+        before = dict(zip(touchable.tolist(), self._skill_values(state, touchable, current_time)))
+        
         # Update memory states
         affected_skills = self.update_with_prerequisites(
             user_profile.user_id, skill_ids, is_correct, current_time, response_time_seconds
         )
         
-        # Save to persistent storage
-        self.save_user_state(user_profile.user_id, user_profile)
+        affected = [self.catalog.index[skill_id] for skill_id in affected_skills]
+        after = self._skill_values(state, np.array(affected, dtype=np.int64), current_time)
+        deltas = {}
+        for i, skill_id, (memory_strength, probability) in zip(affected, affected_skills, after):
+            memory_strength_before, probability_before = before[i]
+            deltas[skill_id] = {
+                'name': self.catalog.names[i],
+                'direct': skill_id in skill_ids,
+                'memory_strength_before': memory_strength_before,
+                'memory_strength_after': memory_strength,
+                'probability_before': probability_before,
+                'probability_after': probability,
+                'practice_count': int(state.practice_count[i]),
+                'correct_count': int(state.correct_count[i])
+            }
         
-        # Add to question history
+        if not persist or user_profile.unsaved_attempts:
+            # Mirror the update into the profile; the skills stay dirty until the batched save
+            self._sync_dirty_states(state, user_profile)
+            user_profile.unsaved_attempts.append(self.user_manager.apply_question_attempt(
+                user_profile, question_id, skill_ids, is_correct, response_time_seconds, time_penalty_applied
+            ))
+            if persist:
+                # Earlier answers are still queued (a live session): save them first, in the same write
+                self.save_user_state(user_profile.user_id, user_profile)
+            return deltas
+        
+        # Save the changed skill states together with the question history entry
+        dirty = self._sync_dirty_states(state, user_profile)
         self.user_manager.add_question_attempt(
             user_profile, question_id, skill_ids, is_correct, 
-            response_time_seconds, time_penalty_applied
+            response_time_seconds, time_penalty_applied,
+            updated_skill_ids=[self.catalog.skill_ids[i] for i in dirty]
         )
+        state.dirty.difference_update(dirty)
         
-        return affected_skills
+        return deltas
+    
+    def _skill_values(self, state: StudentSkillArrays, skills: np.ndarray, current_time: float) -> List[tuple]:
+        """(memory_strength, probability) per given skill ordinal, rounded like get_skill_scores"""
+        memory_strengths = self.engine.memory_strengths(state, current_time, skills).round(3).tolist()
+        probabilities = self.engine.probabilities(state, current_time, skills).round(3).tolist()
+        return list(zip(memory_strengths, probabilities))
     
     def get_skill_scores(self, student_id: str, current_time: float) -> Dict[str, Dict[str, float]]:
         """Get all skill scores for a student"""
-        scores = {}
+        state = self._get_student_arrays(student_id)
+        memory_strengths = self.engine.memory_strengths(state, current_time).tolist()
+        probabilities = self.engine.probabilities(state, current_time).tolist()
+        practice_counts = state.practice_count.tolist()
+        correct_counts = state.correct_count.tolist()
         
-        for skill_id, skill in self.skills.items():
-            state = self.get_student_state(student_id, skill_id)
-            memory_strength = self.calculate_memory_strength(student_id, skill_id, current_time)
-            probability = self.predict_correctness(student_id, skill_id, current_time)
-            
+        scores = {}
+        for i, (skill_id, skill) in enumerate(self.skills.items()):
+            practice_count = practice_counts[i]
+            correct_count = correct_counts[i]
             scores[skill_id] = {
                 'name': skill.name,
                 'grade_level': skill.grade_level.name,
-                'memory_strength': round(memory_strength, 3),
-                'probability': round(probability, 3),
-                'practice_count': state.practice_count,
-                'correct_count': state.correct_count,
-                'accuracy': round(state.correct_count / state.practice_count, 3) if state.practice_count > 0 else 0.0
+                'memory_strength': round(memory_strengths[i], 3),
+                'probability': round(probabilities[i], 3),
+                'practice_count': practice_count,
+                'correct_count': correct_count,
+                'accuracy': round(correct_count / practice_count, 3) if practice_count > 0 else 0.0
             }
         
         return scores
     
+    def get_cohort_scores(self, student_ids: List[str], current_time: float,
+                          skill_ids: Optional[List[str]] = None) -> Dict[str, Dict[str, float]]:
+        """
+        Predicted probability of a correct answer for many students at once,
+        computed as one batched model prediction: student_id -> skill_id -> probability.
+        """
+        skill_ids = skill_ids if skill_ids is not None else self.catalog.skill_ids
+        skills = np.array([self.catalog.index[skill_id] for skill_id in skill_ids], dtype=np.int64)
+        states = [self._get_student_arrays(student_id) for student_id in student_ids]
+        probabilities = self.model.predict(states, skills, current_time).round(3).tolist()
+        
+        return {
+            student_id: dict(zip(skill_ids, row))
+            for student_id, row in zip(student_ids, probabilities)
+        }
+    
+    def get_review_schedule(self, student_id: str, current_time: float, threshold: float = 0.7) -> List[Dict]:
+        """
+        Closed-form review times for the student's practiced skills, earliest first.
+        due_at is when the predicted probability falls below threshold (None = never).
+        """
+        state = self._get_student_arrays(student_id)
+        due, by_due = self.engine.due_schedule(state, threshold)[:2]
+        
+        schedule = []
+        for i in by_due:
+            last_practice = state.last_practice(i)
+            if last_practice is None:
+                continue
+            due_at = last_practice if np.isneginf(due[i]) else float(due[i])
+            schedule.append({
+                'skill_id': self.catalog.skill_ids[i],
+                'name': self.catalog.names[i],
+                'due_at': due_at if np.isfinite(due_at) else None,
+                'is_due': bool(due_at <= current_time)
+            })
+        
+        return schedule
+    
     def get_recommended_skills(
         self, 
         student_id: str, 
         current_time: float, 
         threshold: float = 0.7,
         cold_start_grade_filter: Optional[str] = None,
-        grade_range: int = 1
+        grade_range: int = 1,
+        limit: Optional[int] = None,
+        eligible: Optional[np.ndarray] = None
     ) -> List[str]:
         """
         Get skills that need practice based on memory strength decay.
@@ -515,12 +860,9 @@ class DASHSystem:
             threshold: Probability threshold for recommendations
             cold_start_grade_filter: If provided, only recommend skills within ±grade_range
             grade_range: How many grades above/below to include (default: 1)
+            limit: If provided, return only the first limit skills
+            eligible: Optional boolean mask over catalog ordinals; other skills are skipped
         """
-        recommendations = []
-        skipped_prerequisites = []
-        skipped_above_threshold = []
-        skipped_grade_filter = []
-        
         # Parse grade filter if provided
         target_grade = None
         if cold_start_grade_filter:
@@ -529,49 +871,25 @@ class DASHSystem:
             except KeyError:
                 logger.warning(f"[FILTER] Invalid grade filter: {cold_start_grade_filter}")
         
-        for skill_id, skill in self.skills.items():
-            # Apply grade filter if in cold-start mode
-            if target_grade is not None:
-                grade_diff = abs(skill.grade_level.value - target_grade.value)
-                if grade_diff > grade_range:
-                    skipped_grade_filter.append((skill_id, skill.name, skill.grade_level.name))
-                    continue
-            
-            probability = self.predict_correctness(student_id, skill_id, current_time)
-            
-            # Check if prerequisites are met
-            prerequisites_met = True
-            missing_prereqs = []
-            for prereq_id in skill.prerequisites:
-                prereq_prob = self.predict_correctness(student_id, prereq_id, current_time)
-                if prereq_prob < threshold:
-                    prerequisites_met = False
-                    missing_prereqs.append((prereq_id, prereq_prob))
-            
-            # Recommend if probability is below threshold and prerequisites are met
-            if probability < threshold and prerequisites_met:
-                recommendations.append((skill_id, skill, probability))
-            elif not prerequisites_met:
-                skipped_prerequisites.append((skill_id, skill.name, missing_prereqs))
-            elif probability >= threshold:
-                skipped_above_threshold.append((skill_id, skill.name, probability))
+        state = self._get_student_arrays(student_id)
+        recommended = self.engine.recommend(
+            state,
+            current_time,
+            threshold=threshold,
+            target_grade=target_grade.value if target_grade is not None else None,
+            grade_range=grade_range,
+            limit=limit,
+            eligible=eligible
+        )
         
         # Log grade filtering if applied
-        if skipped_grade_filter and cold_start_grade_filter:
-            logger.info(f"[FILTER] Skipped {len(skipped_grade_filter)} skills outside grade range {cold_start_grade_filter}+-{grade_range}")
-        
-        # Sort by learning journey: grade level (ascending) -> order (ascending) -> probability (ascending)
-        # This ensures students follow a structured learning path
-        recommendations.sort(key=lambda x: (
-            x[1].grade_level.value,  # Grade level (K=0, Grade 1=1, etc.)
-            x[1].order,                # Order within grade
-            x[2]                       # Probability (lower = needs more practice)
-        ))
+        if target_grade is not None:
+            start, stop = self.catalog.grade_bucket_bounds(target_grade.value - grade_range, target_grade.value + grade_range)
+            skipped_grade_filter = self.catalog.size - (stop - start)
+            if skipped_grade_filter:
+                logger.info(f"[FILTER] Skipped {skipped_grade_filter} skills outside grade range {cold_start_grade_filter}+-{grade_range}")
         
-        # Log detailed information about skill recommendations
-        # Only log detailed learning journey once per batch request, not for every question
-        result = [skill_id for skill_id, _, _ in recommendations]
-        return result
+        return [self.catalog.skill_ids[i] for i in recommended]
     
     def analyze_recent_performance(self, user_profile: UserProfile, lookback_count: int = 5) -> Dict[str, float]:
         """
@@ -582,7 +900,7 @@ class DASHSystem:
         - 'correctness_rate': 0.0 to 1.0
         - 'avg_time_ratio': average response time / expected time
         """
-        if not user_profile.question_history or len(user_profile.question_history) == 0:
+        if user_profile.attempt_stats.total_questions == 0:
             # No history: start with medium difficulty
             log_print(f"[ADAPTIVE_DIFFICULTY] Student {user_profile.user_id}: No question history, using default difficulty (no adjustment)")
             return {
@@ -592,26 +910,23 @@ class DASHSystem:
                 'avg_time_ratio': 1.0
             }
         
-        # Get recent attempts (last N questions)
-        recent_attempts = user_profile.question_history[-lookback_count:]
-        total_history = len(user_profile.question_history)
+        # Get recent attempts (last N questions) from the profile's ring buffer;
+        # longer lookbacks need a profile loaded with its full history
+        if lookback_count <= user_profile.recent_attempts.maxlen:
+            recent_attempts = list(user_profile.recent_attempts)[-lookback_count:]
+        else:
+            recent_attempts = user_profile.question_history[-lookback_count:]
         
-        # Calculate correctness rate
+        # Calculate correctness rate (only a handful of attempts, so plain loops)
         correct_count = sum(1 for attempt in recent_attempts if attempt.is_correct)
-        correctness_rate = correct_count / len(recent_attempts)
+        correctness_rate = correct_count / len(recent_attempts) if recent_attempts else 0.0
         
-        # Calculate average response time ratio
-        # Get expected time from questions
+        # Calculate average response time ratio against each question's expected time
         time_ratios = []
-        time_details = []
         for attempt in recent_attempts:
             question = self.questions.get(attempt.question_id)
-            if question and attempt.response_time_seconds > 0:
-                expected_time = question.expected_time_seconds
-                if expected_time > 0:
-                    time_ratio = attempt.response_time_seconds / expected_time
-                    time_ratios.append(time_ratio)
-                    time_details.append((attempt.question_id, attempt.response_time_seconds, expected_time, time_ratio))
+            if question and attempt.response_time_seconds > 0 and question.expected_time_seconds > 0:
+                time_ratios.append(attempt.response_time_seconds / question.expected_time_seconds)
         
         avg_time_ratio = sum(time_ratios) / len(time_ratios) if time_ratios else 1.0
         
@@ -656,6 +971,208 @@ class DASHSystem:
             'avg_time_ratio': avg_time_ratio
         }
 
+    def _get_grade_appropriate_skills(self, student_id: str, user_profile: UserProfile, current_time: float) -> List[str]:
+        """
+        All skills within ±1 grade of the student (same range as cold-start filtering),
+        sorted by learning journey: grade level -> order -> probability (lower = needs more practice).
+        """
+        student_grade = GradeLevel[user_profile.current_grade]
+        grade_min = max(0, student_grade.value - 1)
+        grade_max = student_grade.value + 1
+        
+        state = self._get_student_arrays(student_id)
+        in_range = self.catalog.skills_in_grades(grade_min, grade_max)
+        probabilities = self.engine.probabilities(state, current_time, in_range)
+        return [self.catalog.skill_ids[i] for i in self.catalog.journey_sort(in_range, probabilities)]
+    
+    def _get_recommended_for_profile(self, student_id: str, user_profile: UserProfile, current_time: float,
+                                     limit: Optional[int] = None, eligible: Optional[np.ndarray] = None) -> List[str]:
+        """Recommended skills, grade-filtered while the student is in cold-start"""
+        # Apply grade filtering during cold-start phase (first 20 questions)
+        # This ensures age-appropriate questions for new students
+        cold_start_filter = None
+        if self.is_cold_start(user_profile):
+            cold_start_filter = user_profile.current_grade
+        
+        # Get recommended skills with optional grade filtering
+        return self.get_recommended_skills(
+            student_id, 
+            current_time,
+            cold_start_grade_filter=cold_start_filter,
+            grade_range=1,  # Allow ±1 grade level
+            limit=limit,
+            eligible=eligible
+        )
+    
+    def _get_exclusions_and_adjustment(self, user_profile: UserProfile,
+                                       exclude_question_ids: Optional[List[str]] = None) -> Tuple[ExcludedQuestions, set, float]:
+        """
+        Question IDs to exclude from selection and the adaptive difficulty adjustment.
+        Returns (exclusions, batch set, adjustment); questions picked later in the same
+        batch are added to the batch set, the profile's answered set is never copied.
+        """
+        # Exclude answered questions and questions already selected in the current batch
+        batch_question_ids = set(exclude_question_ids or [])
+        excluded = ExcludedQuestions(user_profile.answered_question_ids, batch_question_ids)
+        
+        # Analyze recent performance to determine difficulty adjustment
+        performance_analysis = self.analyze_recent_performance(user_profile)
+        difficulty_adjustment = performance_analysis['difficulty_adjustment']
+        
+        return excluded, batch_question_ids, difficulty_adjustment
+    
+    def _select_from_skills(self, skill_ids: List[str], start: int, excluded_question_ids: ExcludedQuestions,
+                            difficulty_adjustment: float, unanswered: np.ndarray,
+                            flexible: bool = False) -> Tuple[Optional[Question], int]:
+        """
+        Walk skill_ids from position start and return the first skill's best question
+        at its adaptive target difficulty, with the position it was found at.
+        Skills before that position have no unanswered questions left; skills whose
+        unanswered counter is zero are skipped without touching their pool.
+        """
+        for position in range(start, len(skill_ids)):
+            skill = self.skills.get(skill_ids[position])
+            if not skill or unanswered[self.catalog.index[skill.skill_id]] <= 0:
+                continue
+            
+            # Calculate target difficulty based on skill difficulty and performance
+            target_difficulty = skill.difficulty + difficulty_adjustment
+            
+            # Closest unanswered question within ±0.2 of the target; if none is in range,
+            # the closest match at any difficulty so we always return a question if available
+            selection = self.question_index.select(skill.skill_id, target_difficulty, excluded_question_ids)
+            if not selection:
+                continue  # Skip silently
+            
+            selected, is_fallback = selection
+            if not is_fallback:
+                mode = "FLEXIBLE, " if flexible else ""
+                log_print(f"[QUESTION_SELECTED] Q:{selected.question_id} | Skill:{skill.name} | "
+                          f"Difficulty:{selected.difficulty:.2f} ({mode}target:{target_difficulty:.2f}, adj:{difficulty_adjustment:+.2f})")
+            else:
+                mode = "FLEXIBLE_FALLBACK" if flexible else "FALLBACK"
+                log_print(f"[QUESTION_SELECTED] Q:{selected.question_id} | Skill:{skill.name} | "
+                          f"Difficulty:{selected.difficulty:.2f} ({mode}, target:{target_difficulty:.2f})")
+            return selected, position
+        
+        return None, len(skill_ids)
+    
+    def _select_by_gain(self, student_id: str, user_profile: UserProfile, current_time: float,
+                        recommended_skills: List[str], batch_question_ids: set, limit: int) -> List[Question]:
+        """
+        Up to limit questions from all recommended skills ranked by expected learning gain
+        (vectorized over every unanswered candidate), excluding answered and batch questions.
+        """
+        unanswered = self._get_unanswered_counts(student_id, user_profile)
+        skills = np.array([self.catalog.index[skill_id] for skill_id in recommended_skills], dtype=np.int64)
+        skills = skills[unanswered[skills] > 0]
+        if skills.size == 0:
+            return []
+        
+        # One selector throughout, so ordinals stay consistent if questions are added meanwhile
+        gain_selector = self._get_gain_selector()
+        question_arrays = gain_selector.question_arrays
+        excluded = question_arrays.question_ordinals(user_profile.answered_question_ids)
+        if batch_question_ids:
+            excluded = np.union1d(excluded, question_arrays.question_ordinals(batch_question_ids))
+        
+        state = self._get_student_arrays(student_id, user_profile)
+        picks = gain_selector.rank(state, current_time, skills, excluded, limit=limit)
+        
+        selected_questions = []
+        for question_ordinal, skill_ordinal, score in picks:
+            question = question_arrays.questions[question_ordinal]
+            log_print(f"[QUESTION_SELECTED] Q:{question.question_id} | Skill:{self.catalog.names[skill_ordinal]} | "
+                      f"Difficulty:{question.difficulty:.2f} (GAIN, score:{score:+.3f})")
+            selected_questions.append(question)
+        return selected_questions
+    
+    def plan_session(self, student_id: str, n: int, current_time: Optional[float] = None,
+                     exclude_question_ids: Optional[List[str]] = None,
+                     user_profile: Optional[UserProfile] = None) -> List[Question]:
+        """
+        Select up to n questions for a session in a single pass.
+        
+        Same rules as calling get_next_question_flexible n times (recommended skills in
+        learning-journey order first, then all grade-appropriate skills, adaptive difficulty),
+        but the profile is loaded once and recommendations, the answered set and the
+        performance analysis are computed once for the whole batch.
+        
+        Args:
+            student_id: Student identifier
+            n: Number of questions to select
+            current_time: Current timestamp (defaults to now)
+            exclude_question_ids: Question IDs to exclude in addition to answered ones
+            user_profile: Already-loaded profile, to skip the MongoDB load
+        """
+        selected_questions, _ = self._plan_session(student_id, n, current_time, exclude_question_ids, user_profile)
+        return selected_questions
+    
+    def plan_next_questions(self, student_id: str, n: int, current_time: Optional[float] = None,
+                            user_profile: Optional[UserProfile] = None) -> Tuple[Optional[Question], List[Question]]:
+        """
+        (get_next_question, plan_session) for the same state in one selection pass: the
+        next question is the first planned one if it came from a recommended skill
+        (get_next_question does not fall back to other grade-appropriate skills)
+        """
+        selected_questions, recommended_count = self._plan_session(student_id, max(n, 1), current_time, None, user_profile)
+        next_question = selected_questions[0] if recommended_count else None
+        return next_question, selected_questions[:n]
+    
+    def _plan_session(self, student_id: str, n: int, current_time: Optional[float],
+                      exclude_question_ids: Optional[List[str]],
+                      user_profile: Optional[UserProfile]) -> Tuple[List[Question], int]:
+        """plan_session, also returning how many leading picks came from recommended skills"""
+        if current_time is None:
+            current_time = time.time()
+        
+        if user_profile is None:
+            user_profile = self.get_user_profile(student_id)
+        if not user_profile:
+            return [], 0
+        
+        unanswered = self._get_unanswered_counts(student_id, user_profile)
+        recommended_skills = self._get_recommended_for_profile(student_id, user_profile, current_time)
+        excluded, batch_question_ids, difficulty_adjustment = self._get_exclusions_and_adjustment(
+            user_profile, exclude_question_ids
+        )
+        grade_skills = None
+        
+        # Exhausted skills stay exhausted as the batch grows, so each list is walked once
+        selected_questions = []
+        recommended_pos = 0
+        grade_pos = 0
+        
+        if self.selection_mode == "gain":
+            # Gain mode takes what it wants from all recommended skills at once; anything
+            # still missing comes from the grade-appropriate walk below
+            selected_questions = self._select_by_gain(
+                student_id, user_profile, current_time, recommended_skills, batch_question_ids, n
+            )
+            batch_question_ids.update(question.question_id for question in selected_questions)
+            recommended_pos = len(recommended_skills)
+        recommended_count = len(selected_questions)
+        while len(selected_questions) < n:
+            question, recommended_pos = self._select_from_skills(
+                recommended_skills, recommended_pos, excluded, difficulty_adjustment, unanswered
+            )
+            if not question:
+                # Recommended skills exhausted: expand to all grade-appropriate skills
+                if grade_skills is None:
+                    grade_skills = self._get_grade_appropriate_skills(student_id, user_profile, current_time)
+                question, grade_pos = self._select_from_skills(
+                    grade_skills, grade_pos, excluded, difficulty_adjustment, unanswered, flexible=True
+                )
+            else:
+                recommended_count += 1
+            if not question:
+                break
+            
+            selected_questions.append(question)
+            batch_question_ids.add(question.question_id)
+        
+        return selected_questions, recommended_count
+    
     def get_next_question_flexible(self, student_id: str, current_time: float, exclude_question_ids: Optional[List[str]] = None, force_grade_range: bool = False) -> Optional[Question]:
         """
         Flexible question selection that expands search when primary skills exhausted.
@@ -677,165 +1194,68 @@ class DASHSystem:
                 return question
         
         # If no question found from recommended skills, expand to all grade-appropriate skills
-        user_profile = self.user_manager.load_user(student_id)
+        user_profile = self.get_user_profile(student_id)
         if not user_profile:
             return None
         
-        # Get grade range (same as cold-start filtering)
-        student_grade = GradeLevel[user_profile.current_grade]
-        grade_min = max(0, student_grade.value - 1)
-        grade_max = student_grade.value + 1
-        
-        # Get all skills in grade range
-        grade_appropriate_skills = [
-            skill for skill in self.skills.values()
-            if grade_min <= skill.grade_level.value <= grade_max
-        ]
-        
-        # Sort by learning journey (grade -> order -> current probability)
-        skill_probabilities = []
-        for skill in grade_appropriate_skills:
-            prob = self.predict_correctness(student_id, skill.skill_id, current_time)
-            skill_probabilities.append((skill.skill_id, skill, prob))
-        
-        # Sort by grade level, order, then probability (lower prob = needs more practice)
-        skill_probabilities.sort(key=lambda x: (x[1].grade_level.value, x[1].order, x[2]))
-        
-        # Get answered questions to exclude
-        answered_question_ids = {attempt.question_id for attempt in user_profile.question_history}
-        if exclude_question_ids:
-            answered_question_ids.update(exclude_question_ids)
-        
-        # Analyze performance for adaptive difficulty
-        performance_analysis = self.analyze_recent_performance(user_profile)
-        difficulty_adjustment = performance_analysis['difficulty_adjustment']
+        unanswered = self._get_unanswered_counts(student_id, user_profile)
+        grade_skills = self._get_grade_appropriate_skills(student_id, user_profile, current_time)
+        answered_question_ids, _, difficulty_adjustment = self._get_exclusions_and_adjustment(
+            user_profile, exclude_question_ids
+        )
         
         # Try each skill in learning journey order with adaptive difficulty
-        for skill_id, skill, probability in skill_probabilities:
-            # Calculate target difficulty (same as normal DASH)
-            base_difficulty = skill.difficulty
-            target_difficulty = base_difficulty + difficulty_adjustment
-            min_difficulty = max(0.0, target_difficulty - 0.2)
-            max_difficulty = target_difficulty + 0.2
-            
-            # Get candidate questions for this skill
-            all_candidates = [
-                q for q in self.questions.values()
-                if skill_id in q.skill_ids and q.question_id not in answered_question_ids
-            ]
-            
-            if not all_candidates:
-                continue
-            
-            # Filter by difficulty range (adaptive selection)
-            filtered_candidates = [
-                q for q in all_candidates
-                if min_difficulty <= q.difficulty <= max_difficulty
-            ]
-            
-            # Select best match
-            if filtered_candidates:
-                filtered_candidates.sort(key=lambda q: abs(q.difficulty - target_difficulty))
-                selected = filtered_candidates[0]
-                log_print(f"[QUESTION_SELECTED] Q:{selected.question_id} | Skill:{skill.name} | "
-                          f"Difficulty:{selected.difficulty:.2f} (FLEXIBLE, target:{target_difficulty:.2f}, adj:{difficulty_adjustment:+.2f})")
-                return selected
-            
-            # Use closest match if no exact difficulty match
-            all_candidates.sort(key=lambda q: abs(q.difficulty - target_difficulty))
-            selected = all_candidates[0]
-            log_print(f"[QUESTION_SELECTED] Q:{selected.question_id} | Skill:{skill.name} | "
-                      f"Difficulty:{selected.difficulty:.2f} (FLEXIBLE_FALLBACK, target:{target_difficulty:.2f})")
-            return selected
+        question, _ = self._select_from_skills(
+            grade_skills, 0, answered_question_ids, difficulty_adjustment, unanswered, flexible=True
+        )
         
-        # Truly no questions available in grade range
-        return None
+        # None if truly no questions available in grade range
+        return question
     
-    def get_next_question(self, student_id: str, current_time: float, is_retry: bool = False, exclude_question_ids: Optional[List[str]] = None) -> Optional[Question]:
+    def get_next_question(self, student_id: str, current_time: float, is_retry: bool = False, exclude_question_ids: Optional[List[str]] = None,
+                          user_profile: Optional[UserProfile] = None) -> Optional[Question]:
         """
         Get the next best question for the student, avoiding repeats.
         Intelligently selects question difficulty based on recent performance.
         If no questions are available, try to generate one.
+        An already-loaded user_profile skips the MongoDB load.
         """
         # Load user profile first to check cold-start status
-        user_profile = self.user_manager.load_user(student_id)
+        if user_profile is None:
+            user_profile = self.get_user_profile(student_id)
         if not user_profile:
             return None
         
-        # Apply grade filtering during cold-start phase (first 20 questions)
-        # This ensures age-appropriate questions for new students
-        cold_start_filter = None
-        if self.is_cold_start(user_profile):
-            cold_start_filter = user_profile.current_grade
+        # Only the first skill with a question left is used. Skills with no unanswered
+        # questions are dropped up front, and each batch-excluded question can empty at
+        # most its own skills, so that many extra skills is always enough
+        unanswered = self._get_unanswered_counts(student_id, user_profile)
+        if self.selection_mode == "gain":
+            recommended_skills = self._get_recommended_for_profile(
+                student_id, user_profile, current_time, eligible=unanswered > 0
+            )
+            selected = self._select_by_gain(
+                student_id, user_profile, current_time, recommended_skills, set(exclude_question_ids or []), 1
+            )
+            return selected[0] if selected else None
         
-        # Get recommended skills with optional grade filtering
-        recommended_skills = self.get_recommended_skills(
-            student_id, 
-            current_time,
-            cold_start_grade_filter=cold_start_filter,
-            grade_range=1  # Allow ±1 grade level
+        limit = 1 + sum(
+            len(self.questions[qid].skill_ids) for qid in (exclude_question_ids or []) if qid in self.questions
+        )
+        recommended_skills = self._get_recommended_for_profile(
+            student_id, user_profile, current_time, limit=limit, eligible=unanswered > 0
         )
-        
         if not recommended_skills:
             return None
         
-        answered_question_ids = {attempt.question_id for attempt in user_profile.question_history}
-        
-        # Also exclude questions that are already selected in the current batch
-        if exclude_question_ids:
-            answered_question_ids.update(exclude_question_ids)
-        
-        # Analyze recent performance to determine difficulty adjustment
-        performance_analysis = self.analyze_recent_performance(user_profile)
-        difficulty_adjustment = performance_analysis['difficulty_adjustment']
+        answered_question_ids, _, difficulty_adjustment = self._get_exclusions_and_adjustment(
+            user_profile, exclude_question_ids
+        )
         
         # Try to find an unanswered question from the recommended skills with adaptive difficulty
-        for skill_idx, skill_id in enumerate(recommended_skills, 1):
-            skill = self.skills.get(skill_id)
-            if not skill:
-                continue
-            
-            # Calculate target difficulty range based on skill difficulty and performance
-            base_difficulty = skill.difficulty
-            target_difficulty = base_difficulty + difficulty_adjustment
-            
-            # Allow some flexibility: ±0.2 around target difficulty
-            min_difficulty = max(0.0, target_difficulty - 0.2)
-            max_difficulty = target_difficulty + 0.2
-            
-            # Reduced verbosity - only log when selecting a question
-            
-            # Get all candidate questions for this skill
-            all_candidates = [
-                q for q in self.questions.values() 
-                if skill_id in q.skill_ids and q.question_id not in answered_question_ids
-            ]
-            
-            if not all_candidates:
-                continue  # Skip silently
-            
-            # Filter by difficulty range (adaptive selection)
-            filtered_candidates = [
-                q for q in all_candidates
-                if min_difficulty <= q.difficulty <= max_difficulty
-            ]
-            
-            # If we have questions in the target difficulty range, use them
-            if filtered_candidates:
-                # Sort by how close they are to target difficulty, then return the best match
-                filtered_candidates.sort(key=lambda q: abs(q.difficulty - target_difficulty))
-                selected = filtered_candidates[0]
-                log_print(f"[QUESTION_SELECTED] Q:{selected.question_id} | Skill:{skill.name} | "
-                      f"Difficulty:{selected.difficulty:.2f} (target:{target_difficulty:.2f}, adj:{difficulty_adjustment:+.2f})")
-                return selected
-            
-            # If no questions in target range, use closest match from all candidates
-            # This ensures we always return a question if available
-            all_candidates.sort(key=lambda q: abs(q.difficulty - target_difficulty))
-            selected = all_candidates[0]
-            log_print(f"[QUESTION_SELECTED] Q:{selected.question_id} | Skill:{skill.name} | "
-                      f"Difficulty:{selected.difficulty:.2f} (FALLBACK, target:{target_difficulty:.2f})")
-            return selected
-
-        # No unanswered questions found
-        return None
\ No newline at end of file
+        question, _ = self._select_from_skills(
+            recommended_skills, 0, answered_question_ids, difficulty_adjustment, unanswered
+        )
+        
+        # None if no unanswered questions found
+        return question
@@ -0,0 +1,110 @@
+"""
+Expected-Learning-Gain Question Selection for DASH
+Optional selection mode: scores every unanswered candidate of every recommended
+skill in one vectorized pass over QuestionArrays, instead of taking the question
+closest to the target difficulty in the first recommended skill.
+"""
+
+import logging
+import os
+import time
+from typing import List, Tuple
+
+import numpy as np
+
+from services.DashSystem.question_index import QuestionArrays
+from services.DashSystem.skill_engine import SkillStateEngine, StudentSkillArrays
+
+logger = logging.getLogger(__name__)
+
+# Scoring slower than this is logged, so pool growth shows up before it hurts latency
+GAIN_BUDGET_MS = float(os.getenv("DASH_GAIN_BUDGET_MS", "20"))
+
+
+class GainSelector:
+    """
+    Ranks candidate questions by expected gain in memory strength, weighted by due-ness.
+
+    - P(correct) for a question is the model's skill prediction shifted by how much
+      harder or easier the question is than the skill (for DASH: sigmoid(m - question difficulty))
+    - expected gain comes from the model (KnowledgeTracingModel.expected_gains)
+    - due-ness is how far the skill's prediction is below the recommendation threshold
+    """
+
+    def __init__(self, engine: SkillStateEngine, question_arrays: QuestionArrays):
+        self.engine = engine
+        self.question_arrays = question_arrays
+
+    def rank(
+        self,
+        state: StudentSkillArrays,
+        current_time: float,
+        skills: np.ndarray,
+        excluded: np.ndarray,
+        threshold: float = 0.7,
+        limit: int = 1
+    ) -> List[Tuple[int, int, float]]:
+        """
+        Best limit (question ordinal, skill ordinal, score) picks among the candidates of
+        skills (recommended ordinals, in journey order), skipping question ordinals in excluded.
+        Highest score first; ties go to the earlier skill in journey order, then bank order,
+        so the top limit picks equal limit successive single picks.
+        """
+        if limit <= 0:
+            return []
+
+        started = time.perf_counter()
+        arrays = self.question_arrays
+        catalog = self.engine.catalog
+
+        rows, owner = arrays.rows_for(skills)
+        excluded_mask = np.zeros(len(arrays.questions), dtype=bool)
+        excluded_mask[excluded] = True
+        available = ~excluded_mask[arrays.row_question[rows]]
+        rows, owner = rows[available], owner[available]
+        if rows.size == 0:
+            return []
+
+        row_skill = arrays.row_skill[rows]
+        skill_probability = self.engine.probabilities(state, current_time, skills)[owner]
+
+        # Shift the skill-level logit by the question's difficulty relative to its skill
+        clipped = np.clip(skill_probability, 1e-9, 1.0 - 1e-9)
+        logit = np.log(clipped / (1.0 - clipped)) - (arrays.row_difficulty[rows] - catalog.difficulty[row_skill])
+        correct_probability = 1.0 / (1.0 + np.exp(-logit))
+
+        gains = self.engine.model.expected_gains(state, current_time, row_skill, correct_probability)
+        dueness = np.maximum(0.0, threshold - skill_probability) / threshold
+        scores = gains * dueness
+
+        question = arrays.row_question[rows]
+        picks = self._top(scores, owner, question, row_skill, limit, partial=True)
+        if len(picks) < limit and len(picks) < rows.size:
+            # Multi-skill questions filled the partial top-k with duplicates
+            picks = self._top(scores, owner, question, row_skill, limit, partial=False)
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if elapsed_ms > GAIN_BUDGET_MS:
+            logger.warning(f"[GAIN_SELECTION] Scored {rows.size} candidates in {elapsed_ms:.1f}ms (budget {GAIN_BUDGET_MS:.0f}ms)")
+        return picks
+
+    @staticmethod
+    def _top(scores, owner, question, row_skill, limit: int, partial: bool) -> List[Tuple[int, int, float]]:
+        """Distinct questions in (score desc, journey position, bank order); partial sorts only the top limit scores"""
+        candidates = np.arange(scores.size)
+        if partial and limit < scores.size:
+            kth = np.partition(-scores, limit - 1)[limit - 1]
+            candidates = np.flatnonzero(-scores <= kth)
+        order = candidates[np.lexsort((question[candidates], owner[candidates], -scores[candidates]))]
+
+        picks = []
+        seen = set()
+        for r in order:
+            q = int(question[r])
+            if q in seen:
+                continue  # multi-skill question already picked through another skill
+            seen.add(q)
+            picks.append((q, int(row_skill[r]), float(scores[r])))
+            if len(picks) >= limit:
+                break
+        return picks
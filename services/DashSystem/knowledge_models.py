@@ -0,0 +1,213 @@
+"""
+Knowledge-Tracing Models for DASH
+A model owns the prediction and update rules over array-backed student states,
+so DASHSystem can swap or compare models (DASH, BKT, IRT-style...) without
+changing selection or persistence. DASHModel is the default.
+"""
+
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from services.DashSystem.skill_engine import SkillCatalog, StudentSkillArrays
+
+
+@dataclass
+class PracticeEvent:
+    """One answer on one skill (catalog ordinal)"""
+    skill: int
+    is_correct: bool
+    time: float
+    response_time_seconds: float = 0.0
+
+
+@dataclass
+class SkillUpdate:
+    """A skill's stored strength before and after an update; direct=False for propagated effects"""
+    skill: int
+    before: float
+    after: float
+    direct: bool = True
+
+
+class KnowledgeTracingModel(ABC):
+    """
+    Prediction and update rules over StudentSkillArrays for one SkillCatalog.
+    skills arguments are catalog ordinals (an int or an index array); None means all skills.
+    """
+
+    def __init__(self, catalog: SkillCatalog):
+        self.catalog = catalog
+
+    @abstractmethod
+    def memory_strengths(self, state: StudentSkillArrays, current_time: float, skills=None) -> np.ndarray:
+        """The model's latent knowledge of each skill at current_time"""
+
+    @abstractmethod
+    def probabilities(self, state: StudentSkillArrays, current_time: float, skills=None) -> np.ndarray:
+        """Predicted probability of answering each skill correctly at current_time"""
+
+    @abstractmethod
+    def update(self, state: StudentSkillArrays, events: Sequence[PracticeEvent], propagate: bool = True) -> List[SkillUpdate]:
+        """
+        Apply events in order and mark the changed skills dirty. Only the practiced
+        skills and their transitive prerequisites may change; propagate=False
+        restricts the update to the practiced skills themselves.
+        """
+
+    def predict(self, states: Sequence[StudentSkillArrays], skills=None, current_time: float = 0.0) -> np.ndarray:
+        """Batch prediction: a (students x skills) matrix of probabilities"""
+        if not states:
+            return np.zeros((0, self._width(skills)))
+        return np.stack([self.probabilities(state, current_time, skills) for state in states])
+
+    def expected_gains(self, state: StudentSkillArrays, current_time: float, skills: np.ndarray,
+                       correct_probabilities: np.ndarray) -> np.ndarray:
+        """
+        Expected change in each skill's strength from one more answer, given the predicted
+        probability of answering correctly (skills may repeat, one entry per candidate).
+        Models without a learning increment use outcome uncertainty p * (1 - p) as a proxy.
+        """
+        return correct_probabilities * (1.0 - correct_probabilities)
+
+    def due_times(self, state: StudentSkillArrays, threshold: float = 0.7) -> np.ndarray:
+        """
+        Earliest time each skill can fall below threshold; -inf means "evaluate now".
+        Models without a closed form keep this default, so every skill is evaluated.
+        """
+        return np.full(self.catalog.size, -np.inf)
+
+    def _width(self, skills) -> int:
+        if skills is None:
+            return self.catalog.size
+        return int(np.size(skills))
+
+
+def dash_time_penalty(response_time_seconds: float) -> float:
+    """Reward multiplier for a correct answer: halved after 3 minutes"""
+    if response_time_seconds > 180:  # 3 minutes
+        return 0.5
+    return 1.0
+
+
+class DASHModel(KnowledgeTracingModel):
+    """
+    DASH: memory strength decays as m * exp(-forgetting_rate * dt) and
+    P(correct) = sigmoid(memory_strength - difficulty).
+    Correct answers add 1 / (1 + 0.1 * correct_count) (halved for slow answers, capped at 5);
+    wrong answers subtract 0.2 (floored at -2) and 0.1 from every transitive prerequisite.
+    """
+
+    max_strength = 5.0
+    min_strength = -2.0
+    wrong_penalty = 0.2
+    prerequisite_penalty = 0.1
+
+    def memory_strengths(self, state: StudentSkillArrays, current_time: float, skills=None) -> np.ndarray:
+        if skills is None:
+            strength = state.memory_strength
+            last_practice = state.last_practice_time
+            forgetting_rate = self.catalog.forgetting_rate
+        else:
+            strength = state.memory_strength[skills]
+            last_practice = state.last_practice_time[skills]
+            forgetting_rate = self.catalog.forgetting_rate[skills]
+        return self._decay(strength, last_practice, forgetting_rate, current_time)
+
+    def probabilities(self, state: StudentSkillArrays, current_time: float, skills=None) -> np.ndarray:
+        difficulty = self.catalog.difficulty if skills is None else self.catalog.difficulty[skills]
+        return self._sigmoid(self.memory_strengths(state, current_time, skills) - difficulty)
+
+    def predict(self, states: Sequence[StudentSkillArrays], skills=None, current_time: float = 0.0) -> np.ndarray:
+        if not states:
+            return np.zeros((0, self._width(skills)))
+        idx = slice(None) if skills is None else np.atleast_1d(skills)
+        strength = np.stack([state.memory_strength[idx] for state in states])
+        last_practice = np.stack([state.last_practice_time[idx] for state in states])
+        decayed = self._decay(strength, last_practice, self.catalog.forgetting_rate[idx], current_time)
+        return self._sigmoid(decayed - self.catalog.difficulty[idx])
+
+    def update(self, state: StudentSkillArrays, events: Sequence[PracticeEvent], propagate: bool = True) -> List[SkillUpdate]:
+        updates = []
+        for event in events:
+            i = event.skill
+            before = float(state.memory_strength[i])
+
+            state.practice_count[i] += 1
+            if event.is_correct:
+                state.correct_count[i] += 1
+
+            current_strength = float(self.memory_strengths(state, event.time, i))
+            if event.is_correct:
+                # Base strength increment with diminishing returns, reduced for slow answers
+                increment = 1.0 / (1 + 0.1 * int(state.correct_count[i]))
+                increment *= dash_time_penalty(event.response_time_seconds)
+                after = min(self.max_strength, current_strength + increment)
+            else:
+                after = max(self.min_strength, current_strength - self.wrong_penalty)
+
+            state.memory_strength[i] = after
+            state.last_practice_time[i] = event.time
+            state.mark_dirty((i,))
+            updates.append(SkillUpdate(i, before, after))
+
+            # Wrong answers also weaken every prerequisite (not counted as practice)
+            if propagate and not event.is_correct:
+                prerequisites = self.catalog.prerequisites.ancestors(i)
+                if prerequisites.size:
+                    previous = state.memory_strength[prerequisites].copy()
+                    current = self.memory_strengths(state, event.time, prerequisites)
+                    state.memory_strength[prerequisites] = np.maximum(self.min_strength, current - self.prerequisite_penalty)
+                    state.last_practice_time[prerequisites] = event.time
+                    state.mark_dirty(prerequisites.tolist())
+                    updates.extend(
+                        SkillUpdate(int(p), float(b), float(a), direct=False)
+                        for p, b, a in zip(prerequisites, previous, state.memory_strength[prerequisites])
+                    )
+        return updates
+
+    def expected_gains(self, state: StudentSkillArrays, current_time: float, skills: np.ndarray,
+                       correct_probabilities: np.ndarray) -> np.ndarray:
+        """p * (increment if correct) - (1 - p) * (penalty if wrong), on the practiced skill, without a time penalty"""
+        strength = self.memory_strengths(state, current_time, skills)
+        increment = 1.0 / (1 + 0.1 * (state.correct_count[skills] + 1))
+        gain = np.minimum(self.max_strength, strength + increment) - strength
+        loss = strength - np.maximum(self.min_strength, strength - self.wrong_penalty)
+        return correct_probabilities * gain - (1.0 - correct_probabilities) * loss
+
+    def due_times(self, state: StudentSkillArrays, threshold: float = 0.7) -> np.ndarray:
+        """
+        Closed-form time at which each skill's probability drops below threshold.
+
+        With m(t) = m0 * exp(-rate * (t - t0)), P < threshold exactly when
+        m(t) < L where L = logit(threshold) + difficulty, so a skill at or above L
+        crosses at t0 + ln(m0 / L) / rate (only possible when m0 > 0 and L > 0).
+        Skills already below L are due now (-inf); skills that never cross are +inf.
+        """
+        limit = np.log(threshold / (1.0 - threshold)) + self.catalog.difficulty
+        strength = state.memory_strength
+        last_practice = state.last_practice_time
+        forgetting_rate = self.catalog.forgetting_rate
+
+        due = np.full(self.catalog.size, np.inf)
+        due[strength < limit] = -np.inf
+        crossing = (strength >= limit) & (strength > 0) & (limit > 0) & (forgetting_rate > 0) & ~np.isnan(last_practice)
+        due[crossing] = (
+            last_practice[crossing]
+            + np.log(strength[crossing] / limit[crossing]) / forgetting_rate[crossing]
+        )
+        return due
+
+    @staticmethod
+    def _decay(strength, last_practice, forgetting_rate, current_time: float) -> np.ndarray:
+        """Exponential decay since last practice; never-practiced (NaN) skills keep their strength"""
+        with np.errstate(over='ignore', invalid='ignore'):
+            decayed = strength * np.exp(-forgetting_rate * (current_time - last_practice))
+        return np.where(np.isnan(last_practice), strength, decayed)
+
+    @staticmethod
+    def _sigmoid(logit) -> np.ndarray:
+        with np.errstate(over='ignore'):
+            return 1.0 / (1.0 + np.exp(-logit))
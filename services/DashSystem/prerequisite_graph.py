@@ -0,0 +1,117 @@
+"""
+Compiled Prerequisite Graph for DASH
+Built once per catalog load: validates prerequisite edges, breaks cycles,
+and precomputes the transitive ancestor closure of every skill.
+"""
+
+import logging
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# DFS colors for cycle detection
+_WHITE, _GRAY, _BLACK = 0, 1, 2
+
+
+class PrerequisiteGraph:
+    """
+    Prerequisite DAG over catalog ordinals.
+
+    - topological_order: ordinals with every prerequisite before its dependents
+    - ancestors(i): all transitive prerequisites of skill i, in the same
+      depth-first order the recursive walk used to produce
+    - ancestor_depths(i): hop distance from skill i to each ancestor
+    - bad_edges: (skill_id, prereq_id, reason) edges dropped at load time
+    """
+
+    def __init__(self, skill_ids: List[str], prerequisites: Dict[str, List[str]]):
+        self.skill_ids = skill_ids
+        index = {skill_id: i for i, skill_id in enumerate(skill_ids)}
+        size = len(skill_ids)
+
+        self.bad_edges: List[Tuple[str, str, str]] = []
+        direct: List[List[int]] = []
+        for skill_id in skill_ids:
+            edges = []
+            for prereq_id in prerequisites.get(skill_id, []):
+                prereq_ordinal = index.get(prereq_id)
+                if prereq_ordinal is None:
+                    self.bad_edges.append((skill_id, prereq_id, "unknown prerequisite"))
+                elif prereq_ordinal == index[skill_id]:
+                    self.bad_edges.append((skill_id, prereq_id, "cycle"))
+                elif prereq_ordinal in edges:
+                    self.bad_edges.append((skill_id, prereq_id, "duplicate"))
+                else:
+                    edges.append(prereq_ordinal)
+            direct.append(edges)
+
+        # Iterative DFS: drops back edges (cycles) and emits a post-order,
+        # which lists every prerequisite before the skills that depend on it
+        color = [_WHITE] * size
+        topological_order = []
+        for root in range(size):
+            if color[root] != _WHITE:
+                continue
+            color[root] = _GRAY
+            stack = [(root, 0)]
+            while stack:
+                node, edge_pos = stack[-1]
+                if edge_pos < len(direct[node]):
+                    stack[-1] = (node, edge_pos + 1)
+                    prereq = direct[node][edge_pos]
+                    if color[prereq] == _GRAY:
+                        self.bad_edges.append((skill_ids[node], skill_ids[prereq], "cycle"))
+                        direct[node][edge_pos] = -1
+                    elif color[prereq] == _WHITE:
+                        color[prereq] = _GRAY
+                        stack.append((prereq, 0))
+                else:
+                    color[node] = _BLACK
+                    topological_order.append(node)
+                    stack.pop()
+        direct = [[p for p in edges if p >= 0] for edges in direct]
+        self.topological_order = np.array(topological_order, dtype=np.int64)
+
+        # Direct prerequisites in CSR form
+        self.direct_ptr = np.cumsum([0] + [len(edges) for edges in direct]).astype(np.int64)
+        self.direct_idx = np.array([p for edges in direct for p in edges], dtype=np.int64)
+
+        # Transitive closure in topological order, so each prerequisite's
+        # ancestors are already known when its dependents are visited
+        closure: List[List[int]] = [[] for _ in range(size)]
+        depths: List[List[int]] = [[] for _ in range(size)]
+        for node in topological_order:
+            order: List[int] = []
+            depth_of: Dict[int, int] = {}
+            for prereq in direct[node]:
+                for ancestor, depth in [(prereq, 1)] + list(zip(closure[prereq], [d + 1 for d in depths[prereq]])):
+                    if ancestor not in depth_of:
+                        order.append(ancestor)
+                        depth_of[ancestor] = depth
+                    elif depth < depth_of[ancestor]:
+                        depth_of[ancestor] = depth
+            closure[node] = order
+            depths[node] = [depth_of[a] for a in order]
+
+        self.ancestor_ptr = np.cumsum([0] + [len(a) for a in closure]).astype(np.int64)
+        self.ancestor_idx = np.array([a for ancestors in closure for a in ancestors], dtype=np.int64)
+        self.ancestor_depth = np.array([d for ds in depths for d in ds], dtype=np.int64)
+
+    def direct_prerequisites(self, i: int) -> np.ndarray:
+        """Ordinals of skill i's direct prerequisites"""
+        return self.direct_idx[self.direct_ptr[i]:self.direct_ptr[i + 1]]
+
+    def ancestors(self, i: int) -> np.ndarray:
+        """Ordinals of all of skill i's transitive prerequisites"""
+        return self.ancestor_idx[self.ancestor_ptr[i]:self.ancestor_ptr[i + 1]]
+
+    def ancestor_depths(self, i: int) -> np.ndarray:
+        """Hop distance to each entry of ancestors(i)"""
+        return self.ancestor_depth[self.ancestor_ptr[i]:self.ancestor_ptr[i + 1]]
+
+    def log_bad_edges(self):
+        """Report prerequisite edges that were dropped while compiling the graph"""
+        for skill_id, prereq_id, reason in self.bad_edges:
+            logger.warning(f"[PREREQUISITES] Dropped edge {skill_id} -> {prereq_id} ({reason})")
@@ -0,0 +1,166 @@
+"""
+Precomputed Question Cache for DASH
+The next questions for a student, selected (with their Perseus items) right after
+an answer is recorded, so the following question request is a lookup instead of a
+selection pass. Entries are tagged with the student's persisted state_version and
+the in-process catalog_version and are only served while both still match, within
+a bounded age (recommendations also drift with time as memories decay).
+SessionPlanCache briefly keeps whole planned sessions for repeated identical requests.
+All operations are thread-safe.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from services.DashSystem.dash_system import Question
+
+DEFAULT_PRECOMPUTE_COUNT = int(os.getenv("DASH_PRECOMPUTE_COUNT", "5"))
+DEFAULT_PRECOMPUTE_MAX_USERS = int(os.getenv("DASH_PRECOMPUTE_MAX_USERS", "10000"))
+DEFAULT_PRECOMPUTE_TTL_SECONDS = float(os.getenv("DASH_PRECOMPUTE_TTL_SECONDS", "300"))
+
+
+@dataclass
+class PrecomputedQuestions:
+    """Selections for one student state: what /next-question and /api/questions would return"""
+    state_version: int
+    catalog_version: int
+    next_question: Optional[Question]
+    questions: List[Question]
+    perseus_items: List[Dict]
+    created_at: float = field(default_factory=time.monotonic)
+
+    def perseus_items_for(self, questions: List[Question]) -> List[Dict]:
+        """The cached Perseus items of the given questions, in their order"""
+        by_question_id = {item['dash_metadata']['dash_question_id']: item for item in self.perseus_items}
+        return [by_question_id[q.question_id] for q in questions if q.question_id in by_question_id]
+
+
+class PrecomputedQuestionCache:
+    """student_id -> PrecomputedQuestions, least recently written first, at most max_users entries"""
+
+    def __init__(self, max_users: int = DEFAULT_PRECOMPUTE_MAX_USERS,
+                 ttl_seconds: float = DEFAULT_PRECOMPUTE_TTL_SECONDS):
+        self.max_users = max_users
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, PrecomputedQuestions]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+
+    def get(self, student_id: str, state_version: int, catalog_version: int) -> Optional[PrecomputedQuestions]:
+        """The student's entry if it was computed for exactly this state and catalog, else None"""
+        with self._lock:
+            entry = self._entries.get(student_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            if (entry.state_version != state_version or entry.catalog_version != catalog_version
+                    or (self.ttl_seconds > 0 and time.monotonic() - entry.created_at > self.ttl_seconds)):
+                del self._entries[student_id]
+                self.stale += 1
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry
+
+    def put(self, student_id: str, entry: PrecomputedQuestions):
+        """Store an entry unless a newer state's entry is already there"""
+        with self._lock:
+            current = self._entries.get(student_id)
+            if current is not None and current.state_version > entry.state_version:
+                return
+            self._entries[student_id] = entry
+            self._entries.move_to_end(student_id)
+            while self.max_users > 0 and len(self._entries) > self.max_users:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, student_id: str):
+        with self._lock:
+            self._entries.pop(student_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'stale': self.stale,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'max_users': self.max_users,
+                'ttl_seconds': self.ttl_seconds
+            }
+
+
+DEFAULT_PLAN_CACHE_TTL_SECONDS = float(os.getenv("DASH_PLAN_CACHE_TTL_SECONDS", "30"))
+DEFAULT_PLAN_CACHE_MAX_ENTRIES = int(os.getenv("DASH_PLAN_CACHE_MAX_ENTRIES", "10000"))
+
+
+class SessionPlanCache:
+    """
+    Short-lived cache of planned sessions (the Perseus items returned by /api/questions),
+    keyed by (student_id, sample_size, state_version, catalog_version), so repeated
+    identical requests for an unchanged state get the same plan without recomputing it.
+    """
+
+    def __init__(self, ttl_seconds: float = DEFAULT_PLAN_CACHE_TTL_SECONDS,
+                 max_entries: int = DEFAULT_PLAN_CACHE_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        # key -> (expiry time, items); every entry has the same TTL, so insertion order is expiry order
+        self._entries: "OrderedDict[Tuple, Tuple[float, List[Dict]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Tuple) -> Optional[List[Dict]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Tuple, items: List[Dict]):
+        if self.ttl_seconds <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._entries.pop(key, None)
+            self._entries[key] = (now + self.ttl_seconds, items)
+            while self._entries:
+                oldest_key, (expires_at, _) = next(iter(self._entries.items()))
+                if expires_at >= now and (self.max_entries <= 0 or len(self._entries) <= self.max_entries):
+                    break
+                del self._entries[oldest_key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'ttl_seconds': self.ttl_seconds,
+                'max_entries': self.max_entries
+            }
@@ -0,0 +1,190 @@
+"""
+Per-Skill Question Index for DASH
+Built at catalog load: skill_id -> questions grouped and sorted by difficulty,
+so selection bisects around the target difficulty instead of scanning the bank.
+QuestionArrays holds the same pools as flat NumPy arrays for vectorized scoring.
+"""
+
+from bisect import bisect_left, bisect_right
+from typing import Container, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+
+class SkillQuestionPool:
+    """Questions for one skill, grouped by difficulty (ascending), each group in catalog order"""
+
+    def __init__(self):
+        self.difficulties: List[float] = []
+        self.groups: List[List['Question']] = []
+        self.size = 0
+
+    def add(self, question: 'Question'):
+        pos = bisect_left(self.difficulties, question.difficulty)
+        if pos < len(self.difficulties) and self.difficulties[pos] == question.difficulty:
+            self.groups[pos].append(question)
+        else:
+            self.difficulties.insert(pos, question.difficulty)
+            self.groups.insert(pos, [question])
+        self.size += 1
+
+    def nearest(
+        self,
+        target_difficulty: float,
+        excluded: Container[str],
+        min_difficulty: Optional[float] = None,
+        max_difficulty: Optional[float] = None,
+        ordinals: Optional[Dict[str, int]] = None
+    ) -> Optional['Question']:
+        """
+        Closest question to target_difficulty that is not excluded, optionally
+        restricted to [min_difficulty, max_difficulty]. Equal distances resolve
+        to the question that comes first in the catalog.
+        """
+        low = 0 if min_difficulty is None else bisect_left(self.difficulties, min_difficulty)
+        high = len(self.difficulties) if max_difficulty is None else bisect_right(self.difficulties, max_difficulty)
+        right = max(low, min(high, bisect_left(self.difficulties, target_difficulty)))
+        left = right - 1
+
+        while left >= low or right < high:
+            left_distance = abs(self.difficulties[left] - target_difficulty) if left >= low else float('inf')
+            right_distance = abs(self.difficulties[right] - target_difficulty) if right < high else float('inf')
+
+            left_pick = self._first_available(self.groups[left], excluded) if left_distance <= right_distance else None
+            right_pick = self._first_available(self.groups[right], excluded) if right_distance <= left_distance else None
+
+            if left_pick and right_pick:
+                if ordinals is not None and ordinals[right_pick.question_id] < ordinals[left_pick.question_id]:
+                    return right_pick
+                return left_pick
+            if left_pick or right_pick:
+                return left_pick or right_pick
+
+            if left_distance <= right_distance:
+                left -= 1
+            if right_distance <= left_distance:
+                right += 1
+        return None
+
+    @staticmethod
+    def _first_available(group: List['Question'], excluded: Container[str]) -> Optional['Question']:
+        for question in group:
+            if question.question_id not in excluded:
+                return question
+        return None
+
+
+class ExcludedQuestions:
+    """Membership view over several question-ID sets, so exclusions are checked without copying them"""
+
+    def __init__(self, *id_sets: Container[str]):
+        self.id_sets = id_sets
+
+    def __contains__(self, question_id: str) -> bool:
+        return any(question_id in id_set for id_set in self.id_sets)
+
+
+class QuestionIndex:
+    """skill_id -> SkillQuestionPool over the loaded question bank"""
+
+    def __init__(self, questions: Dict[str, 'Question']):
+        self.ordinals: Dict[str, int] = {}
+        self.pools: Dict[str, SkillQuestionPool] = {}
+        for question in questions.values():
+            self.add(question)
+
+    def pool_size(self, skill_id: str) -> int:
+        """Number of questions in a skill's pool"""
+        pool = self.pools.get(skill_id)
+        return pool.size if pool else 0
+
+    def add(self, question: 'Question'):
+        """Index a question added to the bank after load"""
+        self.ordinals[question.question_id] = len(self.ordinals)
+        for skill_id in question.skill_ids:
+            pool = self.pools.get(skill_id)
+            if pool is None:
+                pool = self.pools[skill_id] = SkillQuestionPool()
+            pool.add(question)
+
+    def select(
+        self,
+        skill_id: str,
+        target_difficulty: float,
+        excluded: Container[str],
+        tolerance: float = 0.2
+    ) -> Optional[Tuple['Question', bool]]:
+        """
+        Pick the unanswered question for a skill closest to target_difficulty.
+        Prefers questions within ±tolerance (never below 0.0); otherwise falls back
+        to the closest question at any difficulty.
+
+        Returns (question, is_fallback), or None if the skill has no unanswered questions.
+        """
+        pool = self.pools.get(skill_id)
+        if pool is None:
+            return None
+
+        question = pool.nearest(
+            target_difficulty,
+            excluded,
+            min_difficulty=max(0.0, target_difficulty - tolerance),
+            max_difficulty=target_difficulty + tolerance,
+            ordinals=self.ordinals
+        )
+        if question:
+            return question, False
+
+        question = pool.nearest(target_difficulty, excluded, ordinals=self.ordinals)
+        if question:
+            return question, True
+        return None
+
+
+class QuestionArrays:
+    """
+    Array-backed candidate pools aligned with a SkillCatalog.
+
+    One row per (question, catalog skill) pair, grouped by skill ordinal in CSR form:
+    the rows of skill s are skill_ptr[s]:skill_ptr[s + 1], sorted by difficulty and
+    then catalog order. Questions are numbered by their position in the bank.
+    """
+
+    def __init__(self, questions: Dict[str, 'Question'], catalog: 'SkillCatalog'):
+        self.questions: List['Question'] = list(questions.values())
+        self.ordinals: Dict[str, int] = {q.question_id: i for i, q in enumerate(self.questions)}
+
+        skill_rows, question_rows = [], []
+        for ordinal, question in enumerate(self.questions):
+            for skill_id in question.skill_ids:
+                skill = catalog.index.get(skill_id)
+                if skill is not None:
+                    skill_rows.append(skill)
+                    question_rows.append(ordinal)
+
+        skill = np.array(skill_rows, dtype=np.int64)
+        question = np.array(question_rows, dtype=np.int64)
+        difficulty = np.array([self.questions[q].difficulty for q in question_rows], dtype=np.float64)
+        order = np.lexsort((question, difficulty, skill))
+
+        self.row_skill = skill[order]
+        self.row_question = question[order]
+        self.row_difficulty = difficulty[order]
+        self.skill_ptr = np.searchsorted(self.row_skill, np.arange(catalog.size + 1), side='left').astype(np.int64)
+
+    def rows_for(self, skills: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Row indices of every candidate of the given skill ordinals, skill by skill,
+        and for each row the position in skills it came from.
+        """
+        starts = self.skill_ptr[skills]
+        counts = self.skill_ptr[skills + 1] - starts
+        total = int(counts.sum())
+        owner = np.repeat(np.arange(skills.size), counts)
+        offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        return np.repeat(starts, counts) + offsets, owner
+
+    def question_ordinals(self, question_ids: Iterable[str]) -> np.ndarray:
+        """Sorted bank ordinals of the given question IDs (unknown IDs are ignored)"""
+        ordinals = [self.ordinals[qid] for qid in question_ids if qid in self.ordinals]
+        return np.unique(np.array(ordinals, dtype=np.int64))
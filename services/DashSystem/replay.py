@@ -0,0 +1,319 @@
+"""
+Event-Sourced Replay of DASH Skill States
+A student's skill_states are a fold of their ordered question_history under the
+model's update rules, starting from the cold-start strengths of their grade.
+ReplayEngine re-derives them (after a rule change or a bug), ReplayDiffer compares
+two rule sets on the same history, and ReplayRunner fans either out over all
+users on a process pool with resumable checkpoints.
+"""
+
+import json
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+from services.DashSystem.skill_engine import SkillCatalog, StudentSkillArrays, SkillStateEngine, grade_value
+from services.DashSystem.knowledge_models import DASHModel, KnowledgeTracingModel, PracticeEvent
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REPLAY_WORKERS = int(os.getenv("DASH_REPLAY_WORKERS", str(os.cpu_count() or 1)))
+DEFAULT_REPLAY_BATCH_USERS = int(os.getenv("DASH_REPLAY_BATCH_USERS", "200"))
+DEFAULT_CHECKPOINT_EVERY = int(os.getenv("DASH_REPLAY_CHECKPOINT_EVERY", "5000"))
+
+USER_PROJECTION = {"_id": 0, "user_id": 1, "current_grade": 1, "skill_template_grade": 1, "question_history": 1}
+
+
+def stream_user_histories(users_collection, batch_size: int = DEFAULT_REPLAY_BATCH_USERS,
+                          after_user_id: Optional[str] = None, projection: Optional[dict] = None) -> Iterator[dict]:
+    """
+    Users with a question history in user_id order, fetched batch_size documents at a time.
+    after_user_id resumes a run from its last checkpoint.
+    """
+    query = {"question_history.0": {"$exists": True}}
+    if after_user_id is not None:
+        query["user_id"] = {"$gt": after_user_id}
+    cursor = users_collection.find(query, projection=projection or USER_PROJECTION).sort("user_id", 1).batch_size(batch_size)
+    for user_doc in cursor:
+        yield user_doc
+
+
+class ReplayEngine:
+    """Rebuilds one student's StudentSkillArrays from their attempt history"""
+
+    def __init__(self, catalog: SkillCatalog, model: Optional[KnowledgeTracingModel] = None):
+        self.catalog = catalog
+        self.model = model or DASHModel(catalog)
+        self.engine = SkillStateEngine(self.model)
+
+    def template_grade(self, user_doc: dict) -> str:
+        """The grade whose cold-start template the profile starts from (legacy profiles: their current grade)"""
+        return user_doc.get('skill_template_grade') or user_doc.get('current_grade') or 'K'
+
+    def initial_state(self, user_doc: dict) -> StudentSkillArrays:
+        state = StudentSkillArrays(self.catalog.size)
+        state.memory_strength[:] = self.catalog.grade_template(grade_value(self.template_grade(user_doc)))
+        return state
+
+    def replay(self, user_doc: dict,
+               observer: Optional[Callable[[StudentSkillArrays, List[int], dict], None]] = None) -> StudentSkillArrays:
+        """
+        Fold the user's question_history (oldest first) into a fresh state.
+        observer(state, ordinals, attempt) sees each attempt before it is applied.
+        """
+        state = self.initial_state(user_doc)
+        history = sorted(user_doc.get('question_history') or [], key=lambda attempt: attempt.get('timestamp', 0.0))
+        index = self.catalog.index
+        for attempt in history:
+            ordinals = [index[s] for s in attempt.get('skill_ids', []) if s in index]
+            if not ordinals:
+                continue
+            if observer is not None:
+                observer(state, ordinals, attempt)
+            t = float(attempt['timestamp'])
+            is_correct = bool(attempt['is_correct'])
+            response_time = float(attempt.get('response_time_seconds', 0.0))
+            self.model.update(state, [PracticeEvent(i, is_correct, t, response_time) for i in ordinals])
+        state.dirty.clear()
+        return state
+
+    def skill_state_documents(self, state: StudentSkillArrays) -> Dict[str, dict]:
+        """
+        skill_id -> stored SkillState dict for every skill the history touched
+        (the sparse skill_states of a profile; the rest come from its grade template)
+        """
+        touched = np.flatnonzero(~np.isnan(state.last_practice_time))
+        return {
+            self.catalog.skill_ids[i]: {
+                'memory_strength': float(state.memory_strength[i]),
+                'last_practice_time': state.last_practice(i),
+                'practice_count': int(state.practice_count[i]),
+                'correct_count': int(state.correct_count[i])
+            }
+            for i in touched
+        }
+
+    def rebuild(self, user_doc: dict) -> dict:
+        """The fields to $set on the user document for its replayed state"""
+        state = self.replay(user_doc)
+        return {
+            'user_id': user_doc['user_id'],
+            'skill_states': self.skill_state_documents(state),
+            'skill_template_grade': self.template_grade(user_doc),
+            'next_review_at': self.engine.next_review_at(state)
+        }
+
+    def rebuild_batch(self, user_docs: List[dict]) -> List[dict]:
+        return [self.rebuild(user_doc) for user_doc in user_docs]
+
+
+@dataclass
+class ReplayDiff:
+    """
+    Per-skill aggregates of how a new rule set changes replayed states, evaluated at
+    each user's last answer: summed |change| in P(correct), and mastery (P >= threshold)
+    gained or lost.
+    """
+    size: int
+    users: int = 0
+    changed_users: int = 0
+    abs_probability_change: np.ndarray = None
+    max_probability_change: np.ndarray = None
+    mastery_gained: np.ndarray = None
+    mastery_lost: np.ndarray = None
+
+    def __post_init__(self):
+        for name, dtype in (('abs_probability_change', np.float64), ('max_probability_change', np.float64),
+                            ('mastery_gained', np.int64), ('mastery_lost', np.int64)):
+            if getattr(self, name) is None:
+                setattr(self, name, np.zeros(self.size, dtype=dtype))
+
+    def add(self, old_probabilities: np.ndarray, new_probabilities: np.ndarray, threshold: float):
+        change = np.abs(new_probabilities - old_probabilities)
+        old_mastered = old_probabilities >= threshold
+        new_mastered = new_probabilities >= threshold
+        self.users += 1
+        self.changed_users += int((old_mastered != new_mastered).any())
+        self.abs_probability_change += change
+        np.maximum(self.max_probability_change, change, out=self.max_probability_change)
+        self.mastery_gained += new_mastered & ~old_mastered
+        self.mastery_lost += old_mastered & ~new_mastered
+
+    def merge(self, other: 'ReplayDiff') -> 'ReplayDiff':
+        self.users += other.users
+        self.changed_users += other.changed_users
+        self.abs_probability_change += other.abs_probability_change
+        np.maximum(self.max_probability_change, other.max_probability_change, out=self.max_probability_change)
+        self.mastery_gained += other.mastery_gained
+        self.mastery_lost += other.mastery_lost
+        return self
+
+    def summary(self, catalog: SkillCatalog, top: int = 10) -> Dict[str, Any]:
+        """Overall counts and the skills whose predictions moved the most"""
+        mean_change = self.abs_probability_change / max(self.users, 1)
+        most_changed = np.argsort(-mean_change, kind='stable')[:top]
+        return {
+            'users': self.users,
+            'users_with_mastery_change': self.changed_users,
+            'mastery_gained': int(self.mastery_gained.sum()),
+            'mastery_lost': int(self.mastery_lost.sum()),
+            'mean_abs_probability_change': float(mean_change.mean()) if self.size else 0.0,
+            'most_changed_skills': [
+                {
+                    'skill_id': catalog.skill_ids[i],
+                    'mean_abs_probability_change': float(mean_change[i]),
+                    'max_abs_probability_change': float(self.max_probability_change[i]),
+                    'mastery_gained': int(self.mastery_gained[i]),
+                    'mastery_lost': int(self.mastery_lost[i])
+                }
+                for i in most_changed
+            ]
+        }
+
+
+class ReplayDiffer:
+    """What changes for students when the old rules/parameters are replaced by new ones"""
+
+    def __init__(self, old: ReplayEngine, new: ReplayEngine, threshold: float = 0.7):
+        if old.catalog.skill_ids != new.catalog.skill_ids:
+            raise ValueError("Old and new replay engines must share the same skills")
+        self.old = old
+        self.new = new
+        self.threshold = threshold
+
+    def diff_batch(self, user_docs: List[dict]) -> ReplayDiff:
+        diff = ReplayDiff(self.old.catalog.size)
+        for user_doc in user_docs:
+            history = user_doc.get('question_history') or []
+            if not history:
+                continue
+            at_time = max(float(attempt.get('timestamp', 0.0)) for attempt in history)
+            old_state = self.old.replay(user_doc)
+            new_state = self.new.replay(user_doc)
+            diff.add(
+                self.old.model.probabilities(old_state, at_time),
+                self.new.model.probabilities(new_state, at_time),
+                self.threshold
+            )
+        return diff
+
+
+# Per-process job for ReplayRunner workers, set once by the pool initializer
+_worker_job: Optional[Callable[[List[dict]], Any]] = None
+
+
+def _init_worker(job: Callable[[List[dict]], Any]):
+    global _worker_job
+    _worker_job = job
+
+
+def _run_worker_batch(user_docs: List[dict]) -> Any:
+    return _worker_job(user_docs)
+
+
+class ReplayRunner:
+    """
+    Applies a batch job (e.g. ReplayEngine.rebuild_batch or ReplayDiffer.diff_batch) to a
+    stream of users sorted by user_id, on a process pool. Results are handed to on_result
+    in stream order, and every checkpoint_every users the last finished user_id is saved
+    to checkpoint_path, so an interrupted run resumes with stream_user_histories(after_user_id=...).
+    """
+
+    def __init__(
+        self,
+        job: Callable[[List[dict]], Any],
+        workers: int = DEFAULT_REPLAY_WORKERS,
+        batch_users: int = DEFAULT_REPLAY_BATCH_USERS,
+        checkpoint_path: Optional[str] = None,
+        checkpoint_every: int = DEFAULT_CHECKPOINT_EVERY
+    ):
+        self.job = job
+        self.workers = max(1, workers)
+        self.batch_users = max(1, batch_users)
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_every = checkpoint_every
+
+    def load_checkpoint(self) -> Optional[dict]:
+        """The saved checkpoint, or None to start from the beginning"""
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return None
+        with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def resume_after(self) -> Optional[str]:
+        """user_id to resume after, or None for a fresh or completed run"""
+        checkpoint = self.load_checkpoint()
+        if not checkpoint or checkpoint.get('completed'):
+            return None
+        return checkpoint.get('last_user_id')
+
+    def run(self, user_docs: Iterable[dict], on_result: Callable[[Any], None]) -> int:
+        """Process every user; returns how many were processed in this run"""
+        start = time.perf_counter()
+        processed = 0
+        since_checkpoint = 0
+        last_user_id = None
+
+        def finished(result, batch_size, batch_last_user_id):
+            nonlocal processed, since_checkpoint, last_user_id
+            on_result(result)
+            processed += batch_size
+            since_checkpoint += batch_size
+            last_user_id = batch_last_user_id
+            if self.checkpoint_every > 0 and since_checkpoint >= self.checkpoint_every:
+                self._save_checkpoint(last_user_id, processed, completed=False)
+                since_checkpoint = 0
+                rate = processed / max(time.perf_counter() - start, 1e-9)
+                logger.info(f"[REPLAY] {processed} users done ({rate:.0f} users/s), checkpoint at {last_user_id}")
+
+        if self.workers == 1:
+            for batch in self._batches(user_docs):
+                finished(self.job(batch), len(batch), batch[-1].get('user_id'))
+        else:
+            # Bounded in-flight window: memory stays O(workers * batch_users) and results come back in order
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker, initargs=(self.job,)) as pool:
+                pending = deque()
+                for batch in self._batches(user_docs):
+                    pending.append((pool.submit(_run_worker_batch, batch), len(batch), batch[-1].get('user_id')))
+                    if len(pending) >= 2 * self.workers:
+                        future, batch_size, batch_last_user_id = pending.popleft()
+                        finished(future.result(), batch_size, batch_last_user_id)
+                while pending:
+                    future, batch_size, batch_last_user_id = pending.popleft()
+                    finished(future.result(), batch_size, batch_last_user_id)
+
+        self._save_checkpoint(last_user_id, processed, completed=True)
+        elapsed = time.perf_counter() - start
+        logger.info(f"[REPLAY] Processed {processed} users in {elapsed:.1f}s on {self.workers} worker(s)")
+        return processed
+
+    def _batches(self, user_docs: Iterable[dict]) -> Iterator[List[dict]]:
+        batch = []
+        for user_doc in user_docs:
+            batch.append(user_doc)
+            if len(batch) >= self.batch_users:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def _save_checkpoint(self, last_user_id: Optional[str], processed: int, completed: bool):
+        if not self.checkpoint_path:
+            return
+        checkpoint = {
+            'last_user_id': last_user_id,
+            'users': processed,
+            'completed': completed,
+            'updated_at': time.time()
+        }
+        # Write-then-rename so a crash never leaves a truncated checkpoint
+        temp_path = f"{self.checkpoint_path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(checkpoint, f)
+        os.replace(temp_path, self.checkpoint_path)
@@ -0,0 +1,117 @@
+"""
+Tutoring Sessions for DASH
+A student's state kept resident for one live connection: the profile is loaded
+once, the cached skill arrays are pinned so they cannot be evicted, answers are
+applied in memory, and writes are batched and flushed at safe points (every few
+answers, when the connection goes idle, and on close). HTTP requests for the
+student meanwhile share the resident profile, so they see the unsaved answers.
+Methods block on locks and MongoDB, so async callers run them in a threadpool.
+One session per student at a time is assumed.
+"""
+
+import os
+import time
+from typing import Dict, Iterable, List, Optional
+
+from services.DashSystem.dash_system import DASHSystem, Question
+
+DEFAULT_SESSION_QUEUE_SIZE = int(os.getenv("DASH_SESSION_QUEUE_SIZE", "3"))
+DEFAULT_SESSION_FLUSH_EVERY = int(os.getenv("DASH_SESSION_FLUSH_EVERY", "5"))
+DEFAULT_SESSION_FLUSH_SECONDS = float(os.getenv("DASH_SESSION_FLUSH_SECONDS", "30"))
+
+
+class TutoringSession:
+    """
+    Resident state of one student's session. The client is kept supplied with
+    queue_size questions it has not answered yet; unsaved answers are written once
+    flush_every of them are pending or flush_seconds have passed since the last write.
+    """
+
+    def __init__(
+        self,
+        dash_system: DASHSystem,
+        user_id: str,
+        queue_size: int = DEFAULT_SESSION_QUEUE_SIZE,
+        flush_every: int = DEFAULT_SESSION_FLUSH_EVERY,
+        flush_seconds: float = DEFAULT_SESSION_FLUSH_SECONDS
+    ):
+        self.dash_system = dash_system
+        self.user_id = user_id
+        self.queue_size = queue_size
+        self.flush_every = max(1, flush_every)
+        self.flush_seconds = flush_seconds
+
+        self.user_profile = None
+        # Question ids delivered to the client and not answered yet, in delivery order
+        self.queued: List[str] = []
+        self.last_flush = time.monotonic()
+
+    def open(self):
+        """Load the student once and pin their cached state for the session"""
+        with self.dash_system.user_locks.hold(self.user_id):
+            self.user_profile = self.dash_system.pin_user(self.user_id)
+
+    def answer(self, question_id: str, skill_ids: List[str], is_correct: bool,
+               response_time_seconds: float) -> Dict[str, Dict]:
+        """Apply an answer in memory (flushing if due); returns the affected skills' deltas"""
+        with self.dash_system.user_locks.hold(self.user_id):
+            skill_deltas = self.dash_system.record_question_attempt_with_deltas(
+                self.user_profile, question_id, skill_ids, is_correct, response_time_seconds, persist=False
+            )
+            if question_id in self.queued:
+                self.queued.remove(question_id)
+            if self.flush_due():
+                self._flush()
+        return skill_deltas
+
+    def next_questions(self, count: Optional[int] = None) -> List[Question]:
+        """
+        Select count more questions, or (by default) enough to refill the client's
+        queue. Call queue() with the ids actually delivered.
+        """
+        with self.dash_system.user_locks.hold(self.user_id):
+            n = count if count is not None else self.queue_size - len(self.queued)
+            if n <= 0:
+                return []
+            return self.dash_system.plan_session(
+                self.user_id,
+                n,
+                current_time=time.time(),
+                exclude_question_ids=self.queued,
+                user_profile=self.user_profile
+            )
+
+    def queue(self, question_ids: Iterable[str]):
+        """Record questions delivered to the client"""
+        self.queued.extend(question_ids)
+
+    @property
+    def unsaved_answers(self) -> int:
+        return len(self.user_profile.unsaved_attempts) if self.user_profile else 0
+
+    def flush_due(self) -> bool:
+        pending = self.unsaved_answers
+        return pending >= self.flush_every or (
+            pending > 0 and time.monotonic() - self.last_flush >= self.flush_seconds
+        )
+
+    def flush(self) -> int:
+        """Write any unsaved answers and skill states now; returns how many answers were written"""
+        with self.dash_system.user_locks.hold(self.user_id):
+            return self._flush()
+
+    def close(self):
+        """Flush and release the pinned state; the session cannot be used afterwards"""
+        try:
+            if self.user_profile is not None:
+                self.flush()
+        finally:
+            with self.dash_system.user_locks.hold(self.user_id):
+                self.dash_system.unpin_user(self.user_id)
+
+    def _flush(self) -> int:
+        pending = self.unsaved_answers
+        if pending:
+            self.dash_system.save_user_state(self.user_id, self.user_profile)
+        self.last_flush = time.monotonic()
+        return pending
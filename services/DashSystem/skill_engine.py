@@ -0,0 +1,327 @@
+"""
+Vectorized Skill-State Engine for DASH
+Keeps catalog parameters and per-student skill states as aligned NumPy arrays
+indexed by catalog ordinal, so scoring and recommendations run as a handful of
+array operations instead of one Python call per skill.
+"""
+
+import copy
+import logging
+from typing import Dict, Iterable, List, Optional, Set
+
+import numpy as np
+
+from services.DashSystem.prerequisite_graph import PrerequisiteGraph
+
+logger = logging.getLogger(__name__)
+
+# Cold-start strengths relative to the student's grade, chosen for meaningful probabilities under the sigmoid
+# (see SkillCatalog.grade_template)
+COLD_START_BELOW_GRADE = 2.0  # sigmoid(2.0) ≈ 0.88
+COLD_START_AT_GRADE = 0.0  # sigmoid(0.0) = 0.50
+COLD_START_ABOVE_GRADE = -2.0  # sigmoid(-2.0) ≈ 0.12
+
+
+def grade_value(grade_name: Optional[str]) -> int:
+    """GradeLevel name ('K', 'GRADE_3', ...) to its value; unknown grades count as K"""
+    if grade_name and grade_name.startswith("GRADE_"):
+        try:
+            return int(grade_name[len("GRADE_"):])
+        except ValueError:
+            pass
+    return 0
+
+
+class SkillCatalog:
+    """
+    Immutable, array-backed view of the skills catalog.
+
+    Every skill gets a stable ordinal (its position in the skills dict) and all
+    per-skill parameters are stored in arrays aligned on that ordinal.
+    """
+
+    def __init__(self, skills: Dict[str, 'Skill']):
+        self.skill_ids: List[str] = list(skills.keys())
+        self.index: Dict[str, int] = {skill_id: i for i, skill_id in enumerate(self.skill_ids)}
+        self.size = len(self.skill_ids)
+
+        skill_list = list(skills.values())
+        self.names: List[str] = [skill.name for skill in skill_list]
+        self.forgetting_rate = np.array([skill.forgetting_rate for skill in skill_list], dtype=np.float64)
+        self.difficulty = np.array([skill.difficulty for skill in skill_list], dtype=np.float64)
+        self.grade = np.array([skill.grade_level.value for skill in skill_list], dtype=np.int64)
+        self.order = np.array([skill.order for skill in skill_list], dtype=np.int64)
+
+        # Validated prerequisite DAG; its direct edges drive recommendation gating
+        # (prereq_owner[k] is the skill that requires prereq_idx[k])
+        self.prerequisites = PrerequisiteGraph(
+            self.skill_ids,
+            {skill.skill_id: skill.prerequisites for skill in skill_list}
+        )
+        self.prereq_ptr = self.prerequisites.direct_ptr
+        self.prereq_idx = self.prerequisites.direct_idx
+        self.prereq_owner = np.repeat(np.arange(self.size, dtype=np.int64), np.diff(self.prereq_ptr))
+
+        # Grade buckets: all ordinals in learning-journey order (grade -> order -> catalog
+        # order), so the skills of a grade range are one contiguous slice of journey_order.
+        # journey_group ranks each skill's (grade, order) pair; probability breaks ties within a group.
+        self.journey_order = np.lexsort((self.order, self.grade))
+        journey_grade = self.grade[self.journey_order]
+        journey_key = np.stack((journey_grade, self.order[self.journey_order]))
+        new_group = np.ones(self.size, dtype=bool)
+        new_group[1:] = (journey_key[:, 1:] != journey_key[:, :-1]).any(axis=0)
+        self.journey_group = np.empty(self.size, dtype=np.int64)
+        self.journey_group[self.journey_order] = np.cumsum(new_group) - 1
+        self.grade_levels = np.unique(self.grade)
+        self.grade_starts = np.searchsorted(journey_grade, self.grade_levels, side='left')
+        self.grade_stops = np.searchsorted(journey_grade, self.grade_levels, side='right')
+
+        # grade -> read-only cold-start strengths, built on first use
+        self._grade_templates: Dict[Optional[int], np.ndarray] = {}
+
+    def grade_template(self, grade: Optional[int]) -> np.ndarray:
+        """
+        Cold-start memory strengths of a student in the given grade: skills below it start
+        mastered, skills at it half-known, skills above it not yet known. None gives the
+        legacy all-zero start. Shared and read-only; copy before writing.
+        """
+        template = self._grade_templates.get(grade)
+        if template is None:
+            if grade is None:
+                template = np.zeros(self.size, dtype=np.float64)
+            else:
+                template = np.where(
+                    self.grade < grade, COLD_START_BELOW_GRADE,
+                    np.where(self.grade == grade, COLD_START_AT_GRADE, COLD_START_ABOVE_GRADE)
+                )
+            template.flags.writeable = False
+            self._grade_templates[grade] = template
+        return template
+
+    def with_parameters(self, forgetting_rate: np.ndarray, difficulty: np.ndarray) -> 'SkillCatalog':
+        """A copy of the catalog with other per-skill parameters (e.g. a calibrated version)"""
+        catalog = copy.copy(self)
+        catalog._grade_templates = {}
+        catalog.forgetting_rate = np.asarray(forgetting_rate, dtype=np.float64)
+        catalog.difficulty = np.asarray(difficulty, dtype=np.float64)
+        return catalog
+
+    def grade_bucket_bounds(self, min_grade: int, max_grade: int) -> tuple:
+        """(start, stop) of the journey_order slice holding grades min_grade..max_grade"""
+        low = np.searchsorted(self.grade_levels, min_grade, side='left')
+        high = np.searchsorted(self.grade_levels, max_grade, side='right')
+        if low >= high:
+            return 0, 0
+        return int(self.grade_starts[low]), int(self.grade_stops[high - 1])
+
+    def skills_in_grades(self, min_grade: int, max_grade: int) -> np.ndarray:
+        """Ordinals of skills in grades min_grade..max_grade, in learning-journey order"""
+        start, stop = self.grade_bucket_bounds(min_grade, max_grade)
+        return self.journey_order[start:stop]
+
+    def journey_sort(self, indices: np.ndarray, probabilities: np.ndarray) -> np.ndarray:
+        """
+        Sort skill ordinals by learning journey: grade level -> order -> probability.
+        indices must be ascending (or already in journey order) and probabilities
+        aligned with them; ties keep catalog order, matching a stable sort over the skills dict.
+        """
+        order = np.lexsort((probabilities, self.journey_group[indices]))
+        return indices[order]
+
+
+class StudentSkillArrays:
+    """
+    One student's skill states, aligned with a SkillCatalog.
+    A NaN last_practice_time means the skill has never been practiced.
+    """
+
+    def __init__(self, size: int):
+        self.memory_strength = np.zeros(size, dtype=np.float64)
+        self.last_practice_time = np.full(size, np.nan, dtype=np.float64)
+        self.practice_count = np.zeros(size, dtype=np.int64)
+        self.correct_count = np.zeros(size, dtype=np.int64)
+        
+        # Unanswered questions left in each skill's pool; filled in by DASHSystem
+        # from the profile's answered set and decremented as answers come in
+        self.unanswered_questions: Optional[np.ndarray] = None
+        
+        # Ordinals changed since the last save
+        self.dirty: Set[int] = set()
+        
+        # threshold -> (due times, ordinals sorted by due time, sorted due times, latest practice)
+        self._due_schedules: Dict[float, tuple] = {}
+
+    @classmethod
+    def from_skill_states(cls, catalog: SkillCatalog, skill_states: Dict[str, 'SkillState'],
+                          template_grade: Optional[int] = None) -> 'StudentSkillArrays':
+        """
+        Build arrays from a profile's skill_states. Profiles only store the skills that were
+        practiced or changed; the rest come from the cold-start template of template_grade.
+        """
+        arrays = cls(catalog.size)
+        arrays.memory_strength[:] = catalog.grade_template(template_grade)
+        for skill_id, skill_state in skill_states.items():
+            i = catalog.index.get(skill_id)
+            if i is None:
+                continue
+            arrays.memory_strength[i] = skill_state.memory_strength
+            if skill_state.last_practice_time is not None:
+                arrays.last_practice_time[i] = skill_state.last_practice_time
+            arrays.practice_count[i] = skill_state.practice_count
+            arrays.correct_count[i] = skill_state.correct_count
+        return arrays
+
+    def mark_changed(self):
+        """Call after writing to the arrays so derived schedules are recomputed"""
+        self._due_schedules.clear()
+
+    def mark_dirty(self, ordinals: Iterable[int]):
+        """Record skills written since the last save (and invalidate derived schedules)"""
+        self.dirty.update(ordinals)
+        self.mark_changed()
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by the arrays"""
+        arrays = (self.memory_strength, self.last_practice_time, self.practice_count, self.correct_count)
+        total = sum(a.nbytes for a in arrays)
+        if self.unanswered_questions is not None:
+            total += self.unanswered_questions.nbytes
+        return total
+
+    def last_practice(self, i: int) -> Optional[float]:
+        """Last practice time of skill ordinal i as a Python float, or None if never practiced"""
+        value = self.last_practice_time[i]
+        return None if np.isnan(value) else float(value)
+
+
+# Candidates gated per step when recommend() only needs the first few skills
+RECOMMEND_CHUNK_SIZE = 32
+
+
+# Slack when comparing closed-form due times against the clock, so float error in
+# the crossing time can only add candidates (they are re-checked exactly)
+DUE_SLACK_SECONDS = 1.0
+
+
+class SkillStateEngine:
+    """
+    Batched decay, prediction and recommendation over a SkillCatalog.
+    The prediction rules come from a KnowledgeTracingModel (DASH by default).
+    """
+
+    def __init__(self, model: 'KnowledgeTracingModel'):
+        self.model = model
+        self.catalog = model.catalog
+
+    def memory_strengths(self, state: StudentSkillArrays, current_time: float, idx=None) -> np.ndarray:
+        """The model's current strength of each skill (DASH: memory strength decayed since last practice)"""
+        return self.model.memory_strengths(state, current_time, idx)
+
+    def probabilities(self, state: StudentSkillArrays, current_time: float, idx=None) -> np.ndarray:
+        """Predicted probability of a correct answer"""
+        return self.model.probabilities(state, current_time, idx)
+
+    def due_times(self, state: StudentSkillArrays, threshold: float = 0.7) -> np.ndarray:
+        """Earliest time each skill can drop below threshold (-inf: evaluate now, +inf: never)"""
+        return self.model.due_times(state, threshold)
+
+    def due_schedule(self, state: StudentSkillArrays, threshold: float = 0.7) -> tuple:
+        """Cached (due times, ordinals sorted by due time, sorted due times, latest practice) for a threshold"""
+        schedule = state._due_schedules.get(threshold)
+        if schedule is None:
+            due = self.due_times(state, threshold)
+            by_due = np.argsort(due, kind='stable')
+            practiced = state.last_practice_time[~np.isnan(state.last_practice_time)]
+            latest_practice = float(practiced.max()) if practiced.size else float('-inf')
+            schedule = (due, by_due, due[by_due], latest_practice)
+            state._due_schedules[threshold] = schedule
+        return schedule
+
+    def due_skills(self, state: StudentSkillArrays, current_time: float, threshold: float = 0.7) -> np.ndarray:
+        """Ascending ordinals of skills whose due time has passed (a superset of those below threshold)"""
+        _, by_due, sorted_due, latest_practice = self.due_schedule(state, threshold)
+        if current_time < latest_practice:
+            # Clock behind a recorded practice: decay runs backwards, so evaluate everything
+            return np.arange(self.catalog.size)
+        due_count = np.searchsorted(sorted_due, current_time + DUE_SLACK_SECONDS, side='right')
+        return np.sort(by_due[:due_count])
+
+    def next_review_at(self, state: StudentSkillArrays, threshold: float = 0.7) -> Optional[float]:
+        """
+        Earliest time a practiced skill needs review, or None if none ever will.
+        Practiced skills that are already below threshold report their last practice time.
+        """
+        due = self.due_schedule(state, threshold)[0]
+        practiced = ~np.isnan(state.last_practice_time)
+        if not practiced.any():
+            return None
+        practiced_due = np.where(np.isneginf(due), state.last_practice_time, due)[practiced]
+        earliest = float(practiced_due.min())
+        return earliest if np.isfinite(earliest) else None
+
+    def recommend(
+        self,
+        state: StudentSkillArrays,
+        current_time: float,
+        threshold: float = 0.7,
+        target_grade: Optional[int] = None,
+        grade_range: int = 1,
+        limit: Optional[int] = None,
+        eligible: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        Ordinals of skills below threshold whose prerequisites are met,
+        sorted by learning journey. Only skills that are due are evaluated.
+
+        limit returns just the first limit skills: candidates are gated in
+        journey order a chunk at a time and the walk stops once enough pass.
+        eligible is an optional boolean mask over ordinals (e.g. skills with
+        questions left); ineligible skills are dropped before any scoring.
+        """
+        catalog = self.catalog
+        candidates = self.due_skills(state, current_time, threshold)
+        if target_grade is not None:
+            start, stop = catalog.grade_bucket_bounds(target_grade - grade_range, target_grade + grade_range)
+            if candidates.size == catalog.size:
+                candidates = np.sort(catalog.journey_order[start:stop])
+            else:
+                grades = catalog.grade[candidates]
+                candidates = candidates[(grades >= target_grade - grade_range) & (grades <= target_grade + grade_range)]
+        if eligible is not None:
+            candidates = candidates[eligible[candidates]]
+
+        probabilities = self.probabilities(state, current_time, candidates)
+        below = probabilities < threshold
+        candidates = catalog.journey_sort(candidates[below], probabilities[below])
+
+        if limit is None:
+            return candidates[self._prerequisites_met(state, current_time, threshold, candidates)]
+
+        # Early exit: gate in journey order until limit skills pass
+        recommended = []
+        found = 0
+        for chunk_start in range(0, candidates.size, max(limit, RECOMMEND_CHUNK_SIZE)):
+            if found >= limit:
+                break
+            chunk = candidates[chunk_start:chunk_start + max(limit, RECOMMEND_CHUNK_SIZE)]
+            passed = chunk[self._prerequisites_met(state, current_time, threshold, chunk)]
+            recommended.append(passed)
+            found += passed.size
+        if not recommended:
+            return candidates[:0]
+        return np.concatenate(recommended)[:limit]
+
+    def _prerequisites_met(self, state: StudentSkillArrays, current_time: float,
+                           threshold: float, candidates: np.ndarray) -> np.ndarray:
+        """Boolean mask over candidates: every direct prerequisite is at or above threshold"""
+        catalog = self.catalog
+        met = np.ones(candidates.size, dtype=bool)
+        starts = catalog.prereq_ptr[candidates]
+        counts = catalog.prereq_ptr[candidates + 1] - starts
+        if counts.any():
+            owner = np.repeat(np.arange(candidates.size), counts)
+            offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+            prereqs = catalog.prereq_idx[np.repeat(starts, counts) + offsets]
+            met[owner[self.probabilities(state, current_time, prereqs) < threshold]] = False
+        return met
@@ -0,0 +1,250 @@
+"""
+Bounded Per-Student State Cache for DASH
+LRU cache of StudentSkillArrays with idle-TTL expiry and a memory budget.
+MongoDB is authoritative, so an evicted student is simply reloaded on next access;
+an on_evict callback gets a chance to flush any unsaved changes first (and can
+restore() the entry when it cannot yet).
+All operations are thread-safe; on_evict runs outside the cache lock.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from services.DashSystem.skill_engine import StudentSkillArrays
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_USERS = int(os.getenv("DASH_STATE_CACHE_MAX_USERS", "10000"))
+DEFAULT_IDLE_TTL_SECONDS = float(os.getenv("DASH_STATE_CACHE_TTL_SECONDS", "1800"))
+DEFAULT_MAX_BYTES = int(os.getenv("DASH_STATE_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+
+class StudentStateCache:
+    """
+    student_id -> StudentSkillArrays, least recently used first.
+
+    Entries are evicted when there are more than max_users of them, when their
+    estimated memory pushes the total past max_bytes, or when they have not been
+    touched for idle_ttl_seconds. A limit of 0 disables that bound.
+    Pinned students (e.g. with a live session) are never evicted.
+    """
+
+    def __init__(
+        self,
+        max_users: int = DEFAULT_MAX_USERS,
+        idle_ttl_seconds: float = DEFAULT_IDLE_TTL_SECONDS,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        on_evict: Optional[Callable[[str, StudentSkillArrays], None]] = None
+    ):
+        self.max_users = max_users
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.max_bytes = max_bytes
+        self.on_evict = on_evict
+
+        # student_id -> (state, last access time, bytes counted for it)
+        self._entries: "OrderedDict[str, Tuple[StudentSkillArrays, float, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.RLock()
+        # student_id -> number of holders that pinned it
+        self._pins: Dict[str, int] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, student_id: str, default=None) -> Optional[StudentSkillArrays]:
+        """Cached state for a student (marking it recently used), or default on a miss"""
+        evicted = []
+        with self._lock:
+            entry = self._entries.get(student_id)
+            now = time.monotonic()
+            if entry is None or self._stale(student_id, entry[1], now):
+                if entry is not None:
+                    evicted.append(self._remove(student_id))
+                self.misses += 1
+                state = default
+            else:
+                self.hits += 1
+                self._entries[student_id] = (entry[0], now, entry[2])
+                self._entries.move_to_end(student_id)
+                state = entry[0]
+        self._notify_evicted(evicted)
+        return state
+
+    def __getitem__(self, student_id: str) -> StudentSkillArrays:
+        state = self.get(student_id)
+        if state is None:
+            raise KeyError(student_id)
+        return state
+
+    def __setitem__(self, student_id: str, state: StudentSkillArrays):
+        with self._lock:
+            old = self._entries.pop(student_id, None)
+            if old is not None:
+                self._bytes -= old[2]
+            nbytes = state.nbytes
+            self._entries[student_id] = (state, time.monotonic(), nbytes)
+            self._bytes += nbytes
+            evicted = self._enforce_limits(keep=student_id)
+        self._notify_evicted(evicted)
+
+    def __contains__(self, student_id: str) -> bool:
+        with self._lock:
+            entry = self._entries.get(student_id)
+            return entry is not None and not self._stale(student_id, entry[1], time.monotonic())
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __iter__(self) -> Iterator[str]:
+        with self._lock:
+            return iter(list(self._entries))
+
+    def values(self) -> List[StudentSkillArrays]:
+        with self._lock:
+            return [entry[0] for entry in self._entries.values()]
+
+    def items(self) -> List[Tuple[str, StudentSkillArrays]]:
+        with self._lock:
+            return [(student_id, entry[0]) for student_id, entry in self._entries.items()]
+
+    def pop(self, student_id: str, default=None) -> Optional[StudentSkillArrays]:
+        """Remove a student without calling on_evict"""
+        with self._lock:
+            entry = self._entries.pop(student_id, None)
+            if entry is None:
+                return default
+            self._bytes -= entry[2]
+            return entry[0]
+
+    def clear(self):
+        """Drop every entry (e.g. after a catalog reload), without calling on_evict"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def restore(self, student_id: str, state: StudentSkillArrays) -> bool:
+        """
+        Put back an evicted entry whose unsaved changes could not be flushed yet, as the
+        least recently used one and without enforcing limits, so the next eviction retries it.
+        Returns False (leaving the cache unchanged) if the student already has a newer entry.
+        """
+        with self._lock:
+            if student_id in self._entries:
+                return False
+            nbytes = state.nbytes
+            self._entries[student_id] = (state, time.monotonic(), nbytes)
+            self._entries.move_to_end(student_id, last=False)
+            self._bytes += nbytes
+            return True
+    
+    def pin(self, student_id: str):
+        """Keep a student's entry resident until a matching unpin(); pins nest"""
+        with self._lock:
+            self._pins[student_id] = self._pins.get(student_id, 0) + 1
+
+    def unpin(self, student_id: str):
+        with self._lock:
+            count = self._pins.get(student_id, 0) - 1
+            if count > 0:
+                self._pins[student_id] = count
+            else:
+                self._pins.pop(student_id, None)
+
+    def is_pinned(self, student_id: str) -> bool:
+        with self._lock:
+            return student_id in self._pins
+
+    def evict_expired(self) -> int:
+        """Evict all idle entries; returns how many were evicted"""
+        with self._lock:
+            evicted = self._remove_expired()
+        self._notify_evicted(evicted)
+        return len(evicted)
+
+    @property
+    def memory_bytes(self) -> int:
+        """Estimated bytes held by cached states"""
+        return self._bytes
+
+    def stats(self) -> Dict[str, float]:
+        """Counters for sizing instances: hits, misses, evictions, size and memory"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'memory_bytes': self._bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'pinned': len(self._pins),
+                'max_users': self.max_users,
+                'max_bytes': self.max_bytes,
+                'idle_ttl_seconds': self.idle_ttl_seconds
+            }
+
+    def _expired(self, last_access: float, now: float) -> bool:
+        return self.idle_ttl_seconds > 0 and now - last_access > self.idle_ttl_seconds
+
+    def _stale(self, student_id: str, last_access: float, now: float) -> bool:
+        return self._expired(last_access, now) and student_id not in self._pins
+
+    def _touch(self, student_id: str, now: float):
+        """Mark an entry just used: fresh access time, most recently used position"""
+        state, _, nbytes = self._entries[student_id]
+        self._entries[student_id] = (state, now, nbytes)
+        self._entries.move_to_end(student_id)
+
+    def _remove_expired(self) -> List[Tuple[str, StudentSkillArrays]]:
+        # Entries are kept in access order, so idle ones are all at the front;
+        # pinned ones count as used now
+        now = time.monotonic()
+        evicted = []
+        while self._entries:
+            student_id, entry = next(iter(self._entries.items()))
+            if not self._expired(entry[1], now):
+                break
+            if student_id in self._pins:
+                self._touch(student_id, now)
+            else:
+                evicted.append(self._remove(student_id))
+        return evicted
+
+    def _enforce_limits(self, keep: Optional[str] = None) -> List[Tuple[str, StudentSkillArrays]]:
+        """Remove least recently used entries until within bounds (never the entry just written or a pinned one)"""
+        evicted = self._remove_expired()
+        # Pinned entries are rotated to the back; once all remaining ones are pinned, stop
+        skipped = 0
+        while len(self._entries) > 1 and skipped < len(self._entries) and (
+            (self.max_users > 0 and len(self._entries) > self.max_users)
+            or (self.max_bytes > 0 and self._bytes > self.max_bytes)
+        ):
+            student_id = next(iter(self._entries))
+            if student_id == keep:
+                break
+            if student_id in self._pins:
+                self._entries.move_to_end(student_id)
+                skipped += 1
+                continue
+            evicted.append(self._remove(student_id))
+        return evicted
+
+    def _remove(self, student_id: str) -> Tuple[str, StudentSkillArrays]:
+        state, _, nbytes = self._entries.pop(student_id)
+        self._bytes -= nbytes
+        self.evictions += 1
+        return student_id, state
+
+    def _notify_evicted(self, evicted: List[Tuple[str, StudentSkillArrays]]):
+        if not self.on_evict:
+            return
+        for student_id, state in evicted:
+            try:
+                self.on_evict(student_id, state)
+            except Exception as e:
+                logger.error(f"[STATE_CACHE] Failed to flush evicted state for {student_id}: {e}")
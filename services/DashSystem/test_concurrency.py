@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from services.DashSystem.dash_system import DASHSystem
+
+USER_PREFIX = "concurrency_test_"
+
+def submit(dash_system, user_id, question, use_locks):
+    """Same read-modify-write as the /api/submit-answer endpoint"""
+    lock = dash_system.user_locks.hold(user_id) if use_locks else nullcontext()
+    with lock:
+        user_profile = dash_system.user_manager.load_user(user_id, include_history=False)
+        dash_system.record_question_attempt(
+            user_profile, question.question_id, question.skill_ids, True, 20.0
+        )
+
+def run(dash_system, questions, users, submits_per_user, workers, use_locks):
+    """Submit answers for every user from a thread pool; returns (seconds, lost updates)"""
+    user_ids = [f"{USER_PREFIX}{'locked' if use_locks else 'unlocked'}_{i}" for i in range(users)]
+    for user_id in user_ids:
+        dash_system.user_manager.mongo.users.delete_one({"user_id": user_id})
+        dash_system.student_states.pop(user_id)
+        dash_system.load_user_or_create(user_id)
+
+    # Interleave users so each one's submissions land on different threads at the same time
+    jobs = [(user_id, questions[n % len(questions)]) for n in range(submits_per_user) for user_id in user_ids]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(lambda job: submit(dash_system, job[0], job[1], use_locks), jobs))
+    elapsed = time.perf_counter() - start
+
+    lost_updates = 0
+    for user_id in user_ids:
+        user_profile = dash_system.user_manager.load_user(user_id, include_history=False)
+        lost_updates += submits_per_user - user_profile.attempt_stats.total_questions
+        dash_system.user_manager.mongo.users.delete_one({"user_id": user_id})
+        dash_system.student_states.pop(user_id)
+
+    return elapsed, lost_updates
+
+def main():
+    print("🔒 DASH Per-User Concurrency Test")
+    print("=================================")
+
+    dash_system = DASHSystem()
+    questions = list(dash_system.questions.values())[:10]
+    users, submits_per_user, workers = 8, 10, 8
+    total = users * submits_per_user
+
+    print(f"{users} users x {submits_per_user} submissions on {workers} threads\n")
+
+    unlocked_time, unlocked_lost = run(dash_system, questions, users, submits_per_user, workers, use_locks=False)
+    print(f"Without locks: {total / unlocked_time:7.1f} submits/s | lost updates: {unlocked_lost}")
+
+    locked_time, locked_lost = run(dash_system, questions, users, submits_per_user, workers, use_locks=True)
+    print(f"With locks:    {total / locked_time:7.1f} submits/s | lost updates: {locked_lost}")
+
+    # Different users never wait on each other, so throughput should stay in the same range
+    print(f"\nThroughput with locks: {unlocked_time / locked_time:.0%} of unlocked")
+
+    assert locked_lost == 0, f"{locked_lost} updates lost with per-user locks"
+    print("✅ No lost updates with per-user locks")
+
+if __name__ == "__main__":
+    main()
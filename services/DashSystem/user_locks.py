@@ -0,0 +1,43 @@
+"""
+Per-User Locks for DASH
+Striped re-entrant locks: requests for the same student are serialized (so a
+profile's read-modify-write cannot interleave with another), while different
+students almost always map to different stripes and run in parallel.
+"""
+
+import os
+import threading
+import zlib
+from contextlib import contextmanager
+from typing import Iterator, List
+
+DEFAULT_STRIPES = int(os.getenv("DASH_USER_LOCK_STRIPES", "256"))
+
+
+class UserLocks:
+    """A fixed pool of RLocks, one chosen per user_id by a stable hash"""
+
+    def __init__(self, stripes: int = DEFAULT_STRIPES):
+        self._locks: List[threading.RLock] = [threading.RLock() for _ in range(max(1, stripes))]
+
+    def lock_for(self, user_id: str) -> threading.RLock:
+        """The lock guarding user_id (shared with the other users on its stripe)"""
+        return self._locks[zlib.crc32(user_id.encode("utf-8")) % len(self._locks)]
+
+    @contextmanager
+    def hold(self, user_id: str) -> Iterator[None]:
+        """Serialize a block of work for user_id; re-entrant within a thread"""
+        lock = self.lock_for(user_id)
+        with lock:
+            yield
+
+    @contextmanager
+    def try_hold(self, user_id: str) -> Iterator[bool]:
+        """Like hold(), but never waits: yields False if another thread holds the lock"""
+        lock = self.lock_for(user_id)
+        acquired = lock.acquire(blocking=False)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                lock.release()
@@ -0,0 +1,152 @@
+"""
+Memory Benchmark: bytes per skill, question, attempt and cached profile
+Builds synthetic catalog and history records with the slotted, interned classes
+and with plain dataclass equivalents of the previous layout, and reports the
+traced memory of each (strings are created fresh per record, as when decoded from MongoDB).
+
+Usage:
+    python services/tools/benchmark_memory.py
+    python services/tools/benchmark_memory.py --skills 5000 --questions 100000 --attempts 500000
+"""
+
+import sys
+import os
+
+# Add project root to path
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, project_root)
+
+import argparse
+import gc
+import tracemalloc
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from managers.user_manager import QuestionAttempt, SkillState
+from services.DashSystem.dash_system import Skill, Question, GradeLevel
+from services.DashSystem.skill_engine import SkillCatalog, StudentSkillArrays
+
+# Previous layout: per-instance __dict__, a list per record, one string object per field value
+@dataclass
+class LegacySkill:
+    skill_id: str
+    name: str
+    grade_level: GradeLevel
+    prerequisites: List[str] = field(default_factory=list)
+    forgetting_rate: float = 0.1
+    difficulty: float = 0.0
+    order: int = 0
+
+@dataclass
+class LegacyQuestion:
+    question_id: str
+    skill_ids: List[str]
+    content: str
+    difficulty: float = 0.0
+    expected_time_seconds: float = 60.0
+
+@dataclass
+class LegacyQuestionAttempt:
+    question_id: str
+    skill_ids: List[str]
+    is_correct: bool
+    response_time_seconds: float
+    timestamp: float
+    time_penalty_applied: bool = False
+
+@dataclass
+class LegacySkillState:
+    memory_strength: float
+    last_practice_time: Optional[float]
+    practice_count: int
+    correct_count: int
+
+def fresh(text):
+    """A new string object with the given value (like a field decoded from a document)"""
+    return "".join(list(text))
+
+def measure(build, count):
+    """Traced bytes per record for count records built by build(i), excluding the holding list"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    records = [build(i) for i in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    list_bytes = sys.getsizeof(records)
+    del records
+    return (after - before - list_bytes) / max(count, 1)
+
+def skill_builder(cls, skills):
+    def build(i):
+        grade = list(GradeLevel)[i % len(GradeLevel)]
+        prerequisites = [fresh(f"skill_{i - 1}")] if i else []
+        return cls(fresh(f"skill_{i}"), fresh(f"Skill {i}"), grade, prerequisites, 0.1, 0.0, i % 10)
+    return build
+
+def question_builder(cls, skills):
+    def build(i):
+        return cls(fresh(f"question_{i}"), [fresh(f"skill_{i % skills}")], fresh(f"Question text {i}"), 0.5, 60.0)
+    return build
+
+def attempt_builder(cls, skills, questions):
+    def build(i):
+        q = (i * 7919) % questions
+        return cls(fresh(f"question_{q}"), [fresh(f"skill_{q % skills}")], i % 3 != 0, 30.0, 1.7e9 + i, False)
+    return build
+
+def skill_state_builder(cls):
+    def build(i):
+        return cls(float(i % 5), 1.7e9 + i, i % 7, i % 5)
+    return build
+
+def benchmark_memory(skills=2000, questions=50000, attempts=200000, practiced=50):
+    """Print bytes per record for each representation and per-profile sizes"""
+
+    print("="*80)
+    print("MEMORY BENCHMARK: catalog, history and cached profile representations")
+    print("="*80)
+    print(f"\n📐 {skills} skills | {questions} questions | {attempts} attempts\n")
+
+    rows = [
+        ("Skill", skill_builder(LegacySkill, skills), skill_builder(Skill, skills), skills),
+        ("Question", question_builder(LegacyQuestion, skills), question_builder(Question, skills), questions),
+        ("QuestionAttempt", attempt_builder(LegacyQuestionAttempt, skills, questions),
+         attempt_builder(QuestionAttempt, skills, questions), attempts),
+        ("SkillState", skill_state_builder(LegacySkillState), skill_state_builder(SkillState), attempts)
+    ]
+
+    print(f"   {'Record':<18}{'Before (B)':>12}{'After (B)':>12}{'Saved':>10}")
+    for name, legacy, current, count in rows:
+        before = measure(legacy, count)
+        after = measure(current, count)
+        saved = 1 - after / before if before else 0.0
+        print(f"   {name:<18}{before:>12.1f}{after:>12.1f}{saved:>10.0%}")
+
+    # Per cached student: dense cold-start profile vs sparse profile, and the engine arrays
+    catalog = SkillCatalog({skill.skill_id: skill for skill in map(skill_builder(Skill, skills), range(skills))})
+    dense_bytes = measure(lambda i: {catalog.skill_ids[k]: SkillState(0.0, None, 0, 0) for k in range(skills)}, 20)
+    sparse_bytes = measure(lambda i: {catalog.skill_ids[k]: SkillState(1.0, 1.7e9, 1, 1) for k in range(practiced)}, 20)
+    arrays_bytes = StudentSkillArrays(catalog.size).nbytes
+
+    print(f"\n   👤 Profile skill_states, dense ({skills} skills): {dense_bytes / 1024:.1f} KB")
+    print(f"   👤 Profile skill_states, sparse ({practiced} practiced): {sparse_bytes / 1024:.1f} KB")
+    print(f"   🧮 StudentSkillArrays per cached student: {arrays_bytes / 1024:.1f} KB")
+    print(f"\n{'='*80}\n")
+    return True
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report bytes per skill, question, attempt and profile")
+    parser.add_argument("--skills", type=int, default=2000)
+    parser.add_argument("--questions", type=int, default=50000)
+    parser.add_argument("--attempts", type=int, default=200000)
+    parser.add_argument("--practiced", type=int, default=50, help="Practiced skills per sparse profile")
+    args = parser.parse_args()
+
+    try:
+        benchmark_memory(args.skills, args.questions, args.attempts, args.practiced)
+    except Exception as e:
+        print(f"\n❌ ERROR: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
@@ -0,0 +1,89 @@
+"""
+Codec Benchmark: UserProfile encode / decode time
+Times ProfileCodec against the previous asdict / QuestionAttempt(**d) encoding for
+synthetic profiles of increasing history length.
+
+Usage:
+    python services/tools/benchmark_profile_codec.py
+    python services/tools/benchmark_profile_codec.py --sizes 100 10000 100000 --repeat 5
+"""
+
+import sys
+import os
+
+# Add project root to path
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, project_root)
+
+import argparse
+import time
+from collections import deque
+
+from managers.user_manager import SkillState, QuestionAttempt, AttemptStats, UserProfile, RECENT_ATTEMPTS_WINDOW
+from managers.profile_codec import profile_codec
+from services.tools.profile_fixtures import build_profile, legacy_encode
+
+def legacy_decode(data):
+    """The profile UserProfile.from_dict built before the codec"""
+    question_history = [QuestionAttempt(**attempt) for attempt in data.get('question_history', [])]
+    return UserProfile(
+        user_id=data['user_id'],
+        created_at=data['created_at'],
+        last_updated=data['last_updated'],
+        skill_states={k: SkillState(**v) for k, v in data['skill_states'].items()},
+        question_history=question_history,
+        student_notes=data.get('student_notes', {}),
+        age=data.get('age', 5),
+        current_grade=data.get('current_grade', 'K'),
+        next_review_at=data.get('next_review_at'),
+        skill_template_grade=data.get('skill_template_grade'),
+        attempt_stats=AttemptStats(**data['attempt_stats']),
+        recent_attempts=deque([QuestionAttempt(**a) for a in data['recent_attempts']], maxlen=RECENT_ATTEMPTS_WINDOW),
+        answered_question_ids=set(data['answered_question_ids']),
+        history_loaded='question_history' in data
+    )
+
+def best_time(fn, arg, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(arg)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def benchmark_profile_codec(sizes=(100, 10000, 100000), repeat=3):
+    """Print best-of-`repeat` encode and decode times per profile size"""
+
+    print("="*80)
+    print("PROFILE CODEC BENCHMARK: encode / decode time per profile")
+    print("="*80)
+    print(f"\n   {'Attempts':>10}{'Op':>8}{'Before (ms)':>14}{'After (ms)':>13}{'Speedup':>10}")
+
+    for size in sizes:
+        profile = build_profile(size, seed=size)
+        document = profile_codec.encode(profile)
+        rows = [
+            ("encode", legacy_encode, profile_codec.encode, profile),
+            ("decode", legacy_decode, profile_codec.decode, document),
+        ]
+        for op, legacy, current, arg in rows:
+            before = best_time(legacy, arg, repeat)
+            after = best_time(current, arg, repeat)
+            print(f"   {size:>10}{op:>8}{before * 1000:>14.2f}{after * 1000:>13.2f}{before / after:>9.1f}x")
+
+    print(f"\n{'='*80}\n")
+    return True
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time UserProfile encode / decode")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 10000, 100000], help="History lengths")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement (best is reported)")
+    args = parser.parse_args()
+
+    try:
+        benchmark_profile_codec(args.sizes, args.repeat)
+    except Exception as e:
+        print(f"\n❌ ERROR: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
@@ -0,0 +1,158 @@
+"""
+Offline Calibration: fit forgetting_rate and difficulty per skill
+Streams every user's question history from MongoDB, fits the DASH skill parameters
+and records the result as a new parameter version on each skill document.
+
+Usage:
+    python services/tools/calibrate_skill_parameters.py            # fit and record a version
+    python services/tools/calibrate_skill_parameters.py --apply    # ...and make it the live parameters
+"""
+
+import sys
+import os
+
+# Add project root to path
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, project_root)
+
+import argparse
+import time
+from datetime import datetime, timezone
+
+from pymongo import MongoClient, UpdateOne
+from dotenv import load_dotenv
+
+from services.DashSystem.dash_system import Skill, GradeLevel
+from services.DashSystem.skill_engine import SkillCatalog
+from services.DashSystem.calibration import SkillCalibrator, DEFAULT_CHUNK_SIZE
+from services.DashSystem.replay import stream_user_histories, DEFAULT_REPLAY_BATCH_USERS
+
+# Load environment variables
+load_dotenv()
+
+def load_skills(skills_collection):
+    """Skill objects from the skills collection, in the same order DASHSystem loads them"""
+    skills = {}
+    for skill_doc in skills_collection.find():
+        try:
+            skills[skill_doc['skill_id']] = Skill(
+                skill_id=skill_doc['skill_id'],
+                name=skill_doc['name'],
+                grade_level=GradeLevel[skill_doc['grade_level']],
+                prerequisites=skill_doc['prerequisites'],
+                forgetting_rate=skill_doc['forgetting_rate'],
+                difficulty=skill_doc['difficulty'],
+                order=skill_doc.get('order', 0)
+            )
+        except KeyError as e:
+            print(f"   ⚠️  Skipping skill {skill_doc.get('skill_id', 'unknown')}: missing field {e}")
+    return skills
+
+def write_parameter_version(skills_collection, catalog, result, version, apply):
+    """Push the fitted parameters as a new version on every fitted skill (and $set them if apply)"""
+    created_at = datetime.now(timezone.utc).isoformat()
+    operations = []
+    for i, skill_id in enumerate(catalog.skill_ids):
+        if not result.fitted[i]:
+            continue
+        entry = {
+            "version": version,
+            "created_at": created_at,
+            "forgetting_rate": float(result.forgetting_rate[i]),
+            "difficulty": float(result.difficulty[i]),
+            "previous_forgetting_rate": float(catalog.forgetting_rate[i]),
+            "previous_difficulty": float(catalog.difficulty[i]),
+            "attempts": int(result.attempts[i]),
+            "holdout_log_loss_before": result.log_loss['holdout']['before'],
+            "holdout_log_loss_after": result.log_loss['holdout']['after']
+        }
+        update = {"$push": {"parameter_versions": entry}}
+        if apply:
+            update["$set"] = {
+                "forgetting_rate": entry["forgetting_rate"],
+                "difficulty": entry["difficulty"],
+                "parameter_version": version
+            }
+        operations.append(UpdateOne({"skill_id": skill_id}, update))
+
+    if operations:
+        skills_collection.bulk_write(operations, ordered=False)
+    return len(operations)
+
+def calibrate(apply=False, epochs=5, chunk_size=DEFAULT_CHUNK_SIZE, batch_size=DEFAULT_REPLAY_BATCH_USERS):
+    """Fit skill parameters from all attempt histories and record them as a new version"""
+
+    print("="*80)
+    print("OFFLINE CALIBRATION: Skill forgetting_rate / difficulty")
+    print("="*80)
+
+    uri = os.getenv('MONGODB_URI')
+    if not uri:
+        print("\n❌ ERROR: MONGODB_URI not found in environment variables")
+        print("   Please create a .env file with MONGODB_URI")
+        print("   See .env.example for template")
+        return False
+
+    db_name = os.getenv('MONGODB_DB_NAME', 'ai_tutor')
+    client = MongoClient(uri)
+    db = client[db_name]
+
+    print(f"\n✅ Connected to MongoDB (database: {db_name})")
+
+    skills = load_skills(db['skills'])
+    if not skills:
+        print("\n❌ ERROR: No skills found; run migrate_skills_to_mongodb.py first")
+        client.close()
+        return False
+    catalog = SkillCatalog(skills)
+    print(f"   ✅ Loaded {catalog.size} skills")
+
+    print(f"\n🔄 Streaming attempt histories ({batch_size} users per batch, {chunk_size} rows per chunk)...")
+    calibrator = SkillCalibrator(catalog, chunk_size=chunk_size, epochs=epochs)
+    result = calibrator.run(stream_user_histories(db['users'], batch_size))
+
+    if result.train_rows == 0:
+        print("\n⚠️  No attempts found; nothing to calibrate")
+        client.close()
+        return True
+
+    version = datetime.now(timezone.utc).strftime("calibration-%Y%m%dT%H%M%SZ")
+    written = write_parameter_version(db['skills'], catalog, result, version, apply)
+
+    timings = result.timings
+    print(f"\n{'='*80}")
+    print("CALIBRATION COMPLETE!")
+    print(f"{'='*80}")
+    print(f"   👥 Users: {result.users}")
+    print(f"   📝 Rows (attempt x skill): {result.train_rows} train, {result.holdout_rows} holdout")
+    print(f"   🎯 Skills fitted: {int(result.fitted.sum())}/{catalog.size} (others had too few attempts)")
+    for name in ('train', 'holdout'):
+        loss = result.log_loss[name]
+        print(f"   📉 {name.capitalize()} log-loss: {loss['before']:.4f} -> {loss['after']:.4f}")
+    print(f"   ⏱️  Replay {timings['replay_seconds']:.1f}s | Fit {timings['fit_seconds']:.1f}s | "
+          f"Evaluate {timings['evaluate_seconds']:.1f}s | {timings['rows_per_second']:.0f} rows/s")
+    print(f"   🏷️  Version {version} recorded on {written} skills"
+          + (" and applied" if apply else " (not applied; rerun with --apply to use it)"))
+    print(f"{'='*80}\n")
+
+    client.close()
+    return True
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Calibrate DASH skill parameters from attempt history")
+    parser.add_argument("--apply", action="store_true", help="Make the fitted parameters the live ones")
+    parser.add_argument("--epochs", type=int, default=5)
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_REPLAY_BATCH_USERS)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    try:
+        if not calibrate(args.apply, args.epochs, args.chunk_size, args.batch_size):
+            sys.exit(1)
+    except Exception as e:
+        print(f"\n❌ ERROR: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+    print(f"Total runtime: {time.perf_counter() - start:.1f}s")
@@ -0,0 +1,90 @@
+"""
+Generate questions for exhausted skills
+Works through question_generation_requests, which the DASH API fills when a student
+answers the last question of a skill. For each queued skill, variations of one of its
+questions are generated into curriculum.json with the QuestionGeneratorAgent, the
+curriculum is migrated to MongoDB, and the handled requests are removed. Running DASH
+APIs pick the new questions up on their next catalog refresh.
+
+Usage:
+    python services/tools/generate_questions_for_exhausted_skills.py                # list queued skills
+    python services/tools/generate_questions_for_exhausted_skills.py --generate
+    python services/tools/generate_questions_for_exhausted_skills.py --generate --variations 5 --limit 10
+"""
+
+import sys
+import os
+
+# Add project root to path
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, project_root)
+
+import argparse
+import json
+from typing import Dict, List, Optional
+
+from managers.mongodb_manager import mongo_db
+
+CURRICULUM_FILE = os.path.join(project_root, "services", "QuestionBankGenerator", "QuestionsBank", "curriculum.json")
+
+def queued_requests(limit: int = 0) -> List[Dict]:
+    """Queued skills, most often exhausted first"""
+    cursor = mongo_db.question_generation_requests.find({}, {"_id": 0}).sort("exhausted_count", -1)
+    return list(cursor.limit(limit))
+
+def pick_source_question(curriculum: Dict, skill_id: str, variations: int) -> Optional[str]:
+    """
+    A question of the skill whose variation ids (<question_id>_gen_001, ...) are all
+    still free, so the generated questions cannot collide with existing ones
+    """
+    for grade_data in curriculum['grades'].values():
+        for skill_data in grade_data['skills']:
+            if skill_data['skill_id'] != skill_id:
+                continue
+            question_ids = {question['question_id'] for question in skill_data['questions']}
+            for question in skill_data['questions']:
+                if not any(f"{question['question_id']}_gen_{i:03d}" in question_ids for i in range(1, variations + 1)):
+                    return question['question_id']
+    return None
+
+def generate_questions(requests: List[Dict], variations: int) -> List[str]:
+    """Generate variations for each queued skill; returns the skills that gained questions"""
+    from services.QuestionBankGenerator.QuestionGeneratorAgent import QuestionGeneratorAgent
+    from services.tools.migrate_dash_questions_to_mongodb import migrate_dash_questions
+
+    generator = QuestionGeneratorAgent(CURRICULUM_FILE)
+    handled_skills = []
+    for request in requests:
+        skill_id = request['skill_id']
+        source_question_id = pick_source_question(generator.curriculum, skill_id, variations)
+        if source_question_id is None:
+            print(f"⚠️  {skill_id}: no question to vary, skipping")
+            continue
+
+        generated_ids = generator.generate_variations(source_question_id, num_variations=variations)
+        print(f"✅ {skill_id}: generated {len(generated_ids)} questions from {source_question_id}")
+        if generated_ids:
+            handled_skills.append(skill_id)
+
+    if handled_skills:
+        if not migrate_dash_questions():
+            raise RuntimeError("Migrating the generated questions to MongoDB failed; requests were kept")
+        mongo_db.question_generation_requests.delete_many({"skill_id": {"$in": handled_skills}})
+    return handled_skills
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate questions for skills whose pools students exhausted")
+    parser.add_argument("--generate", action="store_true", help="Generate, migrate and clear the requests (default: list them)")
+    parser.add_argument("--variations", type=int, default=3, help="Questions to generate per skill")
+    parser.add_argument("--limit", type=int, default=0, help="At most this many skills, most exhausted first (0: all)")
+    args = parser.parse_args()
+
+    requests = queued_requests(args.limit)
+    if not args.generate:
+        for request in requests:
+            print(json.dumps(request))
+        print(f"\n{len(requests)} skill(s) queued for question generation")
+        sys.exit(0)
+
+    handled_skills = generate_questions(requests, args.variations)
+    print(f"\n{len(handled_skills)}/{len(requests)} skill(s) gained questions")
@@ -0,0 +1,50 @@
+"""
+List users due for review
+Prints the users with at least one practiced skill whose predicted recall has decayed
+below the review threshold, from the persisted next_review_at (no profiles are loaded).
+Meant to be run by a scheduler that sends review reminders.
+
+Usage:
+    python services/tools/list_users_due_for_review.py                  # due now
+    python services/tools/list_users_due_for_review.py --within-hours 24 --limit 500
+    python services/tools/list_users_due_for_review.py --json           # one JSON document per line
+"""
+
+import sys
+import os
+
+# Add project root to path
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, project_root)
+
+import argparse
+import json
+import time
+from datetime import datetime
+
+from managers.user_manager import UserManager
+
+def list_users_due_for_review(within_hours: float = 0.0, limit: int = 0, as_json: bool = False) -> int:
+    """Print the users due for review within the given number of hours; returns how many there are"""
+    before = time.time() + within_hours * 3600
+    due_users = UserManager().find_users_due_for_review(before=before, limit=limit)
+
+    for user in due_users:
+        if as_json:
+            print(json.dumps(user))
+        else:
+            due_at = datetime.fromtimestamp(user['next_review_at']).strftime("%Y-%m-%d %H:%M")
+            print(f"{user['user_id']:<40} due {due_at}")
+
+    if not as_json:
+        print(f"\n{len(due_users)} user(s) due for review by {datetime.fromtimestamp(before).strftime('%Y-%m-%d %H:%M')}")
+    return len(due_users)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="List users with skills due for review")
+    parser.add_argument("--within-hours", type=float, default=0.0, help="Include users due this many hours from now")
+    parser.add_argument("--limit", type=int, default=0, help="At most this many users, earliest due first (0: all)")
+    parser.add_argument("--json", action="store_true", help="Print one JSON document per user")
+    args = parser.parse_args()
+
+    list_users_due_for_review(args.within_hours, args.limit, args.json)
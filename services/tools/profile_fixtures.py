@@ -0,0 +1,67 @@
+"""
+Profile Fixtures
+Synthetic UserProfiles and the document encoding used before ProfileCodec, shared by
+test_profile_codec.py and benchmark_profile_codec.py
+"""
+
+import random
+from dataclasses import asdict
+
+from managers.user_manager import UserProfile, SkillState, QuestionAttempt
+
+def build_profile(attempts, skills=200, questions=5000, seed=0):
+    """A synthetic profile with `attempts` history entries, with stats and summaries kept as the app keeps them"""
+    rng = random.Random(seed)
+    now = 1.7e9
+    profile = UserProfile(
+        user_id=f"user_{seed}",
+        created_at=now,
+        last_updated=now + attempts,
+        skill_states={},
+        question_history=[],
+        student_notes={"tutor": "likes word problems"},
+        age=8,
+        current_grade="GRADE_3",
+        next_review_at=now + 86400.0,
+        skill_template_grade="GRADE_3"
+    )
+    for i in range(attempts):
+        q = rng.randrange(questions)
+        skill_ids = [f"skill_{(q + k) % skills}" for k in range(1 + q % 3)]
+        attempt = QuestionAttempt(f"question_{q}", skill_ids, rng.random() < 0.7,
+                                  rng.uniform(5.0, 120.0), now + i, rng.random() < 0.1)
+        for skill_id in skill_ids:
+            state = profile.skill_states.setdefault(skill_id, SkillState(0.0, None, 0, 0))
+            state.memory_strength += 0.5 if attempt.is_correct else -0.25
+            state.last_practice_time = attempt.timestamp
+            state.practice_count += 1
+            state.correct_count += int(attempt.is_correct)
+        profile.question_history.append(attempt)
+        profile.recent_attempts.append(attempt)
+        profile.answered_question_ids.add(attempt.question_id)
+        profile.attempt_stats.record(attempt)
+        profile.state_version += 1
+    profile.attempt_stats.skills_practiced = len(profile.skill_states)
+    return profile
+
+def legacy_encode(profile, include_history=True, include_skill_states=True):
+    """The current document schema, encoded the way UserProfile.to_dict did before the codec"""
+    data = {
+        'user_id': profile.user_id,
+        'created_at': profile.created_at,
+        'last_updated': profile.last_updated,
+        'student_notes': profile.student_notes,
+        'age': profile.age,
+        'current_grade': profile.current_grade,
+        'next_review_at': profile.next_review_at,
+        'skill_template_grade': profile.skill_template_grade,
+        'state_version': profile.state_version,
+        'attempt_stats': asdict(profile.attempt_stats),
+        'recent_attempts': [asdict(attempt) for attempt in profile.recent_attempts],
+        'answered_question_ids': list(profile.answered_question_ids)
+    }
+    if include_skill_states:
+        data['skill_states'] = {k: v.to_dict() for k, v in profile.skill_states.items()}
+    if include_history:
+        data['question_history'] = [asdict(attempt) for attempt in profile.question_history]
+    return data
@@ -0,0 +1,212 @@
+"""
+Replay: rebuild skill states from attempt history
+Re-derives every user's skill_states from their question_history with the current
+DASH update rules, or reports what a calibrated parameter version would change.
+
+Usage:
+    python services/tools/replay_skill_states.py rebuild            # report users whose stored states drift
+    python services/tools/replay_skill_states.py rebuild --write    # ...and overwrite them with the replay
+    python services/tools/replay_skill_states.py diff --version calibration-20260101T000000Z
+    python services/tools/replay_skill_states.py rebuild --write --resume   # continue after an interruption
+"""
+
+import sys
+import os
+
+# Add project root to path
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, project_root)
+
+import argparse
+import json
+
+from pymongo import MongoClient, UpdateOne
+from dotenv import load_dotenv
+
+from services.DashSystem.skill_engine import SkillCatalog
+from services.DashSystem.replay import (
+    ReplayEngine, ReplayDiffer, ReplayDiff, ReplayRunner, stream_user_histories, USER_PROJECTION,
+    DEFAULT_REPLAY_WORKERS, DEFAULT_REPLAY_BATCH_USERS
+)
+from services.tools.calibrate_skill_parameters import load_skills
+
+# Load environment variables
+load_dotenv()
+
+STATE_TOLERANCE = 1e-6
+
+class StoredStateChecker:
+    """Picklable batch job: replays users and returns the rebuilt fields of users whose stored states differ"""
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def __call__(self, user_docs):
+        drifted = []
+        for user_doc in user_docs:
+            fields = self.engine.rebuild(user_doc)
+            if not self._matches(user_doc.get('skill_states') or {}, fields['skill_states'], user_doc):
+                drifted.append(fields)
+        return drifted
+
+    def _matches(self, stored, replayed, user_doc):
+        if any(not _same_state(stored.get(skill_id), state) for skill_id, state in replayed.items()):
+            return False
+        # Stored skills the history never touched must still hold their template value
+        template = self.engine.initial_state(user_doc).memory_strength
+        catalog = self.engine.catalog
+        for skill_id, state in stored.items():
+            i = catalog.index.get(skill_id)
+            if skill_id in replayed or i is None:
+                continue
+            untouched = {'memory_strength': float(template[i]), 'last_practice_time': None, 'practice_count': 0, 'correct_count': 0}
+            if not _same_state(state, untouched):
+                return False
+        return True
+
+def _same_state(stored, replayed):
+    if stored is None:
+        return False
+    if stored.get('practice_count') != replayed['practice_count'] or stored.get('correct_count') != replayed['correct_count']:
+        return False
+    if (stored.get('last_practice_time') is None) != (replayed['last_practice_time'] is None):
+        return False
+    if replayed['last_practice_time'] is not None and abs(stored['last_practice_time'] - replayed['last_practice_time']) > STATE_TOLERANCE:
+        return False
+    return abs(stored.get('memory_strength', 0.0) - replayed['memory_strength']) <= STATE_TOLERANCE
+
+def load_parameter_version(skills_collection, catalog, version):
+    """forgetting_rate / difficulty arrays for a recorded parameter version (current values where absent)"""
+    forgetting_rate = catalog.forgetting_rate.copy()
+    difficulty = catalog.difficulty.copy()
+    found = 0
+    for skill_doc in skills_collection.find({"parameter_versions.version": version},
+                                            {"_id": 0, "skill_id": 1, "parameter_versions": 1}):
+        i = catalog.index.get(skill_doc['skill_id'])
+        if i is None:
+            continue
+        for entry in skill_doc.get('parameter_versions', []):
+            if entry.get('version') == version:
+                forgetting_rate[i] = entry['forgetting_rate']
+                difficulty[i] = entry['difficulty']
+                found += 1
+    return forgetting_rate, difficulty, found
+
+def replay_skill_states(mode, version=None, write=False, workers=DEFAULT_REPLAY_WORKERS,
+                        batch_size=DEFAULT_REPLAY_BATCH_USERS, checkpoint_path=None, resume=False):
+    """Rebuild (or check) stored skill states, or diff a parameter version against the current one"""
+
+    print("="*80)
+    print(f"REPLAY: {'Rebuild skill states' if mode == 'rebuild' else 'What-changed diff'}")
+    print("="*80)
+
+    uri = os.getenv('MONGODB_URI')
+    if not uri:
+        print("\n❌ ERROR: MONGODB_URI not found in environment variables")
+        print("   Please create a .env file with MONGODB_URI")
+        print("   See .env.example for template")
+        return False
+
+    db_name = os.getenv('MONGODB_DB_NAME', 'ai_tutor')
+    client = MongoClient(uri)
+    db = client[db_name]
+    users_collection = db['users']
+
+    print(f"\n✅ Connected to MongoDB (database: {db_name})")
+
+    skills = load_skills(db['skills'])
+    if not skills:
+        print("\n❌ ERROR: No skills found; run migrate_skills_to_mongodb.py first")
+        client.close()
+        return False
+    catalog = SkillCatalog(skills)
+    current = ReplayEngine(catalog)
+    print(f"   ✅ Loaded {catalog.size} skills")
+
+    if mode == 'rebuild':
+        job = StoredStateChecker(current)
+        projection = dict(USER_PROJECTION, skill_states=1)
+        drifted_users = 0
+
+        def on_result(drifted):
+            nonlocal drifted_users
+            drifted_users += len(drifted)
+            if write and drifted:
+                users_collection.bulk_write([
+                    UpdateOne({"user_id": fields['user_id']}, {
+                        "$set": {
+                            "skill_states": fields['skill_states'],
+                            "skill_template_grade": fields['skill_template_grade'],
+                            "next_review_at": fields['next_review_at']
+                        },
+                        "$inc": {"state_version": 1}
+                    })
+                    for fields in drifted
+                ], ordered=False)
+    else:
+        forgetting_rate, difficulty, found = load_parameter_version(db['skills'], catalog, version)
+        if not found:
+            print(f"\n❌ ERROR: No skills have parameter version {version}")
+            client.close()
+            return False
+        print(f"   ✅ Version {version} covers {found} skills")
+        job = ReplayDiffer(current, ReplayEngine(catalog.with_parameters(forgetting_rate, difficulty))).diff_batch
+        projection = USER_PROJECTION
+        total_diff = ReplayDiff(catalog.size)
+
+        def on_result(diff):
+            total_diff.merge(diff)
+
+    runner = ReplayRunner(job, workers=workers, batch_users=batch_size, checkpoint_path=checkpoint_path)
+    after_user_id = runner.resume_after() if resume else None
+    if after_user_id:
+        print(f"   ↩️  Resuming after user {after_user_id}")
+
+    print(f"\n🔄 Replaying users on {workers} worker(s), {batch_size} per batch...")
+    processed = runner.run(
+        stream_user_histories(users_collection, batch_size, after_user_id=after_user_id, projection=projection),
+        on_result
+    )
+
+    print(f"\n{'='*80}")
+    print("REPLAY COMPLETE!")
+    print(f"{'='*80}")
+    print(f"   👥 Users replayed: {processed}")
+    if mode == 'rebuild':
+        print(f"   🔍 Users whose stored states differ from the replay: {drifted_users}")
+        print(f"   💾 {'Rewritten' if write else 'Not written (rerun with --write to rebuild them)'}")
+    else:
+        summary = total_diff.summary(catalog)
+        print(f"   🔀 Users with a mastery change: {summary['users_with_mastery_change']}")
+        print(f"   ⬆️  Mastery gained: {summary['mastery_gained']} | ⬇️  lost: {summary['mastery_lost']}")
+        print(f"   📊 Mean |ΔP(correct)| per skill: {summary['mean_abs_probability_change']:.4f}")
+        print("   Most changed skills:")
+        print(json.dumps(summary['most_changed_skills'], indent=2))
+    print(f"{'='*80}\n")
+
+    client.close()
+    return True
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild DASH skill states from attempt history")
+    parser.add_argument("mode", choices=["rebuild", "diff"])
+    parser.add_argument("--version", help="Parameter version to compare against (diff mode)")
+    parser.add_argument("--write", action="store_true", help="Overwrite drifted skill states (rebuild mode)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_REPLAY_WORKERS)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_REPLAY_BATCH_USERS)
+    parser.add_argument("--checkpoint", default=os.path.join(project_root, "replay_checkpoint.json"))
+    parser.add_argument("--resume", action="store_true", help="Continue from the last checkpoint")
+    args = parser.parse_args()
+
+    if args.mode == "diff" and not args.version:
+        parser.error("diff mode needs --version")
+
+    try:
+        if not replay_skill_states(args.mode, args.version, args.write, args.workers,
+                                   args.batch_size, args.checkpoint, args.resume):
+            sys.exit(1)
+    except Exception as e:
+        print(f"\n❌ ERROR: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
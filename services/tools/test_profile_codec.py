@@ -0,0 +1,179 @@
+"""
+Test Script: Profile Codec Round Trips
+Checks that ProfileCodec writes the same documents as the previous asdict-based
+UserProfile.to_dict and reads every stored document shape back to an equal profile
+"""
+
+import sys
+import os
+
+# Add project root to path
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, project_root)
+
+from collections import deque
+from dataclasses import asdict
+
+from managers.user_manager import (
+    UserManager, UserProfile, SkillState, QuestionAttempt, AttemptStats, RECENT_ATTEMPTS_WINDOW
+)
+from managers.profile_codec import profile_codec
+from services.tools.profile_fixtures import build_profile, legacy_encode
+
+def same_profile(a, b):
+    return (
+        a.user_id == b.user_id and a.created_at == b.created_at and a.last_updated == b.last_updated
+        and a.skill_states == b.skill_states and a.question_history == b.question_history
+        and a.student_notes == b.student_notes and a.age == b.age and a.current_grade == b.current_grade
+        and a.next_review_at == b.next_review_at and a.skill_template_grade == b.skill_template_grade
+        and a.state_version == b.state_version
+        and a.attempt_stats == b.attempt_stats and list(a.recent_attempts) == list(b.recent_attempts)
+        and a.recent_attempts.maxlen == b.recent_attempts.maxlen
+        and a.answered_question_ids == b.answered_question_ids and a.history_loaded == b.history_loaded
+        and a.answered_ids_loaded == b.answered_ids_loaded
+    )
+
+class RecordingUsers:
+    """Applies the $set / $push / $addToSet updates UserManager writes to one in-memory document"""
+
+    def __init__(self, document):
+        self.document = document
+
+    def update_one(self, query, update, upsert=False):
+        assert not set(update.get("$set", {})) & set(update.get("$addToSet", {})), "conflicting update paths"
+        for key, value in update.get("$set", {}).items():
+            self.document[key] = value
+        for key, value in update.get("$push", {}).items():
+            self.document.setdefault(key, []).extend(value["$each"])
+        for key, value in update.get("$addToSet", {}).items():
+            stored = self.document.setdefault(key, [])
+            stored.extend(v for v in value["$each"] if v not in stored)
+
+def recording_user_manager(document):
+    """A UserManager writing to RecordingUsers instead of MongoDB"""
+    user_manager = UserManager(use_mongodb=False)
+    user_manager.use_mongodb = True
+    user_manager.mongo = type("Mongo", (), {})()
+    user_manager.mongo.users = RecordingUsers(document)
+    return user_manager
+
+def check(name, passed):
+    print(f"   {'✅' if passed else '❌ FAIL:'} {name}")
+    return passed
+
+def test_profile_codec():
+    """Round-trip every stored document shape through the codec"""
+
+    print("\n" + "="*80)
+    print("TESTING PROFILE CODEC")
+    print("="*80 + "\n")
+
+    all_tests_passed = True
+
+    # Test 1: encoding matches the previous to_dict output
+    print("🔍 Test 1: Documents match the previous encoding")
+    print("-" * 40)
+    for attempts in (0, 1, 25, 1000):
+        profile = build_profile(attempts, seed=attempts)
+        for include_history in (True, False):
+            for include_skill_states in (True, False):
+                encoded = profile_codec.encode(profile, include_history, include_skill_states)
+                expected = legacy_encode(profile, include_history, include_skill_states)
+                all_tests_passed &= check(
+                    f"{attempts} attempts, history={include_history}, skill_states={include_skill_states}",
+                    encoded == expected and list(encoded) == list(expected)
+                )
+    attempt = build_profile(1).question_history[0]
+    all_tests_passed &= check("Single attempt for $push", profile_codec.encode_attempt(attempt) == asdict(attempt))
+
+    # Test 2: decode(encode(profile)) == profile
+    print("\n🔍 Test 2: Round trips")
+    print("-" * 40)
+    for attempts in (0, 1, RECENT_ATTEMPTS_WINDOW + 5, 1000):
+        profile = build_profile(attempts, seed=attempts)
+        all_tests_passed &= check(f"Full profile, {attempts} attempts",
+                                  same_profile(profile_codec.decode(profile_codec.encode(profile)), profile))
+        all_tests_passed &= check(f"UserProfile.to_dict / from_dict, {attempts} attempts",
+                                  same_profile(UserProfile.from_dict(profile.to_dict()), profile))
+
+    # Loaded without question_history: summaries come from the stored fields
+    profile = build_profile(100, seed=7)
+    decoded = profile_codec.decode(profile_codec.encode(profile, include_history=False))
+    all_tests_passed &= check(
+        "Without question_history",
+        not decoded.history_loaded and decoded.question_history == []
+        and decoded.attempt_stats == profile.attempt_stats
+        and list(decoded.recent_attempts) == list(profile.recent_attempts)
+        and decoded.answered_question_ids == profile.answered_question_ids
+    )
+
+    # Sparse profile with None fields
+    profile = build_profile(0, seed=3)
+    profile.next_review_at = None
+    profile.skill_template_grade = None
+    profile.skill_states = {"skill_1": SkillState(1.5, None, 0, 0)}
+    all_tests_passed &= check("None fields and unpracticed states",
+                              same_profile(profile_codec.decode(profile_codec.encode(profile)), profile))
+
+    # Test 3: documents saved before rolling stats, summaries and template grades
+    print("\n🔍 Test 3: Legacy documents")
+    print("-" * 40)
+    profile = build_profile(50, seed=11)
+    document = legacy_encode(profile)
+    for key in ('attempt_stats', 'recent_attempts', 'answered_question_ids', 'student_notes',
+                'next_review_at', 'skill_template_grade', 'state_version'):
+        document.pop(key)
+    for entry in document['question_history']:
+        entry.pop('time_penalty_applied')
+    decoded = profile_codec.decode(document)
+    history = [QuestionAttempt(a.question_id, a.skill_ids, a.is_correct, a.response_time_seconds, a.timestamp)
+               for a in profile.question_history]
+    all_tests_passed &= check(
+        "Derived stats, recent attempts and answered ids",
+        decoded.question_history == history
+        and decoded.attempt_stats == AttemptStats.from_history(history, decoded.skill_states)
+        and list(decoded.recent_attempts) == history[-RECENT_ATTEMPTS_WINDOW:]
+        and decoded.answered_question_ids == {a.question_id for a in history}
+    )
+    all_tests_passed &= check(
+        "Defaults for missing fields",
+        decoded.student_notes == {} and decoded.next_review_at is None and decoded.skill_template_grade is None
+        and decoded.state_version == 0
+        and isinstance(decoded.recent_attempts, deque) and decoded.recent_attempts.maxlen == RECENT_ATTEMPTS_WINDOW
+    )
+
+    # Test 4: the first answer saved for a legacy profile stores its whole answered set
+    print("\n🔍 Test 4: Saving an answer for a legacy profile")
+    print("-" * 40)
+    profile = build_profile(5, seed=13)
+    document = legacy_encode(profile)
+    document.pop('answered_question_ids')
+    previously_answered = {a.question_id for a in profile.question_history}
+    user_manager = recording_user_manager(document)
+    decoded = profile_codec.decode(document)
+    all_tests_passed &= check("Rebuilt answered set is marked as not stored", not decoded.answered_ids_loaded)
+    for question_id in ("question_new_1", "question_new_2"):
+        attempt = user_manager.apply_question_attempt(decoded, question_id, ["skill_1"], True, 10.0)
+        user_manager.save_question_attempts(decoded, [attempt])
+        all_tests_passed &= check(
+            f"Stored set after answering {question_id}",
+            set(document['answered_question_ids']) == previously_answered | {question_id}
+            and profile_codec.decode(document).answered_question_ids == decoded.answered_question_ids
+            and decoded.answered_ids_loaded
+        )
+        previously_answered.add(question_id)
+
+    print("\n" + "="*80)
+    print("✅ ALL TESTS PASSED!" if all_tests_passed else "❌ SOME TESTS FAILED!")
+    print("="*80 + "\n")
+    return all_tests_passed
+
+if __name__ == "__main__":
+    try:
+        success = test_profile_codec()
+        sys.exit(0 if success else 1)
+    except Exception as e:
+        print(f"\n❌ TEST ERROR: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)